@@ -1,48 +1,241 @@
+import time
+
+# Start of the cold-start clock: everything below counts towards boot time
+_import_started = time.perf_counter()
+
 import os
 import logging
 from flask import Flask
 from werkzeug.middleware.proxy_fix import ProxyFix
 
 # Configure logging
-logging.basicConfig(level=logging.DEBUG)
-
-# Create Flask app
-app = Flask(__name__)
-app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
-app.wsgi_app = ProxyFix(app.wsgi_app, x_proto=1, x_host=1)
-
-# Configure database
-app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
-app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-    "pool_recycle": 300,
-    "pool_pre_ping": True,
-}
-
-# Configure upload folder
-app.config['UPLOAD_FOLDER'] = 'uploads'
-app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
-
-# Ensure upload directory exists
-os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
-
-# Initialize database
-from models.models import db
-db.init_app(app)
-
-with app.app_context():
-    # Import models here so their tables are created
-    from models import User, Project, Achievement, Comment, AboutInfo
-    db.create_all()
-    
-    # Initialize data if needed
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO').upper())
+logger = logging.getLogger(__name__)
+
+_import_finished = time.perf_counter()
+
+
+def configure(app):
+    app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key-change-in-production")
+
+    # Configure database
+    app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+    # Size the per-worker pool for the gunicorn profile (see gunicorn.conf.py)
+    if not (app.config["SQLALCHEMY_DATABASE_URI"] or "").startswith("sqlite"):
+        from utils.serving import db_pool_options
+        app.config["SQLALCHEMY_ENGINE_OPTIONS"].update(db_pool_options())
+
+    # Read replicas, comma-separated URLs: GET requests to public pages read from
+    # one of them (utils/db_routing.py). Replicas more than MAX_LAG seconds behind
+    # are skipped, and a browser that just wrote reads from the primary for
+    # READ_PRIMARY_SECONDS
+    replica_urls = [url.strip() for url in os.environ.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    app.config['SQLALCHEMY_BINDS'] = {f'replica_{i}': url for i, url in enumerate(replica_urls)}
+    app.config['DATABASE_REPLICA_MAX_LAG'] = float(os.environ.get('DATABASE_REPLICA_MAX_LAG', '5'))
+    app.config['DATABASE_REPLICA_CHECK_INTERVAL'] = float(os.environ.get('DATABASE_REPLICA_CHECK_INTERVAL', '2'))
+    app.config['DATABASE_READ_PRIMARY_SECONDS'] = int(os.environ.get('DATABASE_READ_PRIMARY_SECONDS')
+                                                      or app.config['DATABASE_REPLICA_MAX_LAG'] + 1)
+
+    # Configure upload folder
+    app.config['UPLOAD_FOLDER'] = 'uploads'
+    app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
+
+    # Who sends static/upload bytes: 'direct' (Flask), 'x-sendfile' or 'x-accel' (nginx internal redirect)
+    app.config['STATIC_SEND_MODE'] = os.environ.get('STATIC_SEND_MODE', 'direct')
+    app.config['X_ACCEL_STATIC_PREFIX'] = os.environ.get('X_ACCEL_STATIC_PREFIX', '/_internal/static/')
+    app.config['X_ACCEL_UPLOADS_PREFIX'] = os.environ.get('X_ACCEL_UPLOADS_PREFIX', '/_internal/uploads/')
+
+    # Projects per page on keyset-paginated listings and /api/projects
+    app.config['PROJECTS_PER_PAGE'] = int(os.environ.get('PROJECTS_PER_PAGE', '12'))
+
+    # Comments shown per page on the project detail page
+    app.config['COMMENTS_PER_PAGE'] = int(os.environ.get('COMMENTS_PER_PAGE', '20'))
+
+    # Threads that resize uploaded project images in the background
+    app.config['IMAGE_WORKERS'] = int(os.environ.get('IMAGE_WORKERS', '2'))
+
+    # Seconds between rollups of pending likes into Project.likes (0 disables the thread)
+    app.config['LIKES_ROLLUP_INTERVAL'] = int(os.environ.get('LIKES_ROLLUP_INTERVAL', '60'))
+
+    # Seconds that cached site owner data (admin email, about page) may be served stale
+    app.config['SITE_CACHE_TTL'] = int(os.environ.get('SITE_CACHE_TTL', '60'))
+
+    # Full-page cache for anonymous visitors: 'memory' (per worker LRU), 'disk' (shared) or 'none'
+    app.config['PAGE_CACHE_BACKEND'] = os.environ.get('PAGE_CACHE_BACKEND', 'memory')
+    app.config['PAGE_CACHE_DIR'] = os.environ.get('PAGE_CACHE_DIR')
+    app.config['PAGE_CACHE_TTL'] = int(os.environ.get('PAGE_CACHE_TTL', '300'))
+    # Entries per worker (memory) or per host (disk)
+    app.config['PAGE_CACHE_MAX_ENTRIES'] = int(os.environ.get('PAGE_CACHE_MAX_ENTRIES', '512'))
+    app.config['PAGE_CACHE_LOCALES'] = ['pt', 'en']
+
+    # Compiled templates shared by the workers through a directory ('disk') or 'none',
+    # and the per-worker cache of {% cache %} fragments ('memory' or 'none')
+    app.config['TEMPLATE_BYTECODE_CACHE'] = os.environ.get('TEMPLATE_BYTECODE_CACHE', 'disk')
+    app.config['TEMPLATE_BYTECODE_CACHE_DIR'] = os.environ.get('TEMPLATE_BYTECODE_CACHE_DIR')
+    app.config['FRAGMENT_CACHE_BACKEND'] = os.environ.get('FRAGMENT_CACHE_BACKEND', 'memory')
+    app.config['FRAGMENT_CACHE_MAX_ENTRIES'] = int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES', '4096'))
+
+    # Outbound mail: 'queue' persists messages for the background dispatcher, 'sync' sends inline
+    app.config['MAIL_DELIVERY'] = os.environ.get('MAIL_DELIVERY', 'queue')
+    app.config['MAIL_WORKERS'] = int(os.environ.get('MAIL_WORKERS', '2'))
+    app.config['MAIL_BATCH_SIZE'] = int(os.environ.get('MAIL_BATCH_SIZE', '20'))
+    app.config['MAIL_RETRY_BASE'] = int(os.environ.get('MAIL_RETRY_BASE', '30'))
+    app.config['MAIL_MAX_ATTEMPTS'] = int(os.environ.get('MAIL_MAX_ATTEMPTS', '5'))
+
+    # Rows per transaction when importing JSON Lines content (flask import-content, /admin/content)
+    app.config['CONTENT_IMPORT_BATCH_SIZE'] = int(os.environ.get('CONTENT_IMPORT_BATCH_SIZE', '1000'))
+
+    # Password hashing: any werkzeug method string; hashes made with other
+    # parameters are upgraded when their owner next logs in
+    app.config['PASSWORD_HASH_METHOD'] = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+    app.config['PASSWORD_SALT_LENGTH'] = int(os.environ.get('PASSWORD_SALT_LENGTH', '16'))
+
+    # Session store: 'database' (default), 'filesystem' (SESSION_DIR), 'memory'
+    # (single worker only) or 'cookie' (Flask's signed cookie, no revocation)
+    app.config['SESSION_BACKEND'] = os.environ.get('SESSION_BACKEND', 'database')
+    app.config['SESSION_DIR'] = os.environ.get('SESSION_DIR')
+    app.config['SESSION_COOKIE_HTTPONLY'] = True
+    app.config['SESSION_COOKIE_SAMESITE'] = 'Lax'
+    app.config['PERMANENT_SESSION_LIFETIME'] = int(os.environ.get('SESSION_LIFETIME', str(14 * 24 * 3600)))
+
+    # Token buckets on login/register POSTs, as 'capacity/period seconds'.
+    # Store: 'memory' (per worker), 'redis' (shared, REDIS_URL) or 'none'
+    app.config['RATE_LIMIT_STORE'] = os.environ.get('RATE_LIMIT_STORE', 'memory')
+    app.config['REDIS_URL'] = os.environ.get('REDIS_URL', 'redis://localhost:6379/0')
+    app.config['RATE_LIMIT_LOGIN_IP'] = os.environ.get('RATE_LIMIT_LOGIN_IP', '20/60')
+    app.config['RATE_LIMIT_LOGIN_ACCOUNT'] = os.environ.get('RATE_LIMIT_LOGIN_ACCOUNT', '5/300')
+    app.config['RATE_LIMIT_REGISTER_IP'] = os.environ.get('RATE_LIMIT_REGISTER_IP', '5/600')
+
+    # Server-Sent Events for live likes, comments and dashboard stats: 'memory'
+    # (per worker), 'redis' (shared, REDIS_URL) or 'none' (pages poll instead).
+    # Open streams per worker default to half its concurrency (utils/serving.py)
+    from utils.serving import event_stream_limit
+    app.config['SSE_BACKEND'] = os.environ.get('SSE_BACKEND', 'memory')
+    app.config['SSE_MAX_CONNECTIONS'] = int(os.environ.get('SSE_MAX_CONNECTIONS') or event_stream_limit())
+    app.config['SSE_QUEUE_SIZE'] = int(os.environ.get('SSE_QUEUE_SIZE', '32'))
+    app.config['SSE_KEEPALIVE'] = int(os.environ.get('SSE_KEEPALIVE', '15'))
+    app.config['SSE_STREAM_SECONDS'] = int(os.environ.get('SSE_STREAM_SECONDS', '300'))
+
+    # Request metrics (/admin/metrics): share of requests that also record SQL and
+    # template timings, statement repeats that flag an N+1, and the scrape token
+    app.config['METRICS_SAMPLE_RATE'] = float(os.environ.get('METRICS_SAMPLE_RATE', '0.1'))
+    app.config['METRICS_N_PLUS_ONE_THRESHOLD'] = int(os.environ.get('METRICS_N_PLUS_ONE_THRESHOLD', '5'))
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
+
+def init_db():
+    """Create or upgrade the schema and add the default data.
+
+    An empty database gets the current schema from the models; an existing
+    one is brought up to date by the migrations alone, since the models'
+    tables may reference columns an earlier migration has yet to convert.
+    Runs once per deploy (``flask --app main init-db``) instead of in every
+    worker at boot. Must be called inside an application context.
+    """
+    from sqlalchemy import inspect
+    from models.models import db
+    from models.migrations import upgrade
     from models.data_store import init_database_data
+
+    if not set(inspect(db.engine).get_table_names()) & set(db.metadata.tables):
+        db.create_all()
+    applied = upgrade()
     init_database_data()
+    return applied
+
+
+def create_app(config=None):
+    """Build the application. Touches neither the schema nor the data, so a
+    new worker is ready as soon as its modules are imported."""
+    started = time.perf_counter()
+    phases = {'imports': _import_finished - _import_started}
+
+    app = Flask(__name__)
+    # Trust the X-Forwarded-* headers set by this many proxies (the rate
+    # limiter keys on the client address)
+    proxies = int(os.environ.get('PROXY_COUNT', '1'))
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=proxies, x_proto=proxies, x_host=proxies)
+    configure(app)
+    if config:
+        app.config.update(config)
+
+    # Ensure upload directory exists
+    os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+    # Before anything creates app.jinja_env
+    from utils.templating import init_templating
+    init_templating(app)
+    mark = time.perf_counter()
+    phases['config'] = mark - started
+
+    # Initialize database
+    from models.models import db
+    db.init_app(app)
+    # Import models here so their tables are known to create_all
+    from models import User, Project, Achievement, Comment, AboutInfo, ProjectLike, OutboundEmail, SiteStats, Tag, ProjectTag, UserSession
+    # Registers the ORM events that keep site_stats current
+    from utils.stats import init_stats
+    # Registers the ORM events that keep the SQLite search index current
+    from utils.search import init_search
+    from utils.tags import init_tags
+    from models.migrations import init_migrations
+    phases['models'] = time.perf_counter() - mark
+    mark = time.perf_counter()
+
+    # Import and register blueprints; <id:...> URL parts are validated UUIDs
+    from models.types import IdConverter
+    app.url_map.converters['id'] = IdConverter
+    from routes.auth import auth_bp
+    from routes.admin import admin_bp
+    from routes.public import public_bp
+
+    app.register_blueprint(auth_bp, url_prefix='/auth')
+    app.register_blueprint(admin_bp, url_prefix='/admin')
+    app.register_blueprint(public_bp)
+    phases['blueprints'] = time.perf_counter() - mark
+    mark = time.perf_counter()
+
+    # Start background jobs and register their CLI commands
+    from utils.likes import init_likes
+    from utils.mail_queue import init_mail_queue
+    from utils.site_cache import init_site_cache
+    from utils.page_cache import init_page_cache
+    from utils.images import init_images
+    from utils.static_files import init_static_files
+    from utils.sessions import init_sessions
+    from utils.content_io import init_content_io
+    from utils.events import init_events
+    from utils.db_routing import init_db_routing
+    from utils.rate_limit import init_rate_limit
+    from utils.metrics import init_metrics, record_startup
+    init_migrations(app)
+    init_db_routing(app)
+    init_sessions(app)
+    init_likes(app)
+    init_mail_queue(app)
+    init_site_cache(app)
+    init_page_cache(app)
+    init_stats(app)
+    init_images(app)
+    init_static_files(app)
+    init_search(app)
+    init_tags(app)
+    init_content_io(app)
+    init_events(app)
+    init_rate_limit(app)
+    init_metrics(app)
 
-# Import and register blueprints
-from routes.auth import auth_bp
-from routes.admin import admin_bp
-from routes.public import public_bp
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create the schema, apply migrations and add the default data."""
+        applied = init_db()
+        print(f"Applied migrations: {', '.join(map(str, applied))}" if applied else "Database is up to date")
 
-app.register_blueprint(auth_bp, url_prefix='/auth')
-app.register_blueprint(admin_bp, url_prefix='/admin')
-app.register_blueprint(public_bp)
+    phases['extensions'] = time.perf_counter() - mark
+    record_startup(phases, _import_started)
+    logger.info("App created in %.0f ms (%s)", sum(phases.values()) * 1000,
+                ', '.join(f'{name} {seconds * 1000:.0f} ms' for name, seconds in phases.items()))
+    return app
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Deleting projects with many comments (utils/project_actions.py).
+
+1. One project with --comments comments, deleted the way the ORM did it
+   before ON DELETE CASCADE (load the collection, DELETE each comment, then
+   the project), and with delete_projects(): one DELETE, the database
+   removing the comments.
+2. --projects projects published, unpublished and deleted with the bulk
+   actions, against the same through the session one object at a time.
+
+Each run reports wall time, statements sent (each row of an executemany
+counted as one), objects loaded into the session and peak Python memory
+(tracemalloc). The ORM path at 100k comments takes minutes on SQLite.
+
+    python benchmarks/bench_cascade_delete.py --comments 100000 --projects 500
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BATCH = 5000
+
+
+def add_comments(project_id, user_id, count):
+    from sqlalchemy import insert, update
+    from models.models import db, Comment, Project
+    from models.types import new_id
+    from utils.stats import bump_stats
+
+    now = datetime.utcnow()
+    for start in range(0, count, BATCH):
+        db.session.execute(insert(Comment), [
+            {'id': new_id(), 'content': f'Comentário {i}', 'user_id': user_id, 'project_id': project_id,
+             'created_at': now} for i in range(start, min(count, start + BATCH))])
+    db.session.execute(update(Project).where(Project.id == project_id)
+                       .values(comment_count=Project.comment_count + count))
+    bump_stats(total_comments=count)
+    db.session.commit()
+
+
+def new_projects(count, status='draft', tags=('Python', 'Flask')):
+    from models.models import db, Project
+
+    projects = [Project(title=f'Bench {i}', description='Cascade benchmark', tags=list(tags), status=status)
+                for i in range(count)]
+    db.session.add_all(projects)
+    db.session.commit()
+    return [project.id for project in projects]
+
+
+def measure(label, fn):
+    """Run fn in a fresh session, counting statements and session objects"""
+    from sqlalchemy import event
+    from models.models import db
+
+    statements = [0]
+
+    def count(conn, cursor, statement, parameters, context, executemany):
+        statements[0] += len(parameters) if executemany else 1
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', count)
+    db.session.remove()
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        loaded = fn()
+        elapsed = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+        event.remove(engine, 'before_cursor_execute', count)
+    print(f"  {label:<34} {elapsed * 1000:9.1f} ms {statements[0]:>9} {loaded:>9} {peak / 2**20:9.1f}")
+
+
+def header():
+    print(f"  {'':<34} {'time':>12} {'statements':>9} {'loaded':>9} {'peak MB':>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--comments', type=int, default=100000, help='comments on the deleted project')
+    parser.add_argument('--projects', type=int, default=500, help='projects per bulk action')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(workdir, 'bench_cascade.db')}")
+    os.environ.update(LIKES_ROLLUP_INTERVAL='0', PAGE_CACHE_BACKEND='none', LOG_LEVEL='WARNING',
+                      MAIL_DELIVERY='sync', TEMPLATE_BYTECODE_CACHE='none')
+
+    from sqlalchemy import select
+    from benchmarks.seed import create_benchmark_app, seed
+    from models.models import db, Comment, Project, User
+    from utils.project_actions import delete_projects, set_projects_status
+    from utils.stats import compute_stats, get_stats, COUNTERS
+
+    app = create_benchmark_app()
+    try:
+        with app.app_context():
+            seed(users=10, projects=20, comments=200)
+            user_id = db.session.execute(select(User.id).where(User.is_admin.is_(False))).scalars().first()
+
+            print(f"Deleting a project with {args.comments} comments")
+            header()
+
+            def orm_cascade():
+                # What cascade='all, delete-orphan' without passive_deletes did
+                project = db.session.get(Project, project_id)
+                for comment in project.comments:
+                    db.session.delete(comment)
+                db.session.delete(project)
+                loaded = len(db.session.identity_map)
+                db.session.commit()
+                return loaded
+
+            def database_cascade():
+                delete_projects([project_id])
+                loaded = len(db.session.identity_map)
+                db.session.commit()
+                return loaded
+
+            for label, fn in (('ORM cascade (before)', orm_cascade), ('ON DELETE CASCADE', database_cascade)):
+                project_id = new_projects(1)[0]
+                add_comments(project_id, user_id, args.comments)
+                measure(label, fn)
+                assert db.session.scalar(select(Comment.id).where(Comment.project_id == project_id)) is None
+
+            print(f"\nBulk actions over {args.projects} projects")
+            header()
+            ids = new_projects(args.projects)
+
+            def one_by_one(status):
+                def run():
+                    for project in db.session.execute(select(Project).where(Project.id.in_(ids))).scalars():
+                        project.status = status
+                    loaded = len(db.session.identity_map)
+                    db.session.commit()
+                    return loaded
+                return run
+
+            def bulk(status):
+                def run():
+                    set_projects_status(ids, status)
+                    loaded = len(db.session.identity_map)
+                    db.session.commit()
+                    return loaded
+                return run
+
+            measure('publish, one object at a time', one_by_one('published'))
+            measure('unpublish, one object at a time', one_by_one('draft'))
+            measure('publish, one UPDATE', bulk('published'))
+            measure('unpublish, one UPDATE', bulk('draft'))
+
+            def delete_one_by_one():
+                for project in db.session.execute(select(Project).where(Project.id.in_(ids))).scalars():
+                    db.session.delete(project)
+                loaded = len(db.session.identity_map)
+                db.session.commit()
+                return loaded
+
+            def delete_bulk():
+                delete_projects(ids)
+                loaded = len(db.session.identity_map)
+                db.session.commit()
+                return loaded
+
+            measure('delete, one object at a time', delete_one_by_one)
+            ids = new_projects(args.projects, status='published')
+            measure('delete, one DELETE', delete_bulk)
+
+            stored, counted = get_stats(), compute_stats(db.session.connection())
+            drift = {name: (stored[name], counted[name]) for name in COUNTERS if stored[name] != counted[name]}
+            print(f"\nsite_stats after all of the above: {drift or 'matches a full recount'}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Latency of POST /project/<id>/comment with inline vs queued email delivery.
+
+Starts a local aiosmtpd stand-in (pip install aiosmtpd) that sleeps
+--smtp-delay seconds per message to mimic a remote relay, posts comments in
+MAIL_DELIVERY='sync' and then 'queue' mode, and reports p50/p95/p99. In queue
+mode it also waits for the dispatcher to drain and checks every message arrived.
+
+    python benchmarks/bench_comment_latency.py --comments 100 --smtp-delay 0.2
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_smtp_standin(port, delay):
+    from aiosmtpd.controller import Controller
+    from aiosmtpd.smtp import AuthResult
+
+    class Handler:
+        def __init__(self):
+            self.received = 0
+            self.lock = threading.Lock()
+
+        async def handle_DATA(self, server, session, envelope):
+            # Sleep without blocking the loop, so concurrent senders overlap like on a real relay
+            await asyncio.sleep(delay)
+            with self.lock:
+                self.received += 1
+            return '250 OK'
+
+    handler = Handler()
+    controller = Controller(
+        handler, hostname='127.0.0.1', port=port,
+        authenticator=lambda *args: AuthResult(success=True),
+        auth_require_tls=False,
+    )
+    controller.start()
+    return controller, handler
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--comments', type=int, default=100)
+    parser.add_argument('--smtp-delay', type=float, default=0.2)
+    args = parser.parse_args()
+
+    port = free_port()
+    controller, handler = start_smtp_standin(port, args.smtp_delay)
+
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_mail.db')}")
+    os.environ.update({
+        'SMTP_SERVER': '127.0.0.1', 'SMTP_PORT': str(port), 'SMTP_USE_TLS': 'false',
+        'SMTP_USERNAME': 'bench@example.com', 'SMTP_PASSWORD': 'bench',
+        'MAIL_DELIVERY': 'queue', 'LIKES_ROLLUP_INTERVAL': '0',
+    })
+
+    from benchmarks.seed import create_benchmark_app
+    from models.models import db, User, Project, OutboundEmail
+
+    app = create_benchmark_app()
+
+    with app.app_context():
+        user = User(name='Bench', email=f'bench-{time.time_ns()}@example.com')
+        user.set_password('bench')
+        project = Project(title='Mail benchmark', description='-', status='published')
+        db.session.add_all([user, project])
+        db.session.commit()
+        user_id, project_id = user.id, project.id
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        sess['user_id'] = user_id
+
+    results = {}
+    for mode in ('sync', 'queue'):
+        app.config['MAIL_DELIVERY'] = mode
+        timings = []
+        for i in range(args.comments):
+            start = time.perf_counter()
+            response = client.post(f'/project/{project_id}/comment', data={'comment': f'{mode} {i}'})
+            timings.append(time.perf_counter() - start)
+            assert response.status_code == 302, response.status_code
+        results[mode] = timings
+
+    deadline = time.time() + 60 + args.comments * args.smtp_delay
+    while handler.received < 2 * args.comments and time.time() < deadline:
+        time.sleep(0.1)
+
+    with app.app_context():
+        pending = OutboundEmail.query.filter(OutboundEmail.status != 'sent').count()
+    controller.stop()
+
+    print(f"{'mode':<6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for mode, timings in results.items():
+        print(f"{mode:<6} {percentile(timings, 50) * 1000:8.1f} {percentile(timings, 95) * 1000:8.1f} "
+              f"{percentile(timings, 99) * 1000:8.1f} {statistics.mean(timings) * 1000:8.1f}")
+    print(f"delivered {handler.received}/{2 * args.comments} messages, {pending} left in queue")
+    return 0 if handler.received == 2 * args.comments and not pending else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
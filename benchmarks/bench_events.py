@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+"""
+Server-Sent Events (utils/events.py) against the polling they replace.
+
+A gthread gunicorn worker is started against a seeded database with
+--viewers event streams open on one project page and one on the admin
+dashboard. A member then posts --rounds comments; for each, the time from
+sending the POST until every viewer has the comment (and until the
+dashboard has the new comment count) is recorded. Polling at --poll-interval
+would show the same change after half an interval on average, at
+viewers / interval requests per second even when nothing changes.
+
+The worker's RSS is read before and after the streams open, which gives
+the memory held per connection (mostly the thread serving it), and
+publish() is timed in-process with 0 to 1000 subscribers.
+
+    python benchmarks/bench_events.py --viewers 50 --rounds 10
+"""
+
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import timeit
+import urllib.parse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.bench_comment_latency import free_port, percentile
+from benchmarks.load_test import seed_database, start_server
+
+ADMIN_EMAIL = 'admin@portfolio.com'
+ADMIN_PASSWORD = 'admin123'
+
+
+def log_in(port, email, password):
+    """Session cookie header for an account"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    conn.request('POST', '/auth/login', body=urllib.parse.urlencode({'email': email, 'password': password}),
+                 headers={'Content-Type': 'application/x-www-form-urlencoded'})
+    response = conn.getresponse()
+    response.read()
+    assert response.status == 302, f"login failed for {email} ({response.status})"
+    return response.getheader('Set-Cookie').split(';', 1)[0]
+
+
+class Viewer(threading.Thread):
+    """Holds one event stream open and timestamps every frame containing a marker"""
+
+    def __init__(self, port, path, cookie=None):
+        super().__init__(daemon=True)
+        self.sock = socket.create_connection(('127.0.0.1', port))
+        headers = f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nAccept: text/event-stream\r\n'
+        if cookie:
+            headers += f'Cookie: {cookie}\r\n'
+        self.sock.sendall((headers + '\r\n').encode())
+        self.received = []
+        self.ready = threading.Event()
+
+    def run(self):
+        reader = self.sock.makefile('rb')
+        for line in reader:
+            if line.startswith(b'data:'):
+                self.received.append((time.perf_counter(), line))
+                self.ready.set()
+
+    def arrival(self, marker, timeout=10):
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            for at, line in self.received:
+                if marker in line:
+                    return at
+            time.sleep(0.001)
+        return None
+
+
+def worker_rss_kb(master_pid):
+    """Resident memory of gunicorn's (single) worker process"""
+    with open(f'/proc/{master_pid}/task/{master_pid}/children') as f:
+        worker = int(f.read().split()[0])
+    with open(f'/proc/{worker}/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return None
+
+
+def publish_cost(subscriber_counts, repeat=2000):
+    """Seconds per publish() with this many streams on the channel, in-process"""
+    from utils import events
+
+    results = {}
+    for count in subscriber_counts:
+        events._hub = events.Hub(count + 1, 32)
+        events._broker = events.MemoryBroker()
+        subscriptions = [events._hub.subscribe('project:bench') for _ in range(count)]
+        payload = {'id': 'x' * 36, 'author': 'Bench', 'content': 'Comentário ' * 10, 'created_at': '2024-01-01'}
+        results[count] = timeit.timeit(lambda: events.publish('project:bench', 'comment', payload),
+                                       number=repeat) / repeat
+        for subscription in subscriptions:
+            subscription.frames.clear()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--viewers', type=int, default=50, help='event streams on the project page')
+    parser.add_argument('--rounds', type=int, default=10, help='comments posted while they watch')
+    parser.add_argument('--poll-interval', type=float, default=30.0, help='what admin.js used to poll at')
+    args = parser.parse_args()
+
+    database_url = os.environ.get('DATABASE_URL') or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_events.db')}"
+    project_id = seed_database(database_url, 50)
+    code = ("from benchmarks.seed import create_benchmark_app\napp = create_benchmark_app()\n"
+            "from models.models import User\nwith app.app_context():\n"
+            "    print(User.query.filter_by(is_admin=False).first().email)\n")
+    member_email = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, capture_output=True, text=True,
+                                  env=dict(os.environ, DATABASE_URL=database_url), check=True).stdout.split()[-1]
+
+    port = free_port()
+    # One worker, so the memory broker reaches every stream; a thread per stream
+    env = dict(os.environ, DATABASE_URL=database_url, LIKES_ROLLUP_INTERVAL='0', MAIL_DELIVERY='sync',
+               LOG_LEVEL='WARNING', RATE_LIMIT_STORE='none', METRICS_SAMPLE_RATE='0', PAGE_CACHE_BACKEND='none',
+               WEB_CONCURRENCY='1', GUNICORN_THREADS=str(args.viewers + 8),
+               SSE_BACKEND='memory', SSE_MAX_CONNECTIONS=str(args.viewers + 1))
+    server = start_server('gthread', port, env)
+    try:
+        from benchmarks.seed import SEED_PASSWORD
+        member = log_in(port, member_email, SEED_PASSWORD)
+        admin = log_in(port, ADMIN_EMAIL, ADMIN_PASSWORD)
+        time.sleep(0.5)
+        rss_before = worker_rss_kb(server.pid)
+
+        viewers = [Viewer(port, f'/project/{project_id}/events') for _ in range(args.viewers)]
+        dashboard = Viewer(port, '/admin/events', admin)
+        for viewer in viewers + [dashboard]:
+            viewer.start()
+        for viewer in viewers + [dashboard]:
+            assert viewer.ready.wait(10), "stream did not open"
+        time.sleep(0.5)
+        rss_after = worker_rss_kb(server.pid)
+
+        fanout, first, dashboard_latency = [], [], []
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        for i in range(args.rounds):
+            marker = f'bench-{i}-{time.time_ns()}'
+            total_before = len(dashboard.received)
+            start = time.perf_counter()
+            conn.request('POST', f'/project/{project_id}/comment', body=urllib.parse.urlencode({'comment': marker}),
+                         headers={'Content-Type': 'application/x-www-form-urlencoded', 'Cookie': member})
+            response = conn.getresponse()
+            response.read()
+            arrivals = [viewer.arrival(marker.encode()) for viewer in viewers]
+            assert None not in arrivals, "a viewer missed an event"
+            first.append(min(arrivals) - start)
+            fanout.append(max(arrivals) - start)
+            deadline = time.perf_counter() + 5
+            while len(dashboard.received) == total_before and time.perf_counter() < deadline:
+                time.sleep(0.001)
+            if len(dashboard.received) > total_before:
+                dashboard_latency.append(dashboard.received[total_before][0] - start)
+            # Dashboard pushes are coalesced to one per second
+            time.sleep(1.1)
+    finally:
+        server.terminate()
+        server.wait()
+
+    print(f"{args.viewers} viewers on one project, {args.rounds} comments (gthread, 1 worker, memory broker)")
+    print(f"  comment POST -> first viewer   p50 {percentile(first, 50) * 1000:7.1f} ms   "
+          f"p95 {percentile(first, 95) * 1000:7.1f} ms")
+    print(f"  comment POST -> all viewers    p50 {percentile(fanout, 50) * 1000:7.1f} ms   "
+          f"p95 {percentile(fanout, 95) * 1000:7.1f} ms")
+    if dashboard_latency:
+        print(f"  comment POST -> dashboard      p50 {percentile(dashboard_latency, 50) * 1000:7.1f} ms   "
+              f"p95 {percentile(dashboard_latency, 95) * 1000:7.1f} ms")
+    print(f"  polling every {args.poll_interval:g} s: {args.poll_interval / 2 * 1000:.0f} ms average staleness, "
+          f"{(args.viewers + 1) / args.poll_interval:.1f} req/s while idle (streams: one keepalive per 15 s)")
+    print(f"  worker RSS {rss_before / 1024:.1f} -> {rss_after / 1024:.1f} MB with {args.viewers + 1} streams "
+          f"({(rss_after - rss_before) / (args.viewers + 1):.0f} KB per stream)")
+    print("publish() in-process, per call:")
+    for count, seconds in publish_cost([0, 10, 100, 1000]).items():
+        print(f"  {count:>5} subscribers  {seconds * 1e6:8.1f} us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Throughput and memory of the JSON Lines import/export (utils/content_io.py).
+
+A file of --rows lines (half projects, a tenth achievements, the rest
+comments by --authors distinct people) is generated on disk, then imported
+into an empty database once per batch size, each in a fresh process so the
+peak RSS belongs to that run alone. A constant peak across --rows values is
+what shows the import streams. The last database is exported again to time
+the streaming export.
+
+    python benchmarks/bench_import.py --rows 100000 --batch-sizes 500 1000 5000
+"""
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.seed import TAGS, BASE_TIME
+
+
+def write_file(path, rows, authors, rng):
+    projects = rows // 2
+    achievements = rows // 10
+    comments = rows - projects - achievements
+    project_ids = []
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(achievements):
+            f.write(json.dumps({'type': 'achievement', 'id': str(uuid.uuid4()), 'title': f'Conquista {i}',
+                                'description': 'Imported achievement. ' * 5,
+                                'date': (BASE_TIME + timedelta(days=i % 2000)).date().isoformat()}) + '\n')
+        for i in range(projects):
+            project_id = str(uuid.uuid4())
+            if len(project_ids) < 10000:
+                project_ids.append(project_id)
+            f.write(json.dumps({
+                'type': 'project', 'id': project_id, 'title': f'Projeto importado {i}',
+                'description': ' '.join(rng.choice(TAGS) for _ in range(40)), 'tags': rng.sample(TAGS, 3),
+                'status': 'published' if rng.random() < 0.9 else 'draft', 'likes': rng.randint(0, 500),
+                'created_at': (BASE_TIME + timedelta(seconds=rng.randint(0, 10 ** 7))).isoformat(),
+            }) + '\n')
+        for i in range(comments):
+            author = rng.randrange(authors)
+            f.write(json.dumps({
+                'type': 'comment', 'id': str(uuid.uuid4()), 'content': f'Comentário importado {i}',
+                'project_id': rng.choice(project_ids), 'author_email': f'author-{author}@example.com',
+                'author_name': f'Author {author}',
+                'created_at': (BASE_TIME + timedelta(seconds=rng.randint(0, 10 ** 7))).isoformat(),
+            }) + '\n')
+    return {'project': projects, 'achievement': achievements, 'comment': comments}
+
+
+def child_import(path, batch_size):
+    from app import create_app, init_db
+    from utils.content_io import import_lines
+
+    app = create_app()
+    with app.app_context():
+        init_db()
+        start = time.perf_counter()
+        with open(path, 'r', encoding='utf-8') as f:
+            counts = import_lines(f, batch_size)
+        elapsed = time.perf_counter() - start
+    print(json.dumps({'seconds': elapsed, 'counts': counts,
+                      'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+
+
+def child_export(path):
+    from app import create_app
+    from utils.content_io import export_lines
+
+    app = create_app()
+    with app.app_context():
+        start = time.perf_counter()
+        lines = 0
+        with open(path, 'w', encoding='utf-8') as f:
+            for line in export_lines():
+                f.write(line)
+                lines += 1
+        elapsed = time.perf_counter() - start
+    print(json.dumps({'seconds': elapsed, 'lines': lines,
+                      'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}))
+
+
+def run_child(args, env):
+    output = subprocess.run([sys.executable, __file__] + args, cwd=REPO_ROOT, env=env,
+                            check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=100000)
+    parser.add_argument('--authors', type=int, default=2000, help='distinct comment authors')
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[500, 1000, 5000])
+    parser.add_argument('--child-import', nargs=2, help=argparse.SUPPRESS)
+    parser.add_argument('--child-export', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_import:
+        child_import(args.child_import[0], int(args.child_import[1]))
+        return
+    if args.child_export:
+        child_export(args.child_export)
+        return
+
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'import.jsonl')
+    written = write_file(path, args.rows, args.authors, random.Random(42))
+    size_mb = os.path.getsize(path) / 1024 / 1024
+    print(f"{args.rows} lines ({', '.join(f'{n} {kind}' for kind, n in written.items())}), {size_mb:.1f} MB")
+    print(f"{'batch':>7} {'seconds':>9} {'rows/s':>9} {'peak RSS MB':>12}")
+
+    base_env = dict(os.environ, LIKES_ROLLUP_INTERVAL='0', MAIL_DELIVERY='sync', LOG_LEVEL='WARNING',
+                    PAGE_CACHE_BACKEND='none')
+    for batch_size in args.batch_sizes:
+        env = dict(base_env, DATABASE_URL=f"sqlite:///{os.path.join(directory, f'import-{batch_size}.db')}")
+        result = run_child(['--child-import', path, str(batch_size)], env)
+        imported = sum(count for kind, count in result['counts'].items() if kind != 'skipped')
+        print(f"{batch_size:>7} {result['seconds']:>9.2f} {imported / result['seconds']:>9.0f} "
+              f"{result['peak_rss_mb']:>12.1f}")
+
+    result = run_child(['--child-export', os.path.join(directory, 'export.jsonl')], env)
+    print(f"export: {result['lines']} lines in {result['seconds']:.2f} s "
+          f"({result['lines'] / result['seconds']:.0f} lines/s), peak RSS {result['peak_rss_mb']:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Concurrency benchmark for POST /project/<id>/like.
+
+Fires many parallel like requests (including duplicates from the same user)
+at a throwaway SQLite database, or at DATABASE_URL when it is set, then runs
+the rollup and checks that every distinct user's like was counted exactly once.
+
+    python benchmarks/bench_likes.py --users 200 --repeat 3 --workers 32
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--repeat', type=int, default=3, help='likes sent per user')
+    parser.add_argument('--workers', type=int, default=32)
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        db_path = os.path.join(tempfile.mkdtemp(), 'bench_likes.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['LIKES_ROLLUP_INTERVAL'] = '0'
+
+    from benchmarks.seed import create_benchmark_app
+    from models.models import db, User, Project
+    from utils.likes import rollup_likes
+
+    app = create_benchmark_app()
+
+    with app.app_context():
+        project = Project(title='Like benchmark', description='-', status='published', likes=0)
+        db.session.add(project)
+        users = [User(name=f'bench{i}', email=f'bench-{time.time_ns()}-{i}@example.com')
+                 for i in range(args.users)]
+        for user in users:
+            user.password_hash = '-'
+            db.session.add(user)
+        db.session.commit()
+        project_id = project.id
+        user_ids = [user.id for user in users]
+
+    def like(user_id):
+        client = app.test_client()
+        with client.session_transaction() as sess:
+            sess['user_id'] = user_id
+        statuses = []
+        for _ in range(args.repeat):
+            statuses.append(client.post(f'/project/{project_id}/like').status_code)
+        return statuses
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.workers) as pool:
+        results = list(pool.map(like, user_ids))
+    elapsed = time.perf_counter() - start
+
+    requests_sent = args.users * args.repeat
+    errors = sum(1 for statuses in results for status in statuses if status != 200)
+
+    with app.app_context():
+        rolled_up = rollup_likes()
+        likes = db.session.get(Project, project_id).likes
+
+    print(f"requests sent:   {requests_sent} in {elapsed:.2f}s ({requests_sent / elapsed:.0f} req/s)")
+    print(f"non-200 replies: {errors}")
+    print(f"rolled up:       {rolled_up}")
+    print(f"Project.likes:   {likes} (expected {args.users})")
+
+    if errors or likes != args.users:
+        print("FAIL: likes were dropped or double counted")
+        return 1
+    print("OK: no likes dropped")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+"""
+List views with deferred descriptions and column projections (utils/listing.py).
+
+--projects projects and --achievements achievements are seeded with
+--description-kb of description each, then:
+
+1. Query: every project loaded as full entities (description included,
+   as before) and through project_cards(); the same for achievements.
+2. Pages: the listing pages rendered through the test client, once with
+   the list queries loading full entities and once with the projections.
+   Page and fragment caches are off, so every request queries and renders.
+
+Each line reports median wall time and peak Python memory (tracemalloc).
+
+    python benchmarks/bench_list_views.py --projects 10000 --description-kb 4
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def timed(fn, repeat):
+    """(median ms, peak MB of the first run)"""
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000, peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--projects', type=int, default=10000)
+    parser.add_argument('--achievements', type=int, default=1000)
+    parser.add_argument('--description-kb', type=float, default=4.0, help='description size')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(workdir, 'bench_list_views.db')}")
+    os.environ.update(LIKES_ROLLUP_INTERVAL='0', PAGE_CACHE_BACKEND='none', FRAGMENT_CACHE_BACKEND='none',
+                      LOG_LEVEL='WARNING', MAIL_DELIVERY='sync', RATE_LIMIT_STORE='none', METRICS_SAMPLE_RATE='0')
+
+    from sqlalchemy import update
+    from sqlalchemy.orm import undefer
+    from benchmarks.seed import create_benchmark_app, seed
+    from models.models import db, summarize, Achievement, Project, User
+    from routes import admin, public
+    from utils import listing, search
+
+    app = create_benchmark_app()
+    with app.app_context():
+        seed(users=10, projects=args.projects, achievements=args.achievements, published_ratio=0.9)
+        description = ('Descrição detalhada do projeto, com contexto, decisões e resultados. '
+                       * int(args.description_kb * 1024 / 70 + 1))[:int(args.description_kb * 1024)]
+        for model in (Project, Achievement):
+            db.session.execute(update(model).values(description=description, summary=summarize(description)))
+        db.session.commit()
+        admin_email = User.query.filter_by(is_admin=True).first().email
+
+    def full_projects(query):
+        return query.options(undefer(Project.description))
+
+    def full_achievements(query):
+        return query.options(undefer(Achievement.description))
+
+    def use(project_cards, achievement_items):
+        """Point the list views at full entities or at the projections"""
+        for module in (public, admin, search):
+            if hasattr(module, 'project_cards'):
+                module.project_cards = project_cards
+            if hasattr(module, 'achievement_items'):
+                module.achievement_items = achievement_items
+
+    try:
+        print(f"{args.projects} projects, {args.achievements} achievements, "
+              f"{args.description_kb:g} KB descriptions (median of {args.repeat})")
+        print(f"  {'':<36} {'time':>11} {'peak MB':>9}")
+        with app.app_context():
+            queries = [
+                ('all projects, full entities', lambda: full_projects(Project.query).all()),
+                ('all projects, project_cards()', lambda: listing.project_cards(Project.query).all()),
+                ('all achievements, full entities', lambda: full_achievements(Achievement.query).all()),
+                ('all achievements, achievement_items()', lambda: listing.achievement_items(Achievement.query).all()),
+            ]
+            for label, query in queries:
+                def run():
+                    query()
+                    db.session.expunge_all()
+                elapsed, peak = timed(run, args.repeat)
+                print(f"  {label:<36} {elapsed:8.1f} ms {peak:9.1f}")
+
+        client = app.test_client()
+        client.post('/auth/login', data={'email': admin_email, 'password': 'admin123'})
+        pages = ['/', '/projects', '/api/projects?limit=50', '/search?q=projeto', '/admin/projects',
+                 '/admin/dashboard', '/admin/achievements']
+        modes = [
+            ('full entities', full_projects, full_achievements),
+            ('projections', listing.project_cards, listing.achievement_items),
+        ]
+        print(f"\n  {'page':<26} " + ''.join(f"{label + ' ms':>18} {'MB':>6}" for label, _, _ in modes))
+        for path in pages:
+            cells = []
+            for _, project_cards, achievement_items in modes:
+                use(project_cards, achievement_items)
+
+                def request():
+                    response = client.get(path)
+                    assert response.status_code == 200, (path, response.status_code)
+                elapsed, peak = timed(request, args.repeat)
+                cells.append(f"{elapsed:18.1f} {peak:6.1f}")
+            print(f"  {path:<26} " + ''.join(cells))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
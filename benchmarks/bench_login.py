@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Responsiveness of the site while /auth/login is under a brute-force load.
+
+A gunicorn server (gthread) is started against a seeded database for each
+rate limit store. Attacker threads POST wrong passwords for real accounts at
+a fixed rate each (--rate, 0 for as fast as the server answers); at the same
+time one visitor thread keeps loading ordinary pages. Without limiting every
+attempt costs a full password hash and the visitor waits behind them; with a
+store the attempts are turned away with 429 before any hashing is done.
+
+``--spread`` sends every attempt with a different X-Forwarded-For address,
+i.e. a distributed attack that only the per-account buckets can stop. The
+redis store is measured only when --redis-url points at a running server.
+
+    python benchmarks/bench_login.py --stores none memory --attackers 8 --rate 5 --duration 10
+"""
+
+import argparse
+import http.client
+import itertools
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.bench_comment_latency import free_port, percentile
+from benchmarks.load_test import start_server
+
+
+def seed_accounts(database_url, count):
+    """Seed in a child process and return the emails of `count` accounts"""
+    code = (
+        "from benchmarks.seed import create_benchmark_app, seed\n"
+        "app = create_benchmark_app()\n"
+        "from models.models import User\n"
+        "with app.app_context():\n"
+        f"    seed(users={count}, projects=200, comments=400, achievements=20)\n"
+        f"    print(' '.join(u.email for u in User.query.filter_by(is_admin=False).limit({count})))\n"
+    )
+    env = dict(os.environ, DATABASE_URL=database_url, LIKES_ROLLUP_INTERVAL='0', MAIL_DELIVERY='sync')
+    output = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return output.strip().splitlines()[-1].split()
+
+
+def time_hashing(methods, rounds=5):
+    """Milliseconds per hash for each method, outside the server"""
+    from werkzeug.security import generate_password_hash
+    results = {}
+    for method in methods:
+        samples = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            generate_password_hash('bench-password', method=method)
+            samples.append(time.perf_counter() - start)
+        results[method] = statistics.median(samples) * 1000
+    return results
+
+
+def attack(port, emails, spread, rate, deadline, counts, lock):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    addresses = (f'10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255}' for n in itertools.count(1))
+    local = {}
+    next_at = time.perf_counter()
+    for email in itertools.cycle(emails):
+        if rate:
+            # Open loop: a flood does not slow down because the server does
+            time.sleep(max(0.0, next_at - time.perf_counter()))
+            next_at += 1 / rate
+        if time.perf_counter() >= deadline:
+            break
+        headers = {'Content-Type': 'application/x-www-form-urlencoded'}
+        if spread:
+            headers['X-Forwarded-For'] = next(addresses)
+        body = urllib.parse.urlencode({'email': email, 'password': 'wrong-password'})
+        try:
+            conn.request('POST', '/auth/login', body=body, headers=headers)
+            response = conn.getresponse()
+            response.read()
+            local[response.status] = local.get(response.status, 0) + 1
+        except OSError:
+            local['error'] = local.get('error', 0) + 1
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    with lock:
+        for status, n in local.items():
+            counts[status] = counts.get(status, 0) + n
+
+
+def visit(port, paths, deadline, latencies):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    for path in itertools.cycle(paths):
+        if time.perf_counter() >= deadline:
+            break
+        start = time.perf_counter()
+        conn.request('GET', path)
+        conn.getresponse().read()
+        latencies.append(time.perf_counter() - start)
+
+
+def run(port, emails, attackers, spread, rate, duration, paths):
+    # Visitor latency on an idle server first, then under attack
+    idle = []
+    visit(port, paths, time.perf_counter() + min(2.0, duration), idle)
+
+    counts, latencies, lock = {}, [], threading.Lock()
+    deadline = time.perf_counter() + duration
+    threads = [threading.Thread(target=attack, args=(port, emails, spread, rate, deadline, counts, lock))
+               for _ in range(attackers)]
+    threads.append(threading.Thread(target=visit, args=(port, paths, deadline, latencies)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return idle, latencies, counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--stores', nargs='+', default=['none', 'memory', 'redis'])
+    parser.add_argument('--redis-url', help='REDIS_URL for the redis store (skipped when unset)')
+    parser.add_argument('--attackers', type=int, default=8, help='concurrent brute-force clients')
+    parser.add_argument('--rate', type=float, default=5.0, help='attempts per second per attacker (0: no pacing)')
+    parser.add_argument('--accounts', type=int, default=20, help='accounts the attackers cycle through')
+    parser.add_argument('--spread', action='store_true', help='a new client address for every attempt')
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--hash-methods', nargs='*', default=['scrypt:32768:8:1', 'scrypt:16384:8:1',
+                                                             'pbkdf2:sha256:600000'])
+    args = parser.parse_args()
+
+    if args.hash_methods:
+        print("password hash cost (median ms)")
+        for method, ms in time_hashing(args.hash_methods).items():
+            print(f"  {method:<24} {ms:8.1f}")
+
+    database_url = os.environ.get('DATABASE_URL') or \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_login.db')}"
+    emails = seed_accounts(database_url, args.accounts)
+    paths = ['/', '/projects', '/about', '/api/projects']
+
+    pace = f"{args.rate:g}/s each" if args.rate else "unpaced"
+    print(f"\n{args.attackers} attackers ({pace}) on /auth/login for {args.duration:.0f} s "
+          f"({'distributed' if args.spread else 'one address'}), gthread x {args.workers}")
+    print(f"{'store':<8} {'idle p50':>9} {'p50 ms':>8} {'p99 ms':>8} {'pages/s':>8} "
+          f"{'logins/s':>9} {'429s':>7}")
+    for store in args.stores:
+        if store == 'redis' and not args.redis_url:
+            print(f"{store:<8} skipped (pass --redis-url)")
+            continue
+        env = dict(os.environ, DATABASE_URL=database_url, WEB_CONCURRENCY=str(args.workers),
+                   LIKES_ROLLUP_INTERVAL='0', PAGE_CACHE_BACKEND='none', MAIL_DELIVERY='sync',
+                   LOG_LEVEL='ERROR', RATE_LIMIT_STORE=store)
+        if args.redis_url:
+            env['REDIS_URL'] = args.redis_url
+        port = free_port()
+        server = start_server('gthread', port, env)
+        try:
+            idle, latencies, counts = run(port, emails, args.attackers, args.spread, args.rate,
+                                          args.duration, paths)
+        finally:
+            server.terminate()
+            server.wait()
+        attempts = sum(n for status, n in counts.items() if status != 'error')
+        print(f"{store:<8} {percentile(idle, 50) * 1000:>9.1f} {percentile(latencies, 50) * 1000:>8.1f} "
+              f"{percentile(latencies, 99) * 1000:>8.1f} {len(latencies) / args.duration:>8.1f} "
+              f"{attempts / args.duration:>9.1f} {counts.get(429, 0):>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Overhead of the request metrics (utils/metrics.py) at different sample rates.
+
+Each rate runs in a fresh process (the rate is read at startup) against the
+same seeded database and times the same mix of pages through the test
+client. "off" removes the metrics hooks altogether, so the difference to it
+is the whole cost of the instrumentation.
+
+    python benchmarks/bench_metrics.py --rates off 0 0.1 1
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+PATHS = ['/', '/projects', '/api/projects', '/about', '/project/{project_id}', '/api/search?q=python']
+
+
+def measure(rate, requests):
+    """Child process: time PATHS and print the medians as JSON"""
+    os.environ['METRICS_SAMPLE_RATE'] = '0' if rate == 'off' else rate
+    from benchmarks.seed import create_benchmark_app
+    from models.models import Project
+    from utils import metrics
+
+    app = create_benchmark_app()
+
+    if rate == 'off':
+        app.before_request_funcs[None].remove(metrics._start_request)
+        app.after_request_funcs[None].remove(metrics._note_status)
+        app.teardown_request_funcs[None].remove(metrics._finish_request)
+
+    with app.app_context():
+        project_id = Project.query.filter_by(status='published').first().id
+    client = app.test_client()
+    results = {}
+    for template in PATHS:
+        path = template.format(project_id=project_id)
+        for _ in range(5):
+            client.get(path)
+        samples = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            client.get(path)
+            samples.append(time.perf_counter() - start)
+        results[template] = statistics.median(samples) * 1000
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rates', nargs='+', default=['off', '0', '0.1', '1'])
+    parser.add_argument('--projects', type=int, default=2000)
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_metrics.db')}"
+    os.environ.update({'LIKES_ROLLUP_INTERVAL': '0', 'PAGE_CACHE_BACKEND': 'none', 'MAIL_DELIVERY': 'sync',
+                       'LOG_LEVEL': 'WARNING'})
+
+    if args.child:
+        measure(args.child, args.requests)
+        return
+
+    code = ("from benchmarks.seed import create_benchmark_app, seed\napp = create_benchmark_app()\n"
+            "with app.app_context():\n"
+            f"    seed(users=200, projects={args.projects}, comments={args.projects * 2}, achievements=50)\n")
+    subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, check=True, capture_output=True)
+
+    results = {}
+    for rate in args.rates:
+        output = subprocess.run([sys.executable, __file__, '--child', rate, '--requests', str(args.requests)],
+                                cwd=REPO_ROOT, check=True, capture_output=True, text=True).stdout
+        results[rate] = json.loads(output.strip().splitlines()[-1])
+
+    print(f"median ms per request, {args.projects} projects, page cache off")
+    print(f"{'path':<24}" + ''.join(f"{'rate ' + rate:>12}" for rate in args.rates))
+    for path in PATHS:
+        print(f"{path:<24}" + ''.join(f"{results[rate][path]:>12.3f}" for rate in args.rates))
+
+
+if __name__ == '__main__':
+    main()
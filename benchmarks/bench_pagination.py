@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Listing latency as the project count grows: keyset vs OFFSET vs load-all.
+
+For each size the table is topped up with published projects, then /projects
+(first page and a deep keyset page) and /api/projects are timed through the
+test client, next to the old ".all()" listing and an equivalent OFFSET query.
+
+    python benchmarks/bench_pagination.py --sizes 1000 10000 30000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 30000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        db_path = os.path.join(tempfile.mkdtemp(), 'bench_pagination.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['LIKES_ROLLUP_INTERVAL'] = '0'
+    os.environ['PAGE_CACHE_BACKEND'] = 'none'
+
+    from sqlalchemy import insert
+    from benchmarks.seed import create_benchmark_app
+    from models.models import db, Project
+    from utils.pagination import encode_cursor
+
+    app = create_benchmark_app()
+
+    client = app.test_client()
+    per_page = app.config['PROJECTS_PER_PAGE']
+    ordering = (Project.likes.desc(), Project.created_at.desc(), Project.id.desc())
+    base_time = datetime(2024, 1, 1)
+
+    print(f"{'projects':>9} {'all() ms':>9} {'offset ms':>10} {'page1 ms':>9} {'deep ms':>8} {'api ms':>7}")
+    with app.app_context():
+        for size in sorted(args.sizes):
+            missing = size - Project.query.filter_by(status='published').count()
+            for start in range(0, max(missing, 0), 5000):
+                rows = [{
+                    'id': str(uuid.uuid4()),
+                    'title': f'Project {start + i}',
+                    'description': 'Benchmark project ' * 20,
+                    'tags': ['bench'],
+                    'status': 'published',
+                    'likes': random.randint(0, 500),
+                    'created_at': base_time + timedelta(seconds=random.randint(0, 10 ** 7)),
+                } for i in range(min(5000, missing - start))]
+                db.session.execute(insert(Project), rows)
+                db.session.commit()
+
+            published = Project.query.filter_by(status='published')
+            deep_offset = max(size - per_page, 0)
+            last_row = published.order_by(*ordering).offset(max(deep_offset - 1, 0)).first()
+            deep_cursor = encode_cursor([last_row.likes, last_row.created_at, last_row.id])
+
+            load_all = timed(lambda: published.order_by(*ordering).all(), args.repeat)
+            offset = timed(lambda: published.order_by(*ordering).offset(deep_offset).limit(per_page).all(), args.repeat)
+            db.session.remove()
+
+            page1 = timed(lambda: client.get('/projects'), args.repeat)
+            deep = timed(lambda: client.get(f'/projects?cursor={deep_cursor}'), args.repeat)
+            api = timed(lambda: client.get(f'/api/projects?cursor={deep_cursor}'), args.repeat)
+            print(f"{size:>9} {load_all:>9.1f} {offset:>10.1f} {page1:>9.1f} {deep:>8.1f} {api:>7.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Read replica routing (utils/db_routing.py) with SQLite files as stand-ins.
+
+The seeded primary is copied to --replicas files, and a replicator thread
+re-copies it (sqlite3 backup API) every --replicate-interval seconds, so
+the replicas trail the primary like asynchronous streaming replicas do.
+Point DATABASE_URL and DATABASE_REPLICA_URLS at real PostgreSQL servers to
+skip the copying and measure those instead.
+
+1. Throughput: public GET pages under closed-loop load while a member posts
+   comments, once against the primary alone and once with replicas.
+2. Read-after-write: the member posts a comment and reloads the page at
+   once; an anonymous visitor loads it at the same moment. The member must
+   always see it (read-primary cookie); the visitor may not yet.
+3. Lag fallback: replication stops, and the replicas' lag and the engine
+   serving reads are followed through /admin/metrics/prometheus until reads
+   move to the primary, then replication resumes and they move back.
+
+    python benchmarks/bench_replicas.py --replicas 2 --clients 8 --duration 10
+"""
+
+import argparse
+import http.client
+import os
+import re
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.bench_comment_latency import free_port, percentile
+from benchmarks.bench_events import log_in
+from benchmarks.load_test import run_level, seed_database, start_server
+
+METRICS_TOKEN = 'bench-replicas'
+
+
+class Replicator(threading.Thread):
+    """Copies the primary SQLite file onto each replica file periodically"""
+
+    def __init__(self, primary, replicas, interval):
+        super().__init__(daemon=True)
+        self.primary, self.replicas, self.interval = primary, replicas, interval
+        self.paused = threading.Event()
+
+    def copy(self):
+        source = sqlite3.connect(self.primary, timeout=30)
+        try:
+            for path in self.replicas:
+                target = sqlite3.connect(path, timeout=30)
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+        finally:
+            source.close()
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            if not self.paused.is_set():
+                self.copy()
+
+
+def commenter(port, cookie, project_id, stop, interval):
+    """Posts a comment every ``interval`` seconds until ``stop`` is set"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    i = 0
+    while not stop.wait(interval):
+        i += 1
+        conn.request('POST', f'/project/{project_id}/comment', body=urllib.parse.urlencode({'comment': f'load {i}'}),
+                     headers={'Content-Type': 'application/x-www-form-urlencoded', 'Cookie': cookie})
+        conn.getresponse().read()
+
+
+def get(port, path, headers=None):
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    conn.request('GET', path, headers=headers or {})
+    response = conn.getresponse()
+    return response.status, response.read(), response
+
+
+def scrape(port):
+    """Replica lag, health and routed counts from the Prometheus endpoint"""
+    _, body, _ = get(port, '/admin/metrics/prometheus', {'Authorization': f'Bearer {METRICS_TOKEN}'})
+    samples = {}
+    for line in body.decode().splitlines():
+        match = re.match(r'(portfolio_db_(?:replica_lag_seconds|replica_healthy|routed_requests_total))'
+                         r'\{engine="([^"]+)".*\} (\S+)', line)
+        if match:
+            samples[match.group(1), match.group(2)] = float(match.group(3))
+    return samples
+
+
+def measure(label, port, requests, args, member, project_id):
+    stop = threading.Event()
+    writer = threading.Thread(target=commenter, args=(port, member, project_id, stop, args.write_interval),
+                              daemon=True)
+    writer.start()
+    latencies, errors = run_level(port, requests, args.clients, args.duration)
+    stop.set()
+    writer.join()
+    print(f"  {label:<22} {len(latencies) / args.duration:8.1f} req/s   p50 {percentile(latencies, 50) * 1000:6.1f} ms"
+          f"   p95 {percentile(latencies, 95) * 1000:6.1f} ms   {len(errors)} errors")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--replicas', type=int, default=2)
+    parser.add_argument('--projects', type=int, default=500)
+    parser.add_argument('--clients', type=int, default=8, help='concurrent readers')
+    parser.add_argument('--duration', type=float, default=10.0, help='seconds per throughput run')
+    parser.add_argument('--write-interval', type=float, default=0.2, help='seconds between comments during load')
+    parser.add_argument('--replicate-interval', type=float, default=1.0, help='seconds between replica copies')
+    parser.add_argument('--max-lag', type=float, default=3.0, help='DATABASE_REPLICA_MAX_LAG')
+    parser.add_argument('--rounds', type=int, default=10, help='read-after-write rounds')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    primary = os.path.join(workdir, 'primary.db')
+    database_url = f'sqlite:///{primary}'
+    project_id = seed_database(database_url, args.projects)
+    code = ("from benchmarks.seed import create_benchmark_app\napp = create_benchmark_app()\n"
+            "from models.models import User\nwith app.app_context():\n"
+            "    print(User.query.filter_by(is_admin=False).first().email)\n")
+    member_email = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, capture_output=True, text=True,
+                                  env=dict(os.environ, DATABASE_URL=database_url), check=True).stdout.split()[-1]
+    replica_files = [os.path.join(workdir, f'replica_{i}.db') for i in range(args.replicas)]
+    for path in replica_files:
+        shutil.copyfile(primary, path)
+
+    env = dict(os.environ, DATABASE_URL=database_url, LIKES_ROLLUP_INTERVAL='0', MAIL_DELIVERY='sync',
+               LOG_LEVEL='WARNING', RATE_LIMIT_STORE='none', METRICS_SAMPLE_RATE='0', PAGE_CACHE_BACKEND='none',
+               SSE_BACKEND='none', WEB_CONCURRENCY='1', METRICS_TOKEN=METRICS_TOKEN,
+               # Recycling the worker would reset the counters read from Prometheus
+               GUNICORN_MAX_REQUESTS='0',
+               DATABASE_REPLICA_MAX_LAG=str(args.max_lag), DATABASE_REPLICA_CHECK_INTERVAL='0.5')
+    requests = [
+        ('GET', '/', None),
+        ('GET', '/projects', None),
+        ('GET', f'/project/{project_id}', None),
+        ('GET', '/api/projects', None),
+        ('GET', '/api/search?q=python', None),
+        ('GET', '/about', None),
+    ]
+    from benchmarks.seed import SEED_PASSWORD
+
+    print(f"Public reads, {args.clients} clients, a comment every {args.write_interval:g} s "
+          f"(gthread, 1 worker, SQLite)")
+    port = free_port()
+    server = start_server('gthread', port, dict(env, DATABASE_REPLICA_URLS=''))
+    try:
+        measure('primary only', port, requests, args, log_in(port, member_email, SEED_PASSWORD), project_id)
+    finally:
+        server.terminate()
+        server.wait()
+
+    replicator = Replicator(primary, replica_files, args.replicate_interval)
+    replicator.start()
+    port = free_port()
+    server = start_server('gthread', port, dict(env, DATABASE_REPLICA_URLS=','.join(
+        f'sqlite:///{path}' for path in replica_files)))
+    try:
+        member = log_in(port, member_email, SEED_PASSWORD)
+        # Let the monitor see the replicas before measuring
+        deadline = time.time() + 10
+        while time.time() < deadline and not all(
+                scrape(port).get(('portfolio_db_replica_healthy', f'replica_{i}')) for i in range(args.replicas)):
+            time.sleep(0.5)
+        measure(f'{args.replicas} replicas', port, requests, args, member, project_id)
+        routed = {engine: count for (name, engine), count in scrape(port).items()
+                  if name == 'portfolio_db_routed_requests_total'}
+        print(f"  routed: {', '.join(f'{engine} {count:.0f}' for engine, count in sorted(routed.items()))}")
+
+        print(f"\nRead-after-write, replicas copied every {args.replicate_interval:g} s")
+        member_saw = visitor_saw = 0
+        for i in range(args.rounds):
+            marker = f'raw-{i}-{time.time_ns()}'
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+            conn.request('POST', f'/project/{project_id}/comment', body=urllib.parse.urlencode({'comment': marker}),
+                         headers={'Content-Type': 'application/x-www-form-urlencoded', 'Cookie': member})
+            response = conn.getresponse()
+            response.read()
+            sticky = response.getheader('Set-Cookie', '').split(';', 1)[0]
+            member_saw += marker.encode() in get(port, f'/project/{project_id}',
+                                                 {'Cookie': f'{member}; {sticky}'})[1]
+            visitor_saw += marker.encode() in get(port, f'/project/{project_id}')[1]
+        print(f"  new comment on the next page load: member {member_saw}/{args.rounds}, "
+              f"anonymous visitor {visitor_saw}/{args.rounds}")
+
+        print(f"\nLag fallback, DATABASE_REPLICA_MAX_LAG={args.max_lag:g} s")
+        print(f"{'t (s)':>6} {'lag (s)':>8} {'healthy':>8}  reads served by (last second)")
+        replicator.paused.set()
+        start = time.time()
+        previous = scrape(port)
+        for second in range(int(args.max_lag * 2) + 8):
+            if second == int(args.max_lag) + 4:
+                replicator.paused.clear()
+                print("       -- replication resumed --")
+            for _ in range(10):
+                get(port, '/api/projects')
+            time.sleep(max(0.0, start + second + 1 - time.time()))
+            samples = scrape(port)
+            served = {engine: samples[name, engine] - previous.get((name, engine), 0)
+                      for name, engine in samples if name == 'portfolio_db_routed_requests_total'}
+            previous = samples
+            lag = samples.get(('portfolio_db_replica_lag_seconds', 'replica_0'))
+            healthy = samples.get(('portfolio_db_replica_healthy', 'replica_0'))
+            print(f"{time.time() - start:6.1f} {lag if lag is not None else float('nan'):8.1f} "
+                  f"{'yes' if healthy else 'no':>8}  "
+                  + ', '.join(f'{engine} {count:.0f}' for engine, count in sorted(served.items()) if count))
+    finally:
+        server.terminate()
+        server.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
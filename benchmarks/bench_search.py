@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Search latency as the catalogue grows: full-text index vs a LIKE scan.
+
+For each size the database is seeded (which rebuilds the search index), then
+/api/search is timed through the test client for a few queries, next to the
+equivalent case-insensitive LIKE query over title, description and tags
+(unranked, so it can stop early on common terms but scans every row for
+selective ones).
+
+    python benchmarks/bench_search.py --sizes 1000 10000 50000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Seeded descriptions are built from the tag names, so the first two match most
+# rows (ranking cost grows with the match count); the last two are selective
+QUERIES = ['python', 'full stack', 'projeto 4242', 'kubernetes']
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 50000])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        db_path = os.path.join(tempfile.mkdtemp(), 'bench_search.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['LIKES_ROLLUP_INTERVAL'] = '0'
+    os.environ['MAIL_DELIVERY'] = 'sync'
+
+    from sqlalchemy import String, cast, or_
+    from models.models import db, Project
+    from benchmarks.seed import create_benchmark_app, seed
+
+    app = create_benchmark_app()
+
+    client = app.test_client()
+
+    def like_scan(query):
+        clauses = []
+        for word in query.split():
+            pattern = f'%{word}%'
+            clauses.append(or_(Project.title.ilike(pattern), Project.description.ilike(pattern),
+                               cast(Project.tags, String).ilike(pattern)))
+        return (Project.query.filter(Project.status == 'published', *clauses)
+                .order_by(Project.likes.desc()).limit(20).all())
+
+    print(f"{'projects':>9} {'query':>12} {'hits':>5} {'index ms':>9} {'LIKE ms':>8}")
+    for size in sorted(args.sizes):
+        with app.app_context():
+            seed(projects=size, achievements=size // 20)
+        for query in QUERIES:
+            hits = len(client.get('/api/search', query_string={'q': query}).json['results'])
+            index_ms = timed(lambda: client.get('/api/search', query_string={'q': query}), args.repeat)
+            with app.app_context():
+                like_ms = timed(lambda: like_scan(query), args.repeat)
+                db.session.remove()
+            print(f"{size:>9} {query:>12} {hits:>5} {index_ms:>9.2f} {like_ms:>8.2f}")
+
+
+if __name__ == '__main__':
+    main()
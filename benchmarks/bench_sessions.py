@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Per-request cost of each session backend (utils/sessions.py).
+
+Each backend runs in a fresh process against the same seeded database and
+times the same requests through the test client: a visitor without a
+cookie, a logged-in member and an admin. "cookie" is Flask's signed cookie
+session, i.e. the cost before sessions moved server side; the difference to
+it is the store lookup plus loading the current user. The size of the
+session cookie after login is reported too.
+
+    python benchmarks/bench_sessions.py --backends cookie database filesystem memory
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+ADMIN_EMAIL = 'admin@portfolio.com'
+ADMIN_PASSWORD = 'admin123'
+# (label, client, path); /contact renders the full layout but touches no other table
+REQUESTS = [
+    ('visitor /contact', 'anonymous', '/contact'),
+    ('member /contact', 'member', '/contact'),
+    ('admin /admin/cache/stats', 'admin', '/admin/cache/stats'),
+    ('static file (member)', 'member', '/static/css/style.css'),
+]
+
+
+def measure(backend, requests):
+    """Child process: time REQUESTS and print the medians as JSON"""
+    os.environ['SESSION_BACKEND'] = backend
+    from benchmarks.seed import create_benchmark_app, SEED_PASSWORD
+    from models.models import User
+
+    app = create_benchmark_app()
+    with app.app_context():
+        member_email = User.query.filter_by(is_admin=False).first().email
+
+    clients = {'anonymous': app.test_client(), 'member': app.test_client(), 'admin': app.test_client()}
+    clients['member'].post('/auth/login', data={'email': member_email, 'password': SEED_PASSWORD})
+    clients['admin'].post('/auth/login', data={'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD})
+    cookie = clients['member'].get_cookie(app.config['SESSION_COOKIE_NAME'])
+
+    results = {'cookie_bytes': len(cookie.value) if cookie else 0}
+    for label, role, path in REQUESTS:
+        client = clients[role]
+        for _ in range(5):
+            client.get(path)
+        samples = []
+        for _ in range(requests):
+            start = time.perf_counter()
+            response = client.get(path)
+            samples.append(time.perf_counter() - start)
+            assert response.status_code == 200, (label, response.status_code)
+        results[label] = statistics.median(samples) * 1000
+    print(json.dumps(results))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--backends', nargs='+', default=['cookie', 'database', 'filesystem', 'memory'])
+    parser.add_argument('--requests', type=int, default=300)
+    parser.add_argument('--child', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_sessions.db')}"
+    os.environ.update({'LIKES_ROLLUP_INTERVAL': '0', 'PAGE_CACHE_BACKEND': 'none', 'MAIL_DELIVERY': 'sync',
+                       'RATE_LIMIT_STORE': 'none', 'METRICS_SAMPLE_RATE': '0', 'LOG_LEVEL': 'WARNING'})
+    os.environ.setdefault('SESSION_DIR', tempfile.mkdtemp())
+
+    if args.child:
+        measure(args.child, args.requests)
+        return
+
+    code = ("from benchmarks.seed import create_benchmark_app, seed\napp = create_benchmark_app()\n"
+            "with app.app_context():\n"
+            "    seed(users=1000, projects=200, comments=400, achievements=20)\n")
+    subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, check=True, capture_output=True)
+
+    results = {}
+    for backend in args.backends:
+        output = subprocess.run([sys.executable, __file__, '--child', backend, '--requests', str(args.requests)],
+                                cwd=REPO_ROOT, check=True, capture_output=True, text=True).stdout
+        results[backend] = json.loads(output.strip().splitlines()[-1])
+
+    print("median ms per request (test client)")
+    print(f"{'request':<26}" + ''.join(f"{backend:>12}" for backend in args.backends))
+    for label, _, _ in REQUESTS:
+        print(f"{label:<26}" + ''.join(f"{results[backend][label]:>12.3f}" for backend in args.backends))
+    print(f"{'session cookie bytes':<26}" + ''.join(f"{results[backend]['cookie_bytes']:>12}"
+                                                   for backend in args.backends))
+
+
+if __name__ == '__main__':
+    main()
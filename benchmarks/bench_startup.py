@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Cold start: time to import the app, where that time goes, and time to first byte.
+
+* import: fresh interpreters run ``import main`` (which calls create_app())
+  and report create_app()'s phase timings; the wall time includes the
+  interpreter itself.
+* modules: ``python -X importtime`` self time summed per top-level package,
+  i.e. what the import phase is made of.
+* first byte: a one-worker gunicorn is started and polled until ``/``
+  answers, as an autoscaled instance would be on its first request.
+
+The database is initialised once up front (``flask init-db``), as a deploy
+would; workers no longer do schema work themselves.
+
+    python benchmarks/bench_startup.py --runs 5 --server-runs 3
+"""
+
+import argparse
+import http.client
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.bench_comment_latency import free_port
+
+CHILD = (
+    "import json, time\n"
+    "started = time.perf_counter()\n"
+    "import main\n"
+    "from utils.metrics import startup_summary\n"
+    "print(json.dumps(dict(startup_summary(), import_main_ms=(time.perf_counter() - started) * 1000)))\n"
+)
+
+
+def measure_import(env):
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', CHILD], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process_ms'] = (time.perf_counter() - start) * 1000
+    return result
+
+
+def import_profile(env):
+    """Self time (ms) of every module imported by ``import main``, per top-level package"""
+    stderr = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import main'], cwd=REPO_ROOT,
+                            env=env, capture_output=True, text=True, check=True).stderr
+    totals = Counter()
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, _, name = line[len('import time:'):].split('|')
+        totals[name.strip().split('.')[0]] += int(self_us) / 1000
+    return totals
+
+
+def time_to_first_byte(env):
+    port = free_port()
+    env = dict(env, GUNICORN_PROFILE='sync', WEB_CONCURRENCY='1', GUNICORN_BIND=f'127.0.0.1:{port}')
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'main:app'],
+                              cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - start < 60:
+            try:
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+                conn.request('GET', '/')
+                response = conn.getresponse()
+                response.read()
+                if response.status == 200:
+                    return (time.perf_counter() - start) * 1000
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError("gunicorn did not answer within 60 s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5, help='fresh interpreters importing the app')
+    parser.add_argument('--server-runs', type=int, default=3, help='gunicorn starts to first byte (0 skips)')
+    parser.add_argument('--top', type=int, default=12, help='packages listed in the import profile')
+    args = parser.parse_args()
+
+    database_url = os.environ.get('DATABASE_URL') or \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_startup.db')}"
+    env = dict(os.environ, DATABASE_URL=database_url, LIKES_ROLLUP_INTERVAL='0', MAIL_DELIVERY='sync',
+               LOG_LEVEL='WARNING')
+    subprocess.run([sys.executable, '-m', 'flask', '--app', 'main', 'init-db'], cwd=REPO_ROOT, env=env,
+                   capture_output=True, check=True)
+
+    runs = [measure_import(env) for _ in range(args.runs)]
+    print(f"import main (median of {args.runs} fresh interpreters)")
+    print(f"  process wall       {statistics.median(r['process_ms'] for r in runs):8.1f} ms")
+    print(f"  import main        {statistics.median(r['import_main_ms'] for r in runs):8.1f} ms")
+    for phase in runs[0]['phases_ms']:
+        print(f"    {phase:<16} {statistics.median(r['phases_ms'][phase] for r in runs):8.1f} ms")
+
+    print(f"\nimport self time by package (top {args.top})")
+    for package, ms in import_profile(env).most_common(args.top):
+        print(f"  {package:<18} {ms:8.1f} ms")
+
+    if args.server_runs:
+        samples = [time_to_first_byte(env) for _ in range(args.server_runs)]
+        print(f"\ngunicorn start to first byte of / (sync, 1 worker): "
+              f"median {statistics.median(samples):.0f} ms, max {max(samples):.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tag filtering and facet counts: project_tag index vs scanning Project.tags.
+
+Seeds the requested number of projects (seed() rebuilds the tag links), then
+times the facet count query and, for every tag (the common seeded ones and
+the rare sample-data ones), the first page of /api/projects?tag= through the
+test client. Each is compared with the JSON approach it replaces: loading
+every published project and filtering/counting its tags in Python.
+
+    python benchmarks/bench_tags.py --projects 50000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--projects', type=int, default=50000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        db_path = os.path.join(tempfile.mkdtemp(), 'bench_tags.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['LIKES_ROLLUP_INTERVAL'] = '0'
+    os.environ['PAGE_CACHE_BACKEND'] = 'none'
+    os.environ['MAIL_DELIVERY'] = 'sync'
+
+    from sqlalchemy import select
+    from benchmarks.seed import create_benchmark_app
+    from models.models import db, Project
+    from benchmarks.seed import seed
+    from models.models import Tag
+    from utils.tags import tag_facets
+
+    app = create_benchmark_app()
+
+    client = app.test_client()
+    per_page = app.config['PROJECTS_PER_PAGE']
+
+    def json_scan(tag):
+        rows = db.session.execute(
+            select(Project.id, Project.tags).where(Project.status == 'published')
+            .order_by(Project.likes.desc(), Project.created_at.desc(), Project.id.desc())).all()
+        return [project_id for project_id, tags in rows if tag in (tags or [])][:per_page]
+
+    def json_facets():
+        counts = Counter()
+        for tags, in db.session.execute(select(Project.tags).where(Project.status == 'published')):
+            counts.update(tags or [])
+        return counts.most_common(30)
+
+    with app.app_context():
+        print(f"seeded: {seed(projects=args.projects)}")
+        # Seeded tags are common; the sample data's own tags are rare
+        tags = db.session.execute(select(Tag.name, Tag.slug, Tag.published_count)
+                                  .order_by(Tag.published_count.desc())).all()
+        facets_ms = timed(tag_facets, args.repeat)
+        scan_facets_ms = timed(json_facets, args.repeat)
+        db.session.remove()
+    print(f"facet counts: index {facets_ms:.2f} ms, JSON scan {scan_facets_ms:.2f} ms\n")
+
+    print(f"{'tag':>22} {'projects':>9} {'index ms':>9} {'JSON scan ms':>13}")
+    for tag, slug, count in tags:
+        index_ms = timed(lambda: client.get('/api/projects', query_string={'tag': slug}), args.repeat)
+        with app.app_context():
+            scan_ms = timed(lambda: json_scan(tag), args.repeat)
+            db.session.remove()
+        print(f"{tag:>22} {count:>9} {index_ms:>9.2f} {scan_ms:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
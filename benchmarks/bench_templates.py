@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Template compilation and fragment caching (utils/templating.py).
+
+1. Cold worker: a fresh process loads every template, once compiling them
+   from source (TEMPLATE_BYTECODE_CACHE=none) and once from a warm bytecode
+   cache directory, as a newly forked gunicorn worker would.
+2. A 500-card page: index.html rendered with --cards published projects,
+   without the fragment cache, with every card cached, and after
+   --changed of the projects were updated (those cards render again).
+
+    python benchmarks/bench_templates.py --cards 500 --repeat 20
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+LOAD_TEMPLATES = """
+import time
+from app import create_app
+app = create_app()
+env = app.jinja_env
+start = time.perf_counter()
+for name in env.list_templates(extensions=['html']):
+    env.get_template(name)
+print(time.perf_counter() - start)
+"""
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    return statistics.median(samples) * 1000
+
+
+def cold_load(env, runs):
+    """Median seconds to load every template in a fresh process"""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, '-c', LOAD_TEMPLATES], cwd=REPO_ROOT, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        samples.append(float(output.split()[-1]))
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--cards', type=int, default=500)
+    parser.add_argument('--changed', type=float, default=0.1, help='share of projects updated between renders')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--cold-runs', type=int, default=5)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(workdir, 'bench_templates.db')}")
+    os.environ.update(LIKES_ROLLUP_INTERVAL='0', PAGE_CACHE_BACKEND='none', LOG_LEVEL='WARNING',
+                      MAIL_DELIVERY='sync', TEMPLATE_BYTECODE_CACHE_DIR=os.path.join(workdir, 'bytecode'))
+
+    from benchmarks.seed import create_benchmark_app, seed
+    from flask import render_template
+    from sqlalchemy import update
+    from models.models import db, Project
+    from utils import templating
+    from utils.page_cache import MemoryBackend
+
+    app = create_benchmark_app()
+    with app.app_context():
+        seed(projects=args.cards, published_ratio=1.0)
+
+    try:
+        print("Loading every template in a fresh process")
+        compiled = cold_load(dict(os.environ, TEMPLATE_BYTECODE_CACHE='none'), args.cold_runs)
+        cold_load(dict(os.environ), 1)  # fills the bytecode cache
+        cached = cold_load(dict(os.environ), args.cold_runs)
+        print(f"  compiled from source   {compiled * 1000:7.1f} ms")
+        print(f"  from bytecode cache    {cached * 1000:7.1f} ms   ({compiled / cached:.1f}x)")
+
+        with app.test_request_context('/projects'):
+            projects = (Project.query.filter_by(status='published')
+                        .order_by(Project.likes.desc(), Project.created_at.desc()).limit(args.cards).all())
+
+            def render():
+                return render_template('index.html', projects=projects, show_all=True)
+
+            templating._fragments = None
+            uncached = timed(render, args.repeat)
+            page = render()
+
+            templating._fragments = MemoryBackend(args.cards * 4)
+            start = time.perf_counter()
+            first = render()
+            cold = (time.perf_counter() - start) * 1000
+            assert first == page, "cached rendering differs from the uncached one"
+            warm = timed(render, args.repeat)
+
+            changed = [project.id for project in projects[:max(1, int(len(projects) * args.changed))]]
+            db.session.execute(update(Project).where(Project.id.in_(changed))
+                               .values(likes=Project.likes + 1))
+            db.session.commit()
+            projects = (Project.query.filter_by(status='published')
+                        .order_by(Project.likes.desc(), Project.created_at.desc()).limit(args.cards).all())
+            start = time.perf_counter()
+            render()
+            partial = (time.perf_counter() - start) * 1000
+
+        print(f"\nindex.html with {len(projects)} project cards (median of {args.repeat})")
+        print(f"  no fragment cache      {uncached:7.1f} ms   ({uncached / len(projects) * 1000:.0f} us per card)")
+        print(f"  empty fragment cache   {cold:7.1f} ms   (first render, fills it)")
+        print(f"  all cards cached       {warm:7.1f} ms   ({uncached / warm:.1f}x)")
+        print(f"  {len(changed)} cards updated      {partial:7.1f} ms   (only those render again)")
+        print(f"  {templating.fragment_cache_stats()}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Primary key layouts: String(36) vs compact UUID columns, UUIDv4 vs UUIDv7.
+
+For each combination a project table and a comment table (UUID primary
+key, indexed UUID foreign key, as in models/models.py) are filled with
+--rows comments in batches of --batch, and the insert rate and the size of
+each table and index are reported. Sizes come from SQLite's dbstat or
+PostgreSQL's pg_relation_size (set DATABASE_URL to a PostgreSQL database
+to measure native uuid columns). --cache-kb bounds SQLite's page cache so
+that, as on a real server whose indexes outgrow memory, random keys pay
+for touching pages all over the index.
+
+    python benchmarks/bench_uuid_keys.py --rows 200000
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import uuid
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import Column, DateTime, ForeignKey, Index, MetaData, String, Table, Text, create_engine, event, \
+    insert, text
+
+from models.types import CompactUUID, uuid7
+
+LAYOUTS = [
+    ('String(36) + uuid4', lambda: String(36), lambda: str(uuid.uuid4())),
+    ('String(36) + uuid7', lambda: String(36), lambda: str(uuid7())),
+    ('compact + uuid4', CompactUUID, lambda: str(uuid.uuid4())),
+    ('compact + uuid7', CompactUUID, lambda: str(uuid7())),
+]
+
+
+def tables(id_type):
+    metadata = MetaData()
+    project = Table('bench_project', metadata,
+                    Column('id', id_type(), primary_key=True),
+                    Column('title', String(200), nullable=False))
+    comment = Table('bench_comment', metadata,
+                    Column('id', id_type(), primary_key=True),
+                    Column('project_id', id_type(), ForeignKey('bench_project.id'), nullable=False),
+                    Column('content', Text, nullable=False),
+                    Column('created_at', DateTime, nullable=False),
+                    Index('ix_bench_comment_project', 'project_id'))
+    return metadata, project, comment
+
+
+def relation_sizes(conn):
+    """Bytes per table and index"""
+    if conn.dialect.name == 'postgresql':
+        rows = conn.execute(text(
+            "SELECT c.relname, pg_relation_size(c.oid) FROM pg_class c "
+            "WHERE c.relname LIKE 'bench_%' OR c.relname LIKE 'ix_bench_%'"))
+    else:
+        rows = conn.execute(text(
+            "SELECT name, sum(pgsize) FROM dbstat WHERE name LIKE 'bench_%' OR name LIKE 'ix_bench_%' "
+            "OR name LIKE 'sqlite_autoindex_bench_%' GROUP BY name"))
+    return dict(rows.all())
+
+
+def run(database_url, label, id_type, make_id, args):
+    engine = create_engine(database_url)
+    if engine.dialect.name == 'sqlite':
+        @event.listens_for(engine, 'connect')
+        def _pragmas(dbapi_connection, record):
+            dbapi_connection.execute(f'PRAGMA cache_size = -{args.cache_kb}')
+
+    metadata, project, comment = tables(id_type)
+    metadata.drop_all(engine)
+    metadata.create_all(engine)
+    rng = random.Random(1)
+    base = datetime(2024, 1, 1)
+    with engine.begin() as conn:
+        project_ids = [make_id() for _ in range(args.projects)]
+        conn.execute(insert(project), [{'id': pid, 'title': f'Project {i}'} for i, pid in enumerate(project_ids)])
+
+    started = time.perf_counter()
+    for start in range(0, args.rows, args.batch):
+        rows = [{'id': make_id(), 'project_id': rng.choice(project_ids), 'content': 'Comentário de teste',
+                 'created_at': base + timedelta(seconds=start + i)}
+                for i in range(min(args.batch, args.rows - start))]
+        with engine.begin() as conn:
+            conn.execute(insert(comment), rows)
+    elapsed = time.perf_counter() - started
+
+    with engine.connect() as conn:
+        sizes = relation_sizes(conn)
+    metadata.drop_all(engine)
+    engine.dispose()
+
+    # SQLite keeps a non-integer primary key in a separate autoindex
+    primary_key = sizes.get('sqlite_autoindex_bench_comment_1') or sizes.get('bench_comment_pkey', 0)
+    print(f"{label:<20} {args.rows / elapsed:>10.0f} {sizes.get('bench_comment', 0) / 2**20:>9.1f} "
+          f"{primary_key / 2**20:>8.1f} {sizes.get('ix_bench_comment_project', 0) / 2**20:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000, help='comments inserted per layout')
+    parser.add_argument('--projects', type=int, default=2000)
+    parser.add_argument('--batch', type=int, default=500, help='rows per transaction')
+    parser.add_argument('--cache-kb', type=int, default=2048, help='SQLite page cache')
+    args = parser.parse_args()
+
+    database_url = os.environ.get('DATABASE_URL')
+    if not database_url or database_url.startswith('sqlite'):
+        database_url = None
+    print(f"{args.rows} comments over {args.projects} projects, {args.batch} per transaction")
+    print(f"{'layout':<20} {'rows/s':>10} {'table MB':>9} {'pk MB':>8} {'fk MB':>8}")
+    for label, id_type, make_id in LAYOUTS:
+        url = database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench_uuid_keys.db')}"
+        run(url, label, id_type, make_id, args)
+
+
+if __name__ == '__main__':
+    main()
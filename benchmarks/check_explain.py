@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+EXPLAIN-based index check for every route's SELECT statements.
+
+Seeds a large data set, drives the public, auth and admin routes through the
+test client while capturing each SELECT, then EXPLAINs the captured statements
+with their real parameters. It fails when a query on a seeded table can only
+be answered with a sequential scan:
+
+* SQLite: a "SCAN <table>" step without "USING ... INDEX";
+* PostgreSQL: a "Seq Scan" node even with enable_seqscan turned off, i.e. the
+  planner has no index path at all.
+
+    python benchmarks/check_explain.py --projects 20000 --comments 50000
+"""
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Tables that hold a handful of rows by design
+IGNORED_TABLES = {'about_info', 'schema_migration'}
+
+# Endpoints allowed to scan, with the reason
+ALLOWED_ENDPOINTS = {}
+
+SQLITE_SCAN = re.compile(r'^SCAN (?:TABLE )?"?(\w+)"?(?: AS \w+)?$')
+
+
+def sqlite_seq_scans(cursor, statement, parameters):
+    cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+    scans = []
+    for row in cursor.fetchall():
+        match = SQLITE_SCAN.match(row[-1])
+        if match:
+            scans.append(match.group(1))
+    return scans
+
+
+def postgres_seq_scans(cursor, statement, parameters):
+    cursor.execute('SET enable_seqscan = off')
+    cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+    plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        import json
+        plan = json.loads(plan)
+
+    scans = []
+
+    def walk(node):
+        if node.get('Node Type') == 'Seq Scan':
+            scans.append(node.get('Relation Name'))
+        for child in node.get('Plans', []):
+            walk(child)
+
+    walk(plan[0]['Plan'])
+    return scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=5000)
+    parser.add_argument('--projects', type=int, default=20000)
+    parser.add_argument('--comments', type=int, default=50000)
+    parser.add_argument('--achievements', type=int, default=2000)
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        db_path = os.path.join(tempfile.mkdtemp(), 'check_explain.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['LIKES_ROLLUP_INTERVAL'] = '0'
+    os.environ['PAGE_CACHE_BACKEND'] = 'none'
+    os.environ['MAIL_DELIVERY'] = 'sync'
+
+    from flask import has_request_context, request
+    from sqlalchemy import event, select, text
+    from models.models import db, User, Project, Achievement
+    from benchmarks.seed import create_benchmark_app, seed, SEED_PASSWORD
+
+    app = create_benchmark_app()
+
+    captured = []
+
+    with app.app_context():
+        totals = seed(users=args.users, projects=args.projects,
+                      comments=args.comments, achievements=args.achievements)
+        print(f"seeded: {totals}")
+        dialect = db.engine.dialect.name
+        with db.engine.begin() as conn:
+            conn.execute(text('ANALYZE'))
+
+        admin = User.query.filter_by(is_admin=True).first()
+        visitor = User.query.filter_by(is_admin=False).first()
+        project_id = db.session.execute(
+            select(Project.id).where(Project.status == 'published')).scalars().first()
+        achievement_id = db.session.execute(select(Achievement.id)).scalars().first()
+        admin_id, visitor_email = admin.id, visitor.email
+        tables = set(db.metadata.tables) - IGNORED_TABLES
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def capture(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith('SELECT') and has_request_context():
+                captured.append((request.endpoint, statement, parameters))
+
+    anonymous = app.test_client()
+    anonymous.get('/')
+    anonymous.get('/projects')
+    cursor = anonymous.get('/api/projects').json['next_cursor']
+    anonymous.get(f'/projects?cursor={cursor}')
+    anonymous.get(f'/api/projects?cursor={cursor}')
+    anonymous.get('/projects?tag=python')
+    anonymous.get('/api/projects?tag=e-commerce')
+    anonymous.get(f'/project/{project_id}')
+    anonymous.get(f'/project/{project_id}?page=2')
+    anonymous.get('/about')
+    anonymous.get('/contact')
+    anonymous.get('/api/search?q=python web')
+    anonymous.get('/search?q=conquista')
+    anonymous.post('/auth/login', data={'email': visitor_email, 'password': 'wrong'})
+
+    member = app.test_client()
+    member.post('/auth/login', data={'email': visitor_email, 'password': SEED_PASSWORD})
+    member.post(f'/project/{project_id}/like')
+    member.post(f'/project/{project_id}/comment', data={'comment': 'EXPLAIN check'})
+
+    admin_client = app.test_client()
+    with admin_client.session_transaction() as sess:
+        sess['user_id'] = admin_id
+    admin_client.get('/admin/dashboard')
+    admin_cursor = None
+    for _ in range(2):
+        response = admin_client.get('/admin/projects' + (f'?cursor={admin_cursor}' if admin_cursor else ''))
+        match = re.search(rb'cursor=([\w-]+)', response.data)
+        admin_cursor = match.group(1).decode() if match else None
+    admin_client.get(f'/admin/projects/{project_id}/edit')
+    admin_client.get('/admin/achievements')
+    admin_client.get(f'/admin/achievements/{achievement_id}/edit')
+    admin_client.get('/admin/profile')
+
+    failures = []
+    checked = set()
+    explain = sqlite_seq_scans if dialect == 'sqlite' else postgres_seq_scans
+    with app.app_context():
+        raw = db.engine.raw_connection()
+        try:
+            dbapi_cursor = raw.cursor()
+            for endpoint, statement, parameters in captured:
+                key = (endpoint, statement)
+                if key in checked:
+                    continue
+                checked.add(key)
+                scans = [table for table in explain(dbapi_cursor, statement, parameters) if table in tables]
+                if not scans:
+                    continue
+                if endpoint in ALLOWED_ENDPOINTS:
+                    print(f"allowed  {endpoint}: scan of {', '.join(scans)} ({ALLOWED_ENDPOINTS[endpoint]})")
+                    continue
+                failures.append((endpoint, scans, statement))
+        finally:
+            raw.close()
+
+    print(f"checked {len(checked)} distinct statements on {dialect}")
+    for endpoint, scans, statement in failures:
+        print(f"\nSEQ SCAN {endpoint}: {', '.join(scans)}\n  {' '.join(statement.split())}")
+    if failures:
+        return 1
+    print("OK: every route query is index-backed")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
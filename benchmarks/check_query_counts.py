@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Query-count regression check for pages that list comments.
+
+Renders project_detail and the admin dashboard for projects with a growing
+number of comments (each by a different author) and fails when the number of
+SQL statements per request changes with the comment count, i.e. when an N+1
+lazy load sneaks back in.
+
+    python benchmarks/check_query_counts.py
+"""
+
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COMMENT_COUNTS = (1, 10, 50)
+
+# A lazy load of Comment.user: SELECT ... FROM user WHERE user.id = ?
+LAZY_USER_LOAD = re.compile(r'FROM "?user"?\s+WHERE "?user"?\.id = ', re.IGNORECASE)
+
+
+def main():
+    if not os.environ.get('DATABASE_URL'):
+        db_path = os.path.join(tempfile.mkdtemp(), 'check_queries.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['LIKES_ROLLUP_INTERVAL'] = '0'
+    os.environ['MAIL_DELIVERY'] = 'sync'
+
+    from sqlalchemy import event
+    from benchmarks.seed import create_benchmark_app
+    from models.models import db, User, Project, Comment
+
+    app = create_benchmark_app()
+
+    statements = []
+
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement))
+        admin = User.query.filter_by(is_admin=True).first()
+        admin_id = admin.id
+
+        project_ids = {}
+        for count in COMMENT_COUNTS:
+            project = Project(title=f'{count} comments', description='-', status='published')
+            db.session.add(project)
+            for i in range(count):
+                author = User(name=f'Author {count}-{i}', email=f'author-{count}-{i}@example.com')
+                author.password_hash = '-'
+                db.session.add(author)
+                db.session.add(Comment(content=f'Comment {i}', project=project, user=author))
+            db.session.commit()
+            project_ids[count] = project.id
+
+    client = app.test_client()
+    with client.session_transaction() as sess:
+        # A logged-in session bypasses the page cache
+        sess['user_id'] = admin_id
+
+    def count_statements(url):
+        statements.clear()
+        response = client.get(url)
+        assert response.status_code == 200, (url, response.status_code)
+        return len(statements)
+
+    failed = False
+    detail_counts = {count: count_statements(f'/project/{project_ids[count]}') for count in COMMENT_COUNTS}
+    print(f"project_detail statements by comment count: {detail_counts}")
+    if len(set(detail_counts.values())) != 1:
+        print("FAIL: project_detail query count grows with comments")
+        failed = True
+
+    dashboard_count = count_statements('/admin/dashboard')
+    print(f"admin.dashboard statements: {dashboard_count}")
+    # Dashboard comment authors must come from the same query as the comments;
+    # the one user loaded by primary key is the logged-in admin (current_user)
+    lazy_user_loads = [s for s in statements if LAZY_USER_LOAD.search(s)][1:]
+    if lazy_user_loads:
+        print(f"FAIL: dashboard lazily loads {len(lazy_user_loads)} comment authors")
+        failed = True
+
+    if failed:
+        return 1
+    print("OK: query counts are constant")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Upgrade check: a database created by the original code, brought to the
+current schema by ``init_db()`` (``flask init-db``).
+
+Creates the original five tables (36-character text ids, foreign keys that
+were never enforced on SQLite), fills them with a few users, projects,
+comments and achievements, runs init_db() and fails when it raises, when
+a migration is left unapplied, when a model's table or column is missing,
+when a foreign key is left dangling or when the counters, tag counts and
+pages disagree with the data.
+
+Uses a temporary SQLite file unless DATABASE_URL names an empty database
+(e.g. a scratch PostgreSQL database), so both dialects can be checked.
+
+    python benchmarks/check_upgrade.py
+"""
+
+import os
+import sys
+import tempfile
+import uuid
+from datetime import date, datetime
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+ADMIN_PASSWORD = 'admin123'
+
+PROJECTS = [
+    ('Portfolio', 'published', ['Python', 'Flask'], 2),
+    ('Dashboard', 'published', ['React', 'Python'], 3),
+    ('Rascunho', 'draft', ['Python'], 1),
+]
+
+
+def baseline_tables(metadata):
+    """The tables as the original models declared them"""
+    from sqlalchemy import JSON, Boolean, Column, Date, DateTime, ForeignKey, Integer, String, Table, Text
+
+    def id_column():
+        return Column('id', String(36), primary_key=True)
+
+    return {
+        'user': Table(
+            'user', metadata, id_column(),
+            Column('name', String(100), nullable=False),
+            Column('email', String(120), unique=True, nullable=False),
+            Column('password_hash', String(256), nullable=False),
+            Column('is_admin', Boolean),
+            Column('profile_image', String(255)),
+            Column('created_at', DateTime)),
+        'project': Table(
+            'project', metadata, id_column(),
+            Column('title', String(200), nullable=False),
+            Column('description', Text, nullable=False),
+            Column('tags', JSON),
+            Column('status', String(20)),
+            Column('link', String(500)),
+            Column('image', String(255)),
+            Column('likes', Integer),
+            Column('created_at', DateTime)),
+        'achievement': Table(
+            'achievement', metadata, id_column(),
+            Column('title', String(200), nullable=False),
+            Column('description', Text, nullable=False),
+            Column('date', Date, nullable=False),
+            Column('created_at', DateTime)),
+        'comment': Table(
+            'comment', metadata, id_column(),
+            Column('content', Text, nullable=False),
+            Column('user_id', String(36), ForeignKey('user.id'), nullable=False),
+            Column('project_id', String(36), ForeignKey('project.id'), nullable=False),
+            Column('created_at', DateTime)),
+        'about_info': Table(
+            'about_info', metadata,
+            Column('id', Integer, primary_key=True),
+            Column('title', String(200), nullable=False),
+            Column('description', Text, nullable=False),
+            Column('skills', JSON),
+            Column('contact_email', String(120), nullable=False),
+            Column('updated_at', DateTime)),
+    }
+
+
+def create_baseline(url):
+    """The original schema and data; returns what was written"""
+    from sqlalchemy import MetaData, create_engine, inspect
+    from werkzeug.security import generate_password_hash
+
+    engine = create_engine(url)
+    if inspect(engine).get_table_names():
+        engine.dispose()
+        sys.exit(f"{url} is not empty")
+    metadata = MetaData()
+    tables = baseline_tables(metadata)
+    metadata.create_all(engine)
+
+    now = datetime(2024, 1, 1)
+    users = [{'id': str(uuid.uuid4()), 'name': 'Admin', 'email': 'admin@portfolio.com', 'is_admin': True,
+              'password_hash': generate_password_hash(ADMIN_PASSWORD), 'created_at': now}]
+    users += [{'id': str(uuid.uuid4()), 'name': f'Visitante {i}', 'email': f'visitante{i}@example.com',
+               'is_admin': False, 'password_hash': generate_password_hash('visitante'), 'created_at': now}
+              for i in range(3)]
+    projects, comments = [], []
+    for title, status, tags, comment_count in PROJECTS:
+        project = {'id': str(uuid.uuid4()), 'title': title, 'description': f'Descrição de {title}. ' * 40,
+                   'tags': tags, 'status': status, 'likes': comment_count, 'created_at': now}
+        projects.append(project)
+        comments += [{'id': str(uuid.uuid4()), 'content': f'Comentário {i}', 'user_id': users[1 + i % 3]['id'],
+                      'project_id': project['id'], 'created_at': now} for i in range(comment_count)]
+    with engine.begin() as conn:
+        conn.execute(tables['user'].insert(), users)
+        conn.execute(tables['project'].insert(), projects)
+        conn.execute(tables['comment'].insert(), comments)
+        if conn.dialect.name == 'sqlite':
+            # Left behind by a project deleted outside the ORM; nothing
+            # enforced the key
+            conn.execute(tables['comment'].insert(), {
+                'id': str(uuid.uuid4()), 'content': 'Órfão', 'user_id': users[1]['id'],
+                'project_id': str(uuid.uuid4()), 'created_at': now})
+        conn.execute(tables['achievement'].insert(), {
+            'id': str(uuid.uuid4()), 'title': 'Prêmio', 'description': 'Descrição do prêmio',
+            'date': date(2023, 6, 1), 'created_at': now})
+        conn.execute(tables['about_info'].insert(), {
+            'title': 'Sobre', 'description': 'Sobre mim', 'skills': ['Python'],
+            'contact_email': 'contato@example.com', 'updated_at': now})
+    engine.dispose()
+    return users, projects, comments
+
+
+def main():
+    if not os.environ.get('DATABASE_URL'):
+        db_path = os.path.join(tempfile.mkdtemp(), 'check_upgrade.db')
+        os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    os.environ['LIKES_ROLLUP_INTERVAL'] = '0'
+    os.environ['PAGE_CACHE_BACKEND'] = 'none'
+    os.environ['MAIL_DELIVERY'] = 'sync'
+
+    users, projects, comments = create_baseline(os.environ['DATABASE_URL'])
+
+    from sqlalchemy import func, inspect, select, text
+    from app import create_app, init_db
+    from models.migrations import MIGRATIONS
+    from models.models import db, Comment, Project, Tag
+    from utils.stats import compute_stats, get_stats
+
+    app = create_app()
+    failed = []
+    with app.app_context():
+        applied = init_db()
+        missing = sorted({version for version, _, _ in MIGRATIONS} - set(applied))
+        print(f"applied migrations: {applied}")
+        if missing:
+            failed.append(f"migrations not applied: {missing}")
+
+        inspector = inspect(db.engine)
+        for table in db.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                failed.append(f"table {table.name} missing")
+                continue
+            columns = {column['name'] for column in inspector.get_columns(table.name)}
+            missing = [column.name for column in table.columns if column.name not in columns]
+            if missing:
+                failed.append(f"{table.name} lacks {', '.join(missing)}")
+
+        if db.engine.dialect.name == 'sqlite':
+            dangling = db.session.execute(text('PRAGMA foreign_key_check')).all()
+            if dangling:
+                failed.append(f"dangling foreign keys: {dangling}")
+
+        counted = compute_stats(db.session.connection())
+        stored = get_stats()
+        drift = {name: (stored[name], value) for name, value in counted.items() if stored[name] != value}
+        if drift:
+            failed.append(f"site_stats (stored, counted): {drift}")
+        if counted['total_comments'] != len(comments):
+            failed.append(f"{counted['total_comments']} comments, expected {len(comments)}")
+
+        expected_tags = {}
+        for project in projects:
+            if project['status'] == 'published':
+                for tag in project['tags']:
+                    expected_tags[tag] = expected_tags.get(tag, 0) + 1
+        tag_counts = dict(db.session.execute(select(Tag.name, Tag.published_count)).all())
+        if tag_counts != expected_tags:
+            failed.append(f"tag counts {tag_counts}, expected {expected_tags}")
+
+        if init_db():
+            failed.append("a second init_db() applied migrations again")
+        project_ids = [str(project_id) for project_id in db.session.execute(
+            select(Project.id).where(Project.status == 'published').order_by(Project.title)).scalars()]
+        busiest = db.session.execute(
+            select(Comment.project_id).group_by(Comment.project_id).order_by(func.count().desc())).scalar()
+        db.session.remove()
+
+    client = app.test_client()
+    for path in ['/', '/projects', '/about'] + [f'/project/{project_id}' for project_id in project_ids]:
+        status = client.get(path).status_code
+        if status != 200:
+            failed.append(f"GET {path}: {status}")
+    response = client.post('/auth/login', data={'email': users[0]['email'], 'password': ADMIN_PASSWORD})
+    if response.status_code != 302:
+        failed.append(f"admin login with the original password hash: {response.status_code}")
+    status = client.post(f'/admin/projects/{busiest}/delete').status_code
+    if status != 302:
+        failed.append(f"deleting a project with comments: {status}")
+    with app.app_context():
+        if db.session.scalar(select(func.count()).select_from(Comment).where(Comment.project_id == busiest)):
+            failed.append("the deleted project's comments remain")
+
+    for failure in failed:
+        print(f"FAIL: {failure}")
+    if failed:
+        return 1
+    print("OK: a database created by the original code upgrades cleanly")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
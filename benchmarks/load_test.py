@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Throughput knee of each gunicorn worker profile (see gunicorn.conf.py).
+
+For every profile a real gunicorn server is started against a seeded
+database and driven by closed-loop clients at increasing concurrency. Each
+level reports requests/s and p50/p99 latency; the knee is the last level
+that still raised throughput by more than --knee-gain. With --smtp-delay a
+local SMTP stand-in that sleeps per message is started and one request in
+ten is a contact form POST with inline (MAIL_DELIVERY=sync) delivery, which
+shows how a slow dependency stalls sync workers.
+
+    python benchmarks/load_test.py --profiles sync gthread gevent --levels 1 4 16 64
+"""
+
+import argparse
+import http.client
+import importlib.util
+import logging
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from benchmarks.bench_comment_latency import free_port, percentile, start_smtp_standin
+
+
+def seed_database(database_url, projects):
+    """Seed in a child process so this process never imports the app"""
+    code = (
+        "from benchmarks.seed import create_benchmark_app, seed\n"
+        "app = create_benchmark_app()\n"
+        "from models.models import Project\n"
+        "with app.app_context():\n"
+        f"    seed(users=200, projects={projects}, comments={projects * 2}, achievements=50)\n"
+        "    print(Project.query.filter_by(status='published').first().id)\n"
+    )
+    env = dict(os.environ, DATABASE_URL=database_url, LIKES_ROLLUP_INTERVAL='0', MAIL_DELIVERY='sync')
+    output = subprocess.run([sys.executable, '-c', code], cwd=REPO_ROOT, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    return output.strip().splitlines()[-1]
+
+
+def start_server(profile, port, env):
+    env = dict(env, GUNICORN_PROFILE=profile, GUNICORN_BIND=f'127.0.0.1:{port}')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'main:app'],
+                              cwd=REPO_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=2)
+            conn.request('GET', '/about')
+            if conn.getresponse().status == 200:
+                return server
+        except OSError:
+            time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError(f"gunicorn ({profile}) did not start")
+
+
+def run_level(port, requests, concurrency, duration):
+    """Closed-loop load: each client sends its next request when the last one returns"""
+    latencies, errors = [], []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def client(offset):
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        i = offset
+        local = []
+        while time.perf_counter() < deadline:
+            method, path, body = requests[i % len(requests)]
+            i += 1
+            headers = {'Content-Type': 'application/x-www-form-urlencoded'} if body else {}
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body=body, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                if response.status >= 500:
+                    raise RuntimeError(response.status)
+                local.append(time.perf_counter() - start)
+            except Exception as e:
+                with lock:
+                    errors.append(e)
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--profiles', nargs='+', default=['sync', 'gthread', 'gevent'])
+    parser.add_argument('--levels', type=int, nargs='+', default=[1, 2, 4, 8, 16, 32, 64])
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds per concurrency level')
+    parser.add_argument('--workers', type=int, default=2, help='WEB_CONCURRENCY for every profile')
+    parser.add_argument('--projects', type=int, default=2000)
+    parser.add_argument('--smtp-delay', type=float, default=0.0,
+                        help='seconds per message for the SMTP stand-in (0: no mail in the mix)')
+    parser.add_argument('--knee-gain', type=float, default=0.10)
+    args = parser.parse_args()
+
+    database_url = os.environ.get('DATABASE_URL') or \
+        f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load_test.db')}"
+    project_id = seed_database(database_url, args.projects)
+
+    env = dict(os.environ, DATABASE_URL=database_url, WEB_CONCURRENCY=str(args.workers),
+               LIKES_ROLLUP_INTERVAL='0', PAGE_CACHE_BACKEND='none', MAIL_DELIVERY='sync')
+    requests = [
+        ('GET', '/', None),
+        ('GET', '/projects', None),
+        ('GET', f'/project/{project_id}', None),
+        ('GET', '/api/projects', None),
+        ('GET', '/projects?tag=python', None),
+        ('GET', '/api/search?q=python', None),
+        ('GET', '/about', None),
+        ('GET', f'/project/{project_id}?page=2', None),
+        ('GET', '/api/projects?limit=24', None),
+    ]
+    if args.smtp_delay > 0:
+        # aiosmtpd logs a warning about its own deprecated API on every login
+        logging.getLogger('mail.log').setLevel(logging.ERROR)
+        smtp_port = free_port()
+        start_smtp_standin(smtp_port, args.smtp_delay)
+        env.update({'SMTP_SERVER': '127.0.0.1', 'SMTP_PORT': str(smtp_port), 'SMTP_USE_TLS': 'false',
+                    'SMTP_USERNAME': 'bench@example.com', 'SMTP_PASSWORD': 'bench'})
+        form = urllib.parse.urlencode({'name': 'Load', 'email': 'load@example.com', 'message': 'Oi'})
+        requests.append(('POST', '/contact', form))
+
+    for profile in args.profiles:
+        if profile == 'gevent' and importlib.util.find_spec('gevent') is None:
+            print(f"\n{profile}: skipped (pip install gevent psycogreen)")
+            continue
+
+        port = free_port()
+        server = start_server(profile, port, env)
+        print(f"\n{profile} ({args.workers} workers)")
+        print(f"{'clients':>8} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        best, knee = 0.0, None
+        try:
+            for level in args.levels:
+                latencies, errors = run_level(port, requests, level, args.duration)
+                rps = len(latencies) / args.duration
+                p50 = percentile(latencies, 50) * 1000 if latencies else float('nan')
+                p99 = percentile(latencies, 99) * 1000 if latencies else float('nan')
+                print(f"{level:>8} {rps:>8.1f} {p50:>8.1f} {p99:>8.1f} {len(errors):>7}")
+                if knee is None and best and rps < best * (1 + args.knee_gain):
+                    knee = previous
+                best = max(best, rps)
+                previous = level
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"knee: {knee or previous} clients")
+
+
+if __name__ == '__main__':
+    main()
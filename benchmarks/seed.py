@@ -0,0 +1,126 @@
+"""
+Bulk seeding of benchmark data.
+
+Starts from ``models.data_store.init_database_data`` (admin user, about info,
+sample content) and tops the database up to the requested number of users,
+projects, comments and achievements with chunked Core inserts.
+"""
+
+import random
+import uuid
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import func, insert, select, update
+
+CHUNK_SIZE = 5000
+TAGS = ['Desenvolvimento Web', 'Full Stack', 'React', 'Python', 'UI/UX', 'Analytics', 'Mobile', 'DevOps']
+BASE_TIME = datetime(2024, 1, 1)
+
+# Shared hash so seeded accounts can log in without paying for hashing at seed time
+SEED_PASSWORD = 'bench-password'
+
+
+def create_benchmark_app():
+    """The application with its schema in place, as after ``flask init-db``"""
+    from app import create_app, init_db
+
+    app = create_app()
+    with app.app_context():
+        init_db()
+    return app
+
+
+def _chunks(total, make_row):
+    for start in range(0, total, CHUNK_SIZE):
+        yield [make_row(start + i) for i in range(min(CHUNK_SIZE, total - start))]
+
+
+def _count(db, model):
+    return db.session.execute(select(func.count()).select_from(model)).scalar()
+
+
+def seed(users=0, projects=0, comments=0, achievements=0, published_ratio=0.9, rng=None):
+    """Top the database up to at least the given row counts; returns the totals.
+
+    Must be called inside an application context.
+    """
+    from models.models import db, User, Project, Comment, Achievement
+    from models.types import new_id
+    from models.data_store import init_database_data
+    from utils.stats import rebuild_stats
+    from utils.search import rebuild_search_index
+    from utils.tags import rebuild_project_tags
+
+    rng = rng or random.Random(42)
+    init_database_data()
+
+    template_user = User(name='-', email='-')
+    template_user.set_password(SEED_PASSWORD)
+    password_hash = template_user.password_hash
+
+    def user_row(i):
+        return {
+            'id': new_id(),
+            'name': f'Visitor {i}',
+            'email': f'visitor-{uuid.uuid4().hex[:12]}@example.com',
+            'password_hash': password_hash,
+            'is_admin': False,
+            'created_at': BASE_TIME + timedelta(seconds=rng.randint(0, 10 ** 7)),
+        }
+
+    def project_row(i):
+        return {
+            'id': new_id(),
+            'title': f'Projeto {i}',
+            'description': ' '.join(rng.choice(TAGS) for _ in range(60)),
+            'tags': rng.sample(TAGS, 3),
+            'status': 'published' if rng.random() < published_ratio else 'draft',
+            'likes': rng.randint(0, 500),
+            'created_at': BASE_TIME + timedelta(seconds=rng.randint(0, 10 ** 7)),
+        }
+
+    def achievement_row(i):
+        return {
+            'id': new_id(),
+            'title': f'Conquista {i}',
+            'description': 'Benchmark achievement. ' * 10,
+            'date': date(2020, 1, 1) + timedelta(days=rng.randint(0, 2000)),
+            'created_at': BASE_TIME,
+        }
+
+    for model, target, make_row in ((User, users, user_row),
+                                    (Project, projects, project_row),
+                                    (Achievement, achievements, achievement_row)):
+        missing = target - _count(db, model)
+        for rows in _chunks(max(missing, 0), make_row):
+            db.session.execute(insert(model), rows)
+            db.session.commit()
+
+    missing = comments - _count(db, Comment)
+    if missing > 0:
+        user_ids = db.session.execute(select(User.id).limit(10000)).scalars().all()
+        project_ids = db.session.execute(
+            select(Project.id).where(Project.status == 'published').limit(10000)).scalars().all()
+
+        def comment_row(i):
+            return {
+                'id': new_id(),
+                'content': f'Comentário {i}',
+                'user_id': rng.choice(user_ids),
+                'project_id': rng.choice(project_ids),
+                'created_at': BASE_TIME + timedelta(seconds=rng.randint(0, 10 ** 7)),
+            }
+
+        for rows in _chunks(missing, comment_row):
+            db.session.execute(insert(Comment), rows)
+            db.session.commit()
+
+    # Core inserts bypass the ORM events that maintain the counters, search index and tag links
+    db.session.execute(update(Project).values(comment_count=(
+        select(func.count(Comment.id)).where(Comment.project_id == Project.id).scalar_subquery())))
+    rebuild_stats()
+    rebuild_search_index()
+    rebuild_project_tags()
+    db.session.commit()
+
+    return {model.__name__: _count(db, model) for model in (User, Project, Comment, Achievement)}
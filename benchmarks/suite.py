@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+"""
+Route benchmark suite: every public, auth and admin route, with a baseline.
+
+Seeds SQLite (or the database in DATABASE_URL) through benchmarks/seed.py,
+then requests each scenario --requests times, one at a time, either through
+the Flask test client (default; also counts the SQL statements each request
+runs) or against a real gunicorn server (--gunicorn). It reports req/s,
+p50/p95/p99 latency and statements per request, fails if a route answers
+with an unexpected status, and with --compare exits non-zero when a route's
+p95 or statement count regressed against the stored baseline.
+
+    python benchmarks/suite.py --save-baseline
+    python benchmarks/suite.py --compare
+    python benchmarks/suite.py --gunicorn --profile gthread --compare
+
+The page cache is off by default so every request does the full work;
+--page-cache memory measures what anonymous visitors usually get.
+"""
+
+import argparse
+import contextlib
+import http.client
+import io
+import itertools
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import uuid
+from datetime import datetime
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+DEFAULT_BASELINE = os.path.join(REPO_ROOT, 'benchmarks', 'results', 'baseline.json')
+
+ADMIN_EMAIL = 'admin@portfolio.com'
+ADMIN_PASSWORD = 'admin123'
+
+# Redirects after form posts, plain pages otherwise
+OK = (200,)
+REDIRECT = (302,)
+
+
+class Scenario:
+    """One request shape against one endpoint.
+
+    ``path`` and ``data`` may be format strings/dicts filled from the fixtures,
+    or callables ``(fixtures, i)``. ``prepare(fixtures)`` runs before each
+    request, outside the timing, and returns extra fixtures (e.g. a fresh row
+    for a delete route).
+    """
+
+    def __init__(self, name, endpoint, method, path, role='anonymous', data=None, prepare=None, expect=OK):
+        self.name = name
+        self.endpoint = endpoint
+        self.method = method
+        self.path = path
+        self.role = role
+        self.data = data
+        self.prepare = prepare
+        self.expect = expect
+
+    def build(self, fixtures, i):
+        values = dict(fixtures)
+        if self.prepare:
+            values.update(self.prepare(fixtures))
+        path = self.path(values, i) if callable(self.path) else self.path.format(**values)
+        if callable(self.data):
+            data = self.data(values, i)
+        elif self.data is not None:
+            data = {key: str(value).format(**values) for key, value in self.data.items()}
+        else:
+            data = None
+        return path, data
+
+
+def project_form(values, i):
+    return {'title': f'Bench project {i}', 'description': 'Benchmark project ' * 20,
+            'tags': 'Python, Flask', 'status': 'published', 'link': ''}
+
+
+def achievement_form(values, i):
+    return {'title': f'Bench achievement {i}', 'description': 'Benchmark achievement', 'date': '2024-05-01'}
+
+
+def import_form(values, i):
+    line = json.dumps({'type': 'achievement', 'id': f"suite-{values['run_id']}-{i}", 'title': f'Imported {i}',
+                       'description': 'Imported by the benchmark suite', 'date': '2024-05-01'})
+    return {'content': (io.BytesIO(line.encode('utf-8') + b'\n'), 'suite.jsonl')}
+
+
+def build_scenarios(app):
+    from models.models import db, Project, Achievement
+
+    def new_project(fixtures):
+        with app.app_context():
+            project = Project(title='Delete me', description='-', tags=[], status='draft')
+            db.session.add(project)
+            db.session.commit()
+            return {'victim_id': project.id}
+
+    def new_achievement(fixtures):
+        with app.app_context():
+            achievement = Achievement(title='Delete me', description='-', date=datetime(2024, 1, 1).date())
+            db.session.add(achievement)
+            db.session.commit()
+            return {'victim_id': achievement.id}
+
+    def register_form(values, i):
+        email = f"suite-{values['run_id']}-{i}@example.com"
+        return {'name': 'Suite', 'email': email, 'password': 'suite-password', 'confirm_password': 'suite-password'}
+
+    return [
+        # public
+        Scenario('home', 'public.index', 'GET', '/'),
+        Scenario('projects', 'public.projects', 'GET', '/projects'),
+        Scenario('projects next page', 'public.projects', 'GET', '/projects?cursor={cursor}'),
+        Scenario('projects by tag', 'public.projects', 'GET', '/projects?tag={tag}'),
+        Scenario('projects api', 'public.projects_api', 'GET', '/api/projects'),
+        Scenario('project detail', 'public.project_detail', 'GET', '/project/{project_id}'),
+        Scenario('project comments page 2', 'public.project_detail', 'GET', '/project/{project_id}?page=2'),
+        Scenario('search', 'public.search', 'GET', '/search?q=python'),
+        Scenario('search api', 'public.search_api', 'GET', '/api/search?q=desenvolv'),
+        Scenario('about', 'public.about', 'GET', '/about'),
+        Scenario('contact page', 'public.contact', 'GET', '/contact'),
+        Scenario('contact post', 'public.contact', 'POST', '/contact', expect=REDIRECT,
+                 data={'name': 'Suite', 'email': 'suite@example.com', 'message': 'Olá'}),
+        Scenario('uploaded file', 'public.uploaded_file', 'GET', '/uploads/{upload}'),
+        Scenario('static file', 'static', 'GET', '/static/css/style.css'),
+        Scenario('like', 'public.like_project', 'POST', '/project/{project_id}/like', role='member'),
+        Scenario('project events', 'public.project_events', 'GET', '/project/{project_id}/events'),
+        Scenario('comment', 'public.add_comment', 'POST', '/project/{project_id}/comment', role='member',
+                 data={'comment': 'Comentário do benchmark'}, expect=REDIRECT),
+        # auth
+        Scenario('login page', 'auth.login', 'GET', '/auth/login'),
+        Scenario('login post', 'auth.login', 'POST', '/auth/login', role='fresh', expect=REDIRECT,
+                 data={'email': '{member_email}', 'password': '{member_password}'}),
+        Scenario('register page', 'auth.register', 'GET', '/auth/register'),
+        Scenario('register post', 'auth.register', 'POST', '/auth/register', role='fresh',
+                 data=register_form, expect=REDIRECT),
+        Scenario('logout', 'auth.logout', 'GET', '/auth/logout', role='fresh', expect=REDIRECT),
+        # The POST handler still reads the removed in-memory data_store
+        Scenario('forgot password page', 'auth.forgot_password', 'GET', '/auth/forgot-password'),
+        # admin
+        Scenario('dashboard', 'admin.dashboard', 'GET', '/admin/dashboard', role='admin'),
+        Scenario('stats json', 'admin.stats_json', 'GET', '/admin/stats.json', role='admin'),
+        Scenario('dashboard events', 'admin.dashboard_events', 'GET', '/admin/events', role='admin'),
+        Scenario('cache stats', 'admin.cache_stats_json', 'GET', '/admin/cache/stats', role='admin'),
+        Scenario('metrics', 'admin.metrics', 'GET', '/admin/metrics', role='admin'),
+        Scenario('metrics prometheus', 'admin.metrics_prometheus', 'GET', '/admin/metrics/prometheus', role='admin'),
+        Scenario('metrics reset', 'admin.reset_metrics_view', 'POST', '/admin/metrics/reset', role='admin',
+                 expect=REDIRECT),
+        Scenario('admin projects', 'admin.projects', 'GET', '/admin/projects', role='admin'),
+        Scenario('new project page', 'admin.new_project', 'GET', '/admin/projects/new', role='admin'),
+        Scenario('new project post', 'admin.new_project', 'POST', '/admin/projects/new', role='admin',
+                 data=project_form, expect=REDIRECT),
+        Scenario('edit project page', 'admin.edit_project', 'GET', '/admin/projects/{project_id}/edit', role='admin'),
+        Scenario('edit project post', 'admin.edit_project', 'POST', '/admin/projects/{edit_project_id}/edit',
+                 role='admin', data=project_form, expect=REDIRECT),
+        Scenario('delete project', 'admin.delete_project', 'POST', '/admin/projects/{victim_id}/delete',
+                 role='admin', prepare=new_project, expect=REDIRECT),
+        Scenario('bulk publish', 'admin.bulk_projects', 'POST', '/admin/projects/bulk', role='admin',
+                 prepare=new_project, data={'action': 'publish', 'project_ids': '{victim_id}'}, expect=REDIRECT),
+        Scenario('bulk delete', 'admin.bulk_projects', 'POST', '/admin/projects/bulk', role='admin',
+                 prepare=new_project, data={'action': 'delete', 'project_ids': '{victim_id}'}, expect=REDIRECT),
+        Scenario('achievements', 'admin.achievements', 'GET', '/admin/achievements', role='admin'),
+        Scenario('new achievement page', 'admin.new_achievement', 'GET', '/admin/achievements/new', role='admin'),
+        Scenario('new achievement post', 'admin.new_achievement', 'POST', '/admin/achievements/new', role='admin',
+                 data=achievement_form, expect=REDIRECT),
+        Scenario('edit achievement page', 'admin.edit_achievement', 'GET',
+                 '/admin/achievements/{achievement_id}/edit', role='admin'),
+        Scenario('edit achievement post', 'admin.edit_achievement', 'POST',
+                 '/admin/achievements/{achievement_id}/edit', role='admin', data=achievement_form, expect=REDIRECT),
+        Scenario('delete achievement', 'admin.delete_achievement', 'POST', '/admin/achievements/{victim_id}/delete',
+                 role='admin', prepare=new_achievement, expect=REDIRECT),
+        Scenario('profile', 'admin.profile', 'GET', '/admin/profile', role='admin'),
+        Scenario('profile update', 'admin.update_profile', 'POST', '/admin/profile/update', role='admin',
+                 data={'name': 'Admin', 'email': ADMIN_EMAIL, 'about_title': '{about_title}',
+                       'about_description': '{about_description}', 'skills': '{skills}',
+                       'contact_email': '{contact_email}'}, expect=REDIRECT),
+        Scenario('content page', 'admin.content', 'GET', '/admin/content', role='admin'),
+        Scenario('export content', 'admin.export_content', 'GET', '/admin/content/export.jsonl', role='admin'),
+        Scenario('export uploads', 'admin.export_content_uploads', 'GET', '/admin/content/uploads.tar', role='admin'),
+        Scenario('import content', 'admin.import_content', 'POST', '/admin/content/import', role='admin',
+                 data=import_form, expect=REDIRECT),
+        Scenario('revoke other sessions', 'admin.revoke_other_sessions', 'POST', '/admin/profile/sessions/revoke',
+                 role='admin', expect=REDIRECT),
+    ]
+
+
+def create_fixtures(app, volumes):
+    """Seed the database and collect the ids and values scenarios refer to"""
+    from sqlalchemy import select
+    from models.models import db, Project, Achievement, AboutInfo, Tag
+    from benchmarks.seed import seed, SEED_PASSWORD
+    from models.models import User
+
+    with app.app_context():
+        totals = seed(**volumes)
+        project = db.session.execute(
+            select(Project).where(Project.status == 'published')
+            .order_by(Project.comment_count.desc())).scalars().first()
+        member = User.query.filter_by(is_admin=False).first()
+        about = AboutInfo.query.first()
+        edit_project = Project(title='Suite edit target', description='-', tags=[], status='draft')
+        db.session.add(edit_project)
+        db.session.commit()
+
+        upload = 'bench-suite.png'
+        with open(os.path.join(app.root_path, app.config['UPLOAD_FOLDER'], upload), 'wb') as f:
+            f.write(b'\x89PNG\r\n\x1a\n' + b'\0' * 4096)
+
+        fixtures = {
+            'run_id': datetime.utcnow().strftime('%Y%m%d%H%M%S%f'),
+            'project_id': project.id,
+            'edit_project_id': edit_project.id,
+            'achievement_id': db.session.execute(select(Achievement.id)).scalars().first(),
+            'tag': db.session.execute(select(Tag.slug).order_by(Tag.published_count.desc())).scalars().first(),
+            'member_email': member.email,
+            'member_password': SEED_PASSWORD,
+            'upload': upload,
+            'about_title': about.title,
+            'about_description': about.description,
+            'skills': ', '.join(about.skills or []),
+            'contact_email': about.contact_email,
+        }
+    return totals, fixtures
+
+
+class ClientDriver:
+    """In-process test client; counts the SQL statements each request runs"""
+
+    def __init__(self, app):
+        from sqlalchemy import event
+        from models.models import db
+
+        self.app = app
+        self.clients = {}
+        self.statements = 0
+        self.thread = threading.get_ident()
+        with app.app_context():
+            event.listen(db.engine, 'before_cursor_execute', self._count)
+
+    def _count(self, *args):
+        # Ignore background jobs
+        if threading.get_ident() == self.thread:
+            self.statements += 1
+
+    def reset(self, role):
+        self.clients[role] = self.app.test_client()
+
+    def request(self, role, method, path, data=None):
+        client = self.clients.setdefault(role, self.app.test_client())
+        before = self.statements
+        # The routes print() when SMTP is not configured
+        with contextlib.redirect_stdout(io.StringIO()):
+            response = client.open(path, method=method, data=data)
+            # Streamed bodies are only produced when read
+            response.get_data()
+        response.close()
+        return response.status_code, self.statements - before
+
+
+def multipart_body(data):
+    """Encode form fields and (fileobj, filename) uploads as multipart/form-data"""
+    boundary = f'suite-{uuid.uuid4().hex}'
+    parts = []
+    for name, value in data.items():
+        if isinstance(value, tuple):
+            fileobj, filename = value
+            header = f'Content-Disposition: form-data; name="{name}"; filename="{filename}"\r\n' \
+                     'Content-Type: application/octet-stream'
+            content = fileobj.read()
+        else:
+            header = f'Content-Disposition: form-data; name="{name}"'
+            content = str(value).encode('utf-8')
+        parts.append(f'--{boundary}\r\n{header}\r\n\r\n'.encode('utf-8') + content + b'\r\n')
+    body = b''.join(parts) + f'--{boundary}--\r\n'.encode('utf-8')
+    return body, f'multipart/form-data; boundary={boundary}'
+
+
+class HttpDriver:
+    """Keep-alive HTTP connections to a running server, one cookie jar per role"""
+
+    def __init__(self, port):
+        self.port = port
+        self.connections = {}
+        self.cookies = {}
+
+    def reset(self, role):
+        self.cookies[role] = {}
+
+    def request(self, role, method, path, data=None):
+        conn = self.connections.get(role)
+        if conn is None:
+            conn = self.connections[role] = http.client.HTTPConnection('127.0.0.1', self.port, timeout=60)
+        cookies = self.cookies.setdefault(role, {})
+        headers = {}
+        if cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in cookies.items())
+        body = None
+        if data is not None and any(isinstance(value, tuple) for value in data.values()):
+            body, headers['Content-Type'] = multipart_body(data)
+        elif data is not None:
+            body = urllib.parse.urlencode(data)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        conn.request(method, path, body=body, headers=headers)
+        response = conn.getresponse()
+        response.read()
+        for header in response.headers.get_all('Set-Cookie') or []:
+            name, _, value = header.split(';', 1)[0].partition('=')
+            if value and 'Expires=Thu, 01 Jan 1970' not in header:
+                cookies[name] = value
+            else:
+                cookies.pop(name, None)
+        return response.status, None
+
+
+def log_in(driver, fixtures):
+    driver.reset('admin')
+    status, _ = driver.request('admin', 'POST', '/auth/login', {'email': ADMIN_EMAIL, 'password': ADMIN_PASSWORD})
+    assert status == 302, f"admin login failed ({status})"
+    driver.reset('member')
+    status, _ = driver.request('member', 'POST', '/auth/login',
+                               {'email': fixtures['member_email'], 'password': fixtures['member_password']})
+    assert status == 302, f"member login failed ({status})"
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def run_scenario(driver, scenario, fixtures, requests, warmup):
+    counter = itertools.count()
+    latencies, statements, unexpected = [], [], []
+    for n in range(warmup + requests):
+        i = next(counter)
+        path, data = scenario.build(fixtures, i)
+        if scenario.role == 'fresh':
+            # Login/registration/logout start from a new session every time
+            driver.reset('fresh')
+        start = time.perf_counter()
+        status, count = driver.request(scenario.role, scenario.method, path, data)
+        elapsed = time.perf_counter() - start
+        if status not in scenario.expect:
+            unexpected.append(status)
+        if n >= warmup:
+            latencies.append(elapsed)
+            if count is not None:
+                statements.append(count)
+
+    total = sum(latencies)
+    return {
+        'endpoint': scenario.endpoint,
+        'requests': len(latencies),
+        'rps': len(latencies) / total if total else 0.0,
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'statements': statistics.median(statements) if statements else None,
+        'unexpected_statuses': sorted(set(unexpected)),
+    }
+
+
+def compare(results, baseline, tolerance, floor_ms):
+    """Scenarios whose p95 or statement count got worse than the baseline"""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get('scenarios', {}).get(name)
+        if before is None:
+            continue
+        limit = max(before['p95_ms'] * (1 + tolerance), before['p95_ms'] + floor_ms)
+        if result['p95_ms'] > limit:
+            regressions.append(f"{name}: p95 {before['p95_ms']:.2f} -> {result['p95_ms']:.2f} ms")
+        if result['statements'] is not None and before.get('statements') is not None \
+                and result['statements'] > before['statements']:
+            regressions.append(f"{name}: statements {before['statements']} -> {result['statements']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--projects', type=int, default=2000)
+    parser.add_argument('--comments', type=int, default=5000)
+    parser.add_argument('--achievements', type=int, default=100)
+    parser.add_argument('--requests', type=int, default=30, help='timed requests per scenario')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--only', nargs='+', help='run only scenarios whose name contains one of these')
+    parser.add_argument('--gunicorn', action='store_true', help='drive a real gunicorn server instead')
+    parser.add_argument('--profile', default='gthread', help='GUNICORN_PROFILE for --gunicorn')
+    parser.add_argument('--page-cache', default='none', choices=('none', 'memory', 'disk'))
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--compare', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative p95 growth')
+    parser.add_argument('--floor-ms', type=float, default=2.0, help='ignore p95 growth below this')
+    parser.add_argument('--output', help='also write this run as JSON here')
+    args = parser.parse_args()
+
+    if not os.environ.get('DATABASE_URL'):
+        os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'suite.db')}"
+    os.environ.update({
+        'LIKES_ROLLUP_INTERVAL': '0',
+        'PAGE_CACHE_BACKEND': args.page_cache,
+        # No dispatcher thread; contact/comment mail is skipped without SMTP credentials
+        'MAIL_DELIVERY': 'sync',
+        # Repeated logins/registrations from one address would be throttled
+        'RATE_LIMIT_STORE': 'none',
+        # Event streams send their opening frames and end, so a request
+        # measures what each new viewer costs; any profile may open them
+        'SSE_STREAM_SECONDS': '0',
+        'SSE_MAX_CONNECTIONS': '16',
+    })
+    for name in ('SMTP_USERNAME', 'SMTP_PASSWORD'):
+        os.environ.pop(name, None)
+
+    from benchmarks.seed import create_benchmark_app
+
+    app = create_benchmark_app()
+
+    volumes = {'users': args.users, 'projects': args.projects,
+               'comments': args.comments, 'achievements': args.achievements}
+    totals, fixtures = create_fixtures(app, volumes)
+    scenarios = build_scenarios(app)
+
+    covered = {scenario.endpoint for scenario in scenarios}
+    uncovered = sorted({rule.endpoint for rule in app.url_map.iter_rules()} - covered)
+    if uncovered:
+        print(f"WARNING: routes without a scenario: {', '.join(uncovered)}")
+    if args.only:
+        scenarios = [s for s in scenarios if any(part in s.name for part in args.only)]
+
+    server = None
+    if args.gunicorn:
+        from benchmarks.bench_comment_latency import free_port
+        from benchmarks.load_test import start_server
+        port = free_port()
+        server = start_server(args.profile, port, dict(os.environ))
+        driver = HttpDriver(port)
+    else:
+        driver = ClientDriver(app)
+
+    mode = f"gunicorn/{args.profile}" if args.gunicorn else 'test client'
+    with app.app_context():
+        from models.models import db
+        dialect = db.engine.dialect.name
+    print(f"{mode} on {dialect}, seeded {totals}, page cache {args.page_cache}")
+    print(f"{'scenario':<26} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'SQL':>5}")
+
+    results = {}
+    try:
+        log_in(driver, fixtures)
+        with app.app_context():
+            fixtures['cursor'] = urllib.parse.quote(
+                json.loads(app.test_client().get('/api/projects').data)['next_cursor'], safe='')
+        for scenario in scenarios:
+            result = run_scenario(driver, scenario, fixtures, args.requests, args.warmup)
+            results[scenario.name] = result
+            statements = '-' if result['statements'] is None else f"{result['statements']:g}"
+            flag = f"  unexpected status {result['unexpected_statuses']}" if result['unexpected_statuses'] else ''
+            print(f"{scenario.name:<26} {result['rps']:>8.1f} {result['p50_ms']:>8.2f} "
+                  f"{result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} {statements:>5}{flag}")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+        os.remove(os.path.join(app.root_path, app.config['UPLOAD_FOLDER'], fixtures['upload']))
+
+    run = {
+        'created_at': datetime.utcnow().isoformat(),
+        'mode': mode,
+        'dialect': dialect,
+        'page_cache': args.page_cache,
+        'volumes': volumes,
+        'python': platform.python_version(),
+        'scenarios': results,
+    }
+    for path in filter(None, [args.output, args.baseline if args.save_baseline else None]):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(run, f, indent=2)
+        print(f"\nwrote {path}")
+
+    failed = any(result['unexpected_statuses'] for result in results.values())
+    if args.compare:
+        if not os.path.exists(args.baseline):
+            print(f"\nno baseline at {args.baseline}; run with --save-baseline first")
+            return 1
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if (baseline.get('mode'), baseline.get('dialect'), baseline.get('page_cache')) != (mode, dialect, args.page_cache):
+            print(f"\nbaseline was recorded with {baseline.get('mode')} on {baseline.get('dialect')}, "
+                  f"page cache {baseline.get('page_cache')}; not comparable with this run")
+            return 1
+        regressions = compare(results, baseline, args.tolerance, args.floor_ms)
+        if regressions:
+            print("\nREGRESSIONS:\n  " + '\n  '.join(regressions))
+            failed = True
+        else:
+            print(f"\nOK: no regressions against {args.baseline}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,58 @@
+"""
+Gunicorn settings: gunicorn -c gunicorn.conf.py main:app
+
+GUNICORN_PROFILE selects sync, gthread (default) or gevent workers; see
+utils/serving.py for the other knobs and how the database pool follows them.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from utils.serving import serving_profile, db_pool_options, database_connections
+
+_settings = serving_profile()
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '5000')}")
+worker_class = _settings['worker_class']
+workers = _settings['workers']
+threads = _settings['threads']
+worker_connections = _settings['worker_connections']
+
+# Uploads stream to disk and mail is queued, so requests should be short;
+# the timeout only catches genuinely stuck workers
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then to bound memory growth, staggered by jitter
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = max_requests // 10
+
+# create_app() starts background threads (likes rollup, mail dispatcher), which
+# must happen in each worker rather than in the forking master; schema work is
+# done beforehand by `flask --app main init-db`
+preload_app = False
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+errorlog = '-'
+
+
+def when_ready(server):
+    pool = db_pool_options(_settings)
+    server.log.info(
+        "profile=%s workers=%s threads=%s worker_connections=%s db pool=%s+%s (up to %s connections)",
+        _settings['profile'], workers, threads, worker_connections,
+        pool['pool_size'], pool['max_overflow'], database_connections(_settings))
+
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        # Make psycopg2 yield to other greenlets while waiting on the database
+        try:
+            from psycogreen.gevent import patch_psycopg
+        except ImportError:
+            worker.log.warning("psycogreen is not installed; database calls will block the worker")
+        else:
+            patch_psycopg()
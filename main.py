@@ -1,4 +1,11 @@
-from app import app
+from app import create_app
+
+app = create_app()
 
 if __name__ == '__main__':
+    # The development server sets the schema up itself; deployments run
+    # `flask --app main init-db` once instead
+    from app import init_db
+    with app.app_context():
+        init_db()
     app.run(host='0.0.0.0', port=5000, debug=True)
@@ -1,2 +1,2 @@
 # Import the models to make them available when this package is imported
-from .models import User, Project, Achievement, Comment, AboutInfo
\ No newline at end of file
+from .models import User, Project, Achievement, Comment, AboutInfo, ProjectLike, OutboundEmail, SiteStats, Tag, ProjectTag, UserSession
\ No newline at end of file
@@ -0,0 +1,340 @@
+"""
+Minimal schema migrations.
+
+Each migration is a function registered with ``@migration(version, description)``
+that receives a SQLAlchemy connection inside a transaction. Applied versions
+are recorded in the ``schema_migration`` table. ``init_db()`` creates the
+current schema with ``db.create_all()`` only for an empty database; on any
+other database the migrations alone bring it up to date, so a migration
+creates the tables it introduces (after ``compact_uuid_columns()`` when they
+reference an id). Migrations must be idempotent: they are no-ops (apart from
+being recorded) on freshly created databases.
+"""
+
+import logging
+import uuid
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.schema import CreateIndex, CreateTable
+from sqlalchemy.sql import sqltypes
+
+from models.models import db, SUMMARY_LENGTH
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS = []
+
+_version_metadata = MetaData()
+schema_migration = Table(
+    'schema_migration', _version_metadata,
+    Column('version', Integer, primary_key=True),
+    Column('description', String(200), nullable=False),
+    Column('applied_at', DateTime, nullable=False),
+)
+
+
+def migration(version, description):
+    """Register a migration function under a unique, increasing version"""
+    def decorator(fn):
+        assert all(m[0] != version for m in MIGRATIONS), f"duplicate migration {version}"
+        MIGRATIONS.append((version, description, fn))
+        MIGRATIONS.sort(key=lambda m: m[0])
+        return fn
+    return decorator
+
+
+def create_model_index(conn, table_name, index_name):
+    """Create an index declared on a model, if the database doesn't have it yet"""
+    table = db.metadata.tables[table_name]
+    index = next(index for index in table.indexes if index.name == index_name)
+    # IF NOT EXISTS rather than checkfirst: reflection skips expression indexes
+    conn.execute(CreateIndex(index, if_not_exists=True))
+
+
+def drop_index(conn, index_name):
+    conn.execute(text(f'DROP INDEX IF EXISTS {index_name}'))
+
+
+def has_table(conn, table_name):
+    return inspect(conn).has_table(table_name)
+
+
+def has_column(conn, table_name, column_name):
+    return any(column['name'] == column_name for column in inspect(conn).get_columns(table_name))
+
+
+def applied_versions(conn):
+    _version_metadata.create_all(conn)
+    return set(conn.execute(select(schema_migration.c.version)).scalars())
+
+
+def upgrade(engine=None):
+    """Apply pending migrations in order; returns the versions applied"""
+    engine = engine or db.engine
+    applied = []
+    with engine.connect() as conn:
+        with conn.begin():
+            done = applied_versions(conn)
+        pending = [m for m in MIGRATIONS if m[0] not in done]
+        if not pending:
+            return applied
+
+        # Every SQLite connection enforces foreign keys (models.models), but a
+        # migration runs against the schema and ids of the code that created
+        # the database: older versions store text ids until migration 10 and
+        # never enforced the keys. Check the result once all have run.
+        sqlite = conn.dialect.name == 'sqlite'
+        if sqlite:
+            set_sqlite_foreign_keys(conn, False)
+        try:
+            for version, description, fn in pending:
+                with conn.begin():
+                    logger.info("Applying migration %s: %s", version, description)
+                    fn(conn)
+                    conn.execute(schema_migration.insert().values(
+                        version=version, description=description, applied_at=datetime.utcnow()))
+                applied.append(version)
+        finally:
+            if sqlite:
+                set_sqlite_foreign_keys(conn, True)
+        if sqlite:
+            violations = conn.exec_driver_sql('PRAGMA foreign_key_check').all()
+            conn.rollback()
+            for table, rowid, parent, _ in violations:
+                logger.warning("%s row %s references a missing %s row", table, rowid, parent)
+    return applied
+
+
+def set_sqlite_foreign_keys(conn, enabled):
+    # A no-op inside a transaction, so on the bare DBAPI connection
+    conn.connection.driver_connection.execute(f"PRAGMA foreign_keys = {'ON' if enabled else 'OFF'}")
+
+
+def status(engine=None):
+    """(version, description, applied) for every known migration"""
+    engine = engine or db.engine
+    with engine.begin() as conn:
+        done = applied_versions(conn)
+    return [(version, description, version in done) for version, description, _ in MIGRATIONS]
+
+
+def init_migrations(app):
+    @app.cli.command('db-upgrade')
+    def db_upgrade_command():
+        """Apply pending schema migrations."""
+        applied = upgrade()
+        print(f"Applied migrations: {applied}" if applied else "Schema is up to date")
+
+    @app.cli.command('db-status')
+    def db_status_command():
+        """List schema migrations and whether they are applied."""
+        for version, description, is_applied in status():
+            print(f"{'x' if is_applied else ' '} {version:04d} {description}")
+
+
+@migration(1, 'baseline schema from db.create_all()')
+def _baseline(conn):
+    pass
+
+
+@migration(2, 'indexes for listing, comment and admin lookup query shapes')
+def _query_shape_indexes(conn):
+    # Superseded by the partial published-listing index
+    drop_index(conn, 'ix_project_status_likes_created_id')
+    create_model_index(conn, 'project', 'ix_project_published_listing')
+    create_model_index(conn, 'project', 'ix_project_created_id')
+    create_model_index(conn, 'comment', 'ix_comment_project_created')
+    create_model_index(conn, 'comment', 'ix_comment_created_at')
+    create_model_index(conn, 'user', 'ix_user_is_admin')
+    create_model_index(conn, 'achievement', 'ix_achievement_date')
+
+
+
+@migration(3, 'denormalized Project.comment_count and site_stats counters')
+def _site_stats(conn):
+    from utils.stats import rebuild_stats
+
+    if not has_column(conn, 'project', 'comment_count'):
+        conn.execute(text('ALTER TABLE project ADD COLUMN comment_count INTEGER NOT NULL DEFAULT 0'))
+    conn.execute(text(
+        'UPDATE project SET comment_count = '
+        '(SELECT count(*) FROM comment WHERE comment.project_id = project.id)'
+    ))
+    db.metadata.tables['site_stats'].create(bind=conn, checkfirst=True)
+    rebuild_stats(conn)
+
+
+@migration(4, 'Project.image_variants and image_placeholder for resized uploads')
+def _image_variants(conn):
+    if not has_column(conn, 'project', 'image_variants'):
+        conn.execute(text('ALTER TABLE project ADD COLUMN image_variants JSON'))
+    if not has_column(conn, 'project', 'image_placeholder'):
+        conn.execute(text('ALTER TABLE project ADD COLUMN image_placeholder TEXT'))
+
+
+@migration(5, 'full-text search: tsvector/GIN on PostgreSQL, FTS5 table on SQLite')
+def _search_index(conn):
+    from utils.search import create_search_index, rebuild_search_index
+
+    create_search_index(conn)
+    rebuild_search_index(conn)
+
+
+@migration(6, 'normalized tag and project_tag tables, backfilled from Project.tags')
+def _project_tags(conn):
+    from utils.tags import rebuild_project_tags
+
+    # project_tag.project_id is written in the compact form
+    compact_uuid_columns(conn)
+    db.metadata.tables['tag'].create(bind=conn, checkfirst=True)
+    db.metadata.tables['project_tag'].create(bind=conn, checkfirst=True)
+    create_model_index(conn, 'project_tag', 'ix_project_tag_tag_project')
+    create_model_index(conn, 'tag', 'ix_tag_published_count')
+    rebuild_project_tags(conn)
+
+
+@migration(7, 'user_session table for server-side sessions')
+def _user_sessions(conn):
+    compact_uuid_columns(conn)
+    db.metadata.tables['user_session'].create(bind=conn, checkfirst=True)
+    create_model_index(conn, 'user_session', 'ix_user_session_user')
+    create_model_index(conn, 'user_session', 'ix_user_session_expires')
+
+
+@migration(8, 'replica_heartbeat table for measuring read replica lag')
+def _replica_heartbeat(conn):
+    from utils.db_routing import replica_heartbeat
+
+    replica_heartbeat.create(bind=conn, checkfirst=True)
+
+
+@migration(9, 'Project.updated_at, the version of cached project card fragments')
+def _project_updated_at(conn):
+    if not has_column(conn, 'project', 'updated_at'):
+        conn.execute(text('ALTER TABLE project ADD COLUMN updated_at TIMESTAMP'))
+    conn.execute(text('UPDATE project SET updated_at = created_at WHERE updated_at IS NULL'))
+
+
+def _uuid_columns():
+    """(table, column) of every id and foreign key column typed CompactUUID"""
+    from models.types import CompactUUID
+
+    return [(table.name, column.name) for table in db.metadata.sorted_tables
+            for column in table.columns if isinstance(column.type, CompactUUID)]
+
+
+def compact_uuid_columns(conn):
+    """Convert text ids in the existing tables to the compact storage; a
+    no-op once done. Migrations that write id-referencing rows run it first,
+    so new rows and the rows they reference agree."""
+    existing = set(inspect(conn).get_table_names())
+    columns = [(table, column) for table, column in _uuid_columns() if table in existing]
+    if conn.dialect.name == 'postgresql':
+        inspector = inspect(conn)
+        pending = [(table, column) for table, column in columns
+                   if not isinstance(next(c['type'] for c in inspector.get_columns(table) if c['name'] == column),
+                                     sqltypes.Uuid)]
+        if not pending:
+            return
+        # Referencing and referenced columns must change type together
+        tables = {table for table, _ in columns}
+        foreign_keys = [(table, fk) for table in tables for fk in inspector.get_foreign_keys(table)]
+        for table, fk in foreign_keys:
+            conn.execute(text(f'ALTER TABLE "{table}" DROP CONSTRAINT "{fk["name"]}"'))
+        for table, column in pending:
+            conn.execute(text(f'ALTER TABLE "{table}" ALTER COLUMN "{column}" TYPE uuid USING "{column}"::uuid'))
+        for table, fk in foreign_keys:
+            ondelete = fk.get('options', {}).get('ondelete')
+            conn.execute(text(
+                f'ALTER TABLE "{table}" ADD CONSTRAINT "{fk["name"]}" '
+                f'FOREIGN KEY ({", ".join(fk["constrained_columns"])}) '
+                f'REFERENCES "{fk["referred_table"]}" ({", ".join(fk["referred_columns"])})'
+                + (f' ON DELETE {ondelete}' if ondelete else '')
+            ))
+    elif conn.dialect.name == 'sqlite':
+        # SQLite keeps the declared VARCHAR(36) but stores the 16-byte values
+        # as BLOBs; rows written by the new code already are
+        conn.connection.driver_connection.create_function(
+            'uuid_bytes', 1, lambda value: uuid.UUID(value).bytes, deterministic=True)
+        conn.execute(text('PRAGMA defer_foreign_keys = ON'))
+        for table, column in columns:
+            conn.execute(text(f'UPDATE "{table}" SET "{column}" = uuid_bytes("{column}") '
+                              f"WHERE typeof(\"{column}\") = 'text'"))
+
+
+@migration(10, 'compact UUID ids: native uuid on PostgreSQL, 16-byte BLOB on SQLite')
+def _compact_uuids(conn):
+    compact_uuid_columns(conn)
+
+
+@migration(11, 'ON DELETE CASCADE on comment.project_id and comment.user_id')
+def _comment_cascade(conn):
+    foreign_keys = [fk for fk in inspect(conn).get_foreign_keys('comment')
+                    if (fk.get('options') or {}).get('ondelete', '').upper() != 'CASCADE']
+    if not foreign_keys:
+        return
+    if conn.dialect.name == 'sqlite':
+        # Foreign keys weren't enforced before, so comments of a deleted user
+        # or project may remain; the copy below would reject them
+        orphans = conn.execute(text(
+            'DELETE FROM comment WHERE project_id NOT IN (SELECT id FROM project) '
+            'OR user_id NOT IN (SELECT id FROM "user")')).rowcount
+        if orphans:
+            from utils.stats import apply_deltas
+            apply_deltas(conn, total_comments=-orphans)
+        # SQLite can't alter a constraint: copy the rows into a table created
+        # from the model, then swap it in
+        table = db.metadata.tables['comment']
+        rebuilt = table.to_metadata(db.metadata, name='comment_rebuilt')
+        try:
+            # The table alone: its indexes' names are still taken by the old one
+            conn.execute(CreateTable(rebuilt))
+        finally:
+            db.metadata.remove(rebuilt)
+        columns = ', '.join(f'"{column.name}"' for column in table.columns)
+        conn.execute(text(f'INSERT INTO comment_rebuilt ({columns}) SELECT {columns} FROM comment'))
+        conn.execute(text('DROP TABLE comment'))
+        conn.execute(text('ALTER TABLE comment_rebuilt RENAME TO comment'))
+        for index in table.indexes:
+            index.create(bind=conn, checkfirst=True)
+    else:
+        for fk in foreign_keys:
+            conn.execute(text(f'ALTER TABLE comment DROP CONSTRAINT "{fk["name"]}"'))
+            conn.execute(text(
+                f'ALTER TABLE comment ADD CONSTRAINT "{fk["name"]}" '
+                f'FOREIGN KEY ({", ".join(fk["constrained_columns"])}) '
+                f'REFERENCES "{fk["referred_table"]}" ({", ".join(fk["referred_columns"])}) ON DELETE CASCADE'
+            ))
+
+
+@migration(12, 'Project.summary and Achievement.summary, the description prefix shown by list views')
+def _summaries(conn):
+    for table in ('project', 'achievement'):
+        if not has_column(conn, table, 'summary'):
+            conn.execute(text(f"ALTER TABLE {table} ADD COLUMN summary VARCHAR({SUMMARY_LENGTH}) NOT NULL DEFAULT ''"))
+        conn.execute(text(f"UPDATE {table} SET summary = substr(description, 1, {SUMMARY_LENGTH}) "
+                          f"WHERE summary = '' AND description <> ''"))
+
+
+@migration(13, 'outbound_email.recipient and subject as TEXT')
+def _outbound_email_text(conn):
+    # SQLite doesn't enforce VARCHAR lengths; migration 14 creates the table
+    # with these types where it doesn't exist yet
+    if conn.dialect.name == 'postgresql' and has_table(conn, 'outbound_email'):
+        for column in ('recipient', 'subject'):
+            conn.execute(text(f'ALTER TABLE outbound_email ALTER COLUMN {column} TYPE TEXT'))
+
+
+@migration(14, 'project_like and outbound_email tables, previously left to db.create_all()')
+def _likes_and_mail_tables(conn):
+    compact_uuid_columns(conn)
+    db.metadata.tables['project_like'].create(bind=conn, checkfirst=True)
+    create_model_index(conn, 'project_like', 'ix_project_like_pending')
+    db.metadata.tables['outbound_email'].create(bind=conn, checkfirst=True)
+    create_model_index(conn, 'outbound_email', 'ix_outbound_email_due')
+
+
+@migration(15, 'expression index on lower(user.email) for matching imported comment authors')
+def _user_email_lower(conn):
+    create_model_index(conn, 'user', 'ix_user_email_lower')
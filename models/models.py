@@ -1,18 +1,54 @@
+import sqlite3
+
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import DeclarativeBase
-import uuid
 from datetime import datetime
-from werkzeug.security import generate_password_hash, check_password_hash
+from models.types import CompactUUID, new_id
+from utils.passwords import hash_password, verify_password
+from utils.db_routing import RoutingSession
 
 class Base(DeclarativeBase):
     pass
 
-# This will be set by app.py
-db = SQLAlchemy(model_class=Base)
+# This will be set by app.py; the session sends public reads to replicas (utils/db_routing.py)
+db = SQLAlchemy(model_class=Base, session_options={'class_': RoutingSession})
+
+
+@event.listens_for(Engine, 'connect')
+def _sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite ignores foreign keys, ON DELETE CASCADE included, unless every
+    # connection turns them on
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys = ON')
+        cursor.close()
+
+
+# Stored prefix of Project/Achievement.description; list views show this
+# instead of loading the (deferred) full text
+SUMMARY_LENGTH = 200
+
+
+def summarize(description):
+    return (description or '')[:SUMMARY_LENGTH]
+
+
+def _summary_default(context):
+    # Core inserts (imports, seeding) that only supply the description
+    return summarize(context.get_current_parameters().get('description'))
 
 
 class User(db.Model):
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    __table_args__ = (
+        # Site owner lookup: filter_by(is_admin=True)
+        db.Index('ix_user_is_admin', 'is_admin', postgresql_where=db.text('is_admin')),
+        # Content import: matching comment authors whatever the stored case
+        db.Index('ix_user_email_lower', db.text('lower(email)')),
+    )
+
+    id = db.Column(CompactUUID, primary_key=True, default=new_id)
     name = db.Column(db.String(100), nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(256), nullable=False)
@@ -21,64 +57,133 @@ class User(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
-    comments = db.relationship('Comment', backref='user', lazy=True, cascade='all, delete-orphan')
+    # The database deletes them with the user (ON DELETE CASCADE); only
+    # comments already loaded go through the ORM
+    comments = db.relationship('Comment', backref='user', lazy=True, cascade='all, delete-orphan',
+                               passive_deletes=True)
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         if 'id' not in kwargs:
-            self.id = str(uuid.uuid4())
+            self.id = new_id()
     
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = hash_password(password)
     
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return verify_password(self.password_hash, password)
 
 
 class Project(db.Model):
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    __table_args__ = (
+        # Public listing: status='published' ORDER BY likes, created_at, id (keyset)
+        db.Index('ix_project_published_listing', 'likes', 'created_at', 'id',
+                 postgresql_where=db.text("status = 'published'")),
+        # Admin listing: ORDER BY created_at, id (keyset)
+        db.Index('ix_project_created_id', 'created_at', 'id'),
+    )
+
+    id = db.Column(CompactUUID, primary_key=True, default=new_id)
     title = db.Column(db.String(200), nullable=False)
-    description = db.Column(db.Text, nullable=False)
+    # Unbounded; loaded on first access. List views read summary (utils/listing.py)
+    description = db.deferred(db.Column(db.Text, nullable=False))
+    summary = db.Column(db.String(SUMMARY_LENGTH), nullable=False, default=_summary_default, server_default='')
     tags = db.Column(db.JSON)  # Store as JSON array
     status = db.Column(db.String(20), default='draft')  # 'draft' or 'published'
     link = db.Column(db.String(500))
     image = db.Column(db.String(255))
+    # Resized WebP/AVIF renditions of image, filled in by utils.images
+    image_variants = db.Column(db.JSON(none_as_null=True))
+    image_placeholder = db.Column(db.Text)
     likes = db.Column(db.Integer, default=0)
+    comment_count = db.Column(db.Integer, default=0, nullable=False, server_default='0')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Set by every UPDATE issued through SQLAlchemy, including the likes rollup
+    # and comment counters; versions the cached project card fragments
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Relationships
-    comments = db.relationship('Comment', backref='project', lazy=True, cascade='all, delete-orphan')
+    # Deleted by the database with the project (ON DELETE CASCADE), never loaded for it
+    comments = db.relationship('Comment', backref='project', lazy=True, cascade='all, delete-orphan',
+                               passive_deletes=True)
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         if 'id' not in kwargs:
-            self.id = str(uuid.uuid4())
+            self.id = new_id()
+
+    @db.validates('description')
+    def _update_summary(self, key, description):
+        self.summary = summarize(description)
+        return description
+
+
+class Tag(db.Model):
+    """Normalized tag; ``slug`` is the URL form used by ``/projects?tag=``"""
+    __table_args__ = (
+        # Facets: most used tags first
+        db.Index('ix_tag_published_count', 'published_count'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    slug = db.Column(db.String(100), unique=True, nullable=False)
+    # Published projects carrying this tag (facet count), maintained by utils.tags
+    published_count = db.Column(db.Integer, default=0, nullable=False, server_default='0')
+
+
+class ProjectTag(db.Model):
+    """Project <-> Tag link rows, kept in sync with ``Project.tags`` by ``utils.tags``"""
+    __table_args__ = (
+        # Tag filter and facet counts: tag_id -> project_id
+        db.Index('ix_project_tag_tag_project', 'tag_id', 'project_id'),
+    )
+
+    project_id = db.Column(CompactUUID, db.ForeignKey('project.id', ondelete='CASCADE'), primary_key=True)
+    tag_id = db.Column(db.Integer, db.ForeignKey('tag.id', ondelete='CASCADE'), primary_key=True)
 
 
 class Achievement(db.Model):
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    __table_args__ = (
+        db.Index('ix_achievement_date', 'date'),
+    )
+
+    id = db.Column(CompactUUID, primary_key=True, default=new_id)
     title = db.Column(db.String(200), nullable=False)
-    description = db.Column(db.Text, nullable=False)
+    description = db.deferred(db.Column(db.Text, nullable=False))
+    summary = db.Column(db.String(SUMMARY_LENGTH), nullable=False, default=_summary_default, server_default='')
     date = db.Column(db.Date, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         if 'id' not in kwargs:
-            self.id = str(uuid.uuid4())
+            self.id = new_id()
+
+    @db.validates('description')
+    def _update_summary(self, key, description):
+        self.summary = summarize(description)
+        return description
 
 
 class Comment(db.Model):
-    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    __table_args__ = (
+        # Project page: filter project_id ORDER BY created_at
+        db.Index('ix_comment_project_created', 'project_id', 'created_at'),
+        # Dashboard: most recent comments
+        db.Index('ix_comment_created_at', 'created_at'),
+    )
+
+    id = db.Column(CompactUUID, primary_key=True, default=new_id)
     content = db.Column(db.Text, nullable=False)
-    user_id = db.Column(db.String(36), db.ForeignKey('user.id'), nullable=False)
-    project_id = db.Column(db.String(36), db.ForeignKey('project.id'), nullable=False)
+    user_id = db.Column(CompactUUID, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    project_id = db.Column(CompactUUID, db.ForeignKey('project.id', ondelete='CASCADE'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         if 'id' not in kwargs:
-            self.id = str(uuid.uuid4())
+            self.id = new_id()
 
 
 class AboutInfo(db.Model):
@@ -87,4 +192,82 @@ class AboutInfo(db.Model):
     description = db.Column(db.Text, nullable=False)
     skills = db.Column(db.JSON)  # Store as JSON array
     contact_email = db.Column(db.String(120), nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ProjectLike(db.Model):
+    """Append-only like record; one row per user and project.
+
+    Rows are inserted with ``counted=False`` and folded into ``Project.likes``
+    by the periodic rollup in ``utils.likes``.
+    """
+    __table_args__ = (
+        db.UniqueConstraint('project_id', 'user_id', name='uq_project_like_user'),
+        db.Index('ix_project_like_pending', 'counted', 'project_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    project_id = db.Column(CompactUUID, db.ForeignKey('project.id', ondelete='CASCADE'), nullable=False)
+    user_id = db.Column(CompactUUID, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    counted = db.Column(db.Boolean, default=False, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class OutboundEmail(db.Model):
+    """Persistent outbound mail queue drained by ``utils.mail_queue``.
+
+    ``status`` is 'pending', 'sending', 'sent' or 'failed'. While a message
+    is being sent ``next_attempt_at`` acts as a lease, so rows left in
+    'sending' by a crashed worker are picked up again once it expires.
+    """
+    __table_args__ = (
+        db.Index('ix_outbound_email_due', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    # Unbounded: subjects include form input (the contact form's name)
+    recipient = db.Column(db.Text, nullable=False)
+    subject = db.Column(db.Text, nullable=False)
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(20), default='pending', nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+
+
+class UserSession(db.Model):
+    """Server-side session record kept by ``utils.sessions``.
+
+    ``id`` is the SHA-256 of the id in the cookie; ``data`` is the
+    serialized session. ``user_id`` lets every session of an account be
+    revoked at once.
+    """
+    __table_args__ = (
+        db.Index('ix_user_session_user', 'user_id'),
+        db.Index('ix_user_session_expires', 'expires_at'),
+        # A session written on login must be readable on the next request
+        {'info': {'read_primary': True}},
+    )
+
+    id = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(CompactUUID, db.ForeignKey('user.id', ondelete='CASCADE'))
+    data = db.Column(db.Text, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+
+class SiteStats(db.Model):
+    """Single-row table of dashboard counters.
+
+    Kept current incrementally by the ORM events in ``utils.stats`` so the
+    dashboard reads one row instead of counting whole tables.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    total_projects = db.Column(db.Integer, default=0, nullable=False)
+    published_projects = db.Column(db.Integer, default=0, nullable=False)
+    total_achievements = db.Column(db.Integer, default=0, nullable=False)
+    total_users = db.Column(db.Integer, default=0, nullable=False)
+    total_comments = db.Column(db.Integer, default=0, nullable=False)
+    total_likes = db.Column(db.Integer, default=0, nullable=False)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
\ No newline at end of file
@@ -1,16 +1,30 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify
-from werkzeug.utils import secure_filename
-from models.models import db, User, Project, Achievement, Comment, AboutInfo
-import uuid
-import os
-from utils.email_utils import send_comment_notification
+import hmac
+import tarfile
+
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, abort, stream_with_context
+from sqlalchemy.orm import joinedload, undefer
+from models.models import db, Project, Achievement, Comment, AboutInfo
+from utils.site_cache import get_about_info, invalidate_owner_cache, cache_stats
+from utils.page_cache import invalidate_pages, page_cache_stats
+from utils.templating import invalidate_fragments, fragment_cache_stats
+from utils.pagination import keyset_paginate
+from utils.listing import project_cards, achievement_items
+from utils.stats import get_stats
+from utils.images import save_upload, schedule_image_processing, delete_image_files
+from utils.metrics import metrics_summary, prometheus_text, reset_metrics
+from utils.sessions import current_user, revoke_sessions
+from utils.events import event_stream, stream_stats
+from utils.content_io import export_lines, export_uploads, import_lines, import_uploads, ContentImportError
+from utils.project_actions import BULK_ACTIONS, set_projects_status, delete_projects
+from models.types import parse_id
 
 admin_bp = Blueprint('admin', __name__)
 
 def admin_required(f):
     """Decorator to require admin authentication"""
     def decorated_function(*args, **kwargs):
-        if not session.get('user_id') or not session.get('is_admin'):
+        user = current_user()
+        if user is None or not user.is_admin:
             flash('Admin access required', 'error')
             return redirect(url_for('auth.login'))
         return f(*args, **kwargs)
@@ -20,28 +34,33 @@ def admin_required(f):
 @admin_bp.route('/dashboard')
 @admin_required
 def dashboard():
-    # Get statistics
-    stats = {
-        'total_projects': Project.query.count(),
-        'published_projects': Project.query.filter_by(status='published').count(),
-        'total_achievements': Achievement.query.count(),
-        'total_users': User.query.filter_by(is_admin=False).count(),
-        'total_comments': Comment.query.count(),
-        'total_likes': db.session.query(db.func.sum(Project.likes)).scalar() or 0
-    }
+    # Get statistics (maintained incrementally in the site_stats row)
+    stats = get_stats()
     
     # Get recent activities
-    recent_projects = Project.query.order_by(Project.created_at.desc()).limit(5).all()
-    recent_comments = Comment.query.order_by(Comment.created_at.desc()).limit(5).all()
+    recent_projects = project_cards(Project.query).order_by(Project.created_at.desc()).limit(5).all()
+    recent_comments = Comment.query.options(joinedload(Comment.user)).order_by(Comment.created_at.desc()).limit(5).all()
     
     return render_template('admin/dashboard.html', stats=stats, 
                          recent_projects=recent_projects, recent_comments=recent_comments)
 
+@admin_bp.route('/stats.json')
+@admin_required
+def stats_json():
+    return jsonify(get_stats())
+
+@admin_bp.route('/events')
+@admin_required
+def dashboard_events():
+    """Live dashboard counters (text/event-stream); replaces polling stats.json"""
+    return event_stream('dashboard', [('stats', get_stats())])
+
 @admin_bp.route('/projects')
 @admin_required
 def projects():
-    all_projects = Project.query.order_by(Project.created_at.desc()).all()
-    return render_template('admin/projects.html', projects=all_projects)
+    page = keyset_paginate(project_cards(Project.query), [Project.created_at, Project.id],
+                           request.args.get('cursor'), current_app.config['PROJECTS_PER_PAGE'])
+    return render_template('admin/projects.html', projects=page.items, next_cursor=page.next_cursor)
 
 @admin_bp.route('/projects/new', methods=['GET', 'POST'])
 @admin_required
@@ -58,9 +77,7 @@ def new_project():
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename:
-                filename = secure_filename(file.filename)
-                image_filename = f"{uuid.uuid4()}_{filename}"
-                file.save(os.path.join('uploads', image_filename))
+                image_filename = save_upload(file, current_app.config['UPLOAD_FOLDER'])
         
         # Create new project
         new_project = Project(
@@ -75,16 +92,18 @@ def new_project():
         
         db.session.add(new_project)
         db.session.commit()
+        invalidate_pages('project-list')
+        if image_filename:
+            schedule_image_processing(current_app._get_current_object(), new_project.id, image_filename)
         flash('Project created successfully!', 'success')
         return redirect(url_for('admin.projects'))
     
-    all_projects = Project.query.order_by(Project.created_at.desc()).all()
-    return render_template('admin/projects.html', projects=all_projects, editing=True)
+    return render_template('admin/projects.html', projects=[], editing=True)
 
-@admin_bp.route('/projects/<project_id>/edit', methods=['GET', 'POST'])
+@admin_bp.route('/projects/<id:project_id>/edit', methods=['GET', 'POST'])
 @admin_required
 def edit_project(project_id):
-    project = Project.query.get(project_id)
+    project = Project.query.options(undefer(Project.description)).get(project_id)
     
     if not project:
         flash('Project not found', 'error')
@@ -98,39 +117,75 @@ def edit_project(project_id):
         project.link = request.form.get('link', '')
         
         # Handle file upload
+        replaced_image = None
         if 'image' in request.files:
             file = request.files['image']
             if file and file.filename:
-                filename = secure_filename(file.filename)
-                image_filename = f"{uuid.uuid4()}_{filename}"
-                file.save(os.path.join('uploads', image_filename))
-                project.image = image_filename
+                replaced_image = (project.image, project.image_variants)
+                project.image = save_upload(file, current_app.config['UPLOAD_FOLDER'])
+                project.image_variants = None
+                project.image_placeholder = None
         
         db.session.commit()
+        invalidate_pages('project-list', f'project:{project_id}')
+        invalidate_fragments(f'project:{project_id}')
+        if replaced_image:
+            delete_image_files(current_app.config['UPLOAD_FOLDER'], *replaced_image)
+            schedule_image_processing(current_app._get_current_object(), project.id, project.image)
         flash('Project updated successfully!', 'success')
         return redirect(url_for('admin.projects'))
     
-    all_projects = Project.query.order_by(Project.created_at.desc()).all()
-    return render_template('admin/projects.html', projects=all_projects, 
+    return render_template('admin/projects.html', projects=[], 
                          editing=True, edit_project=project)
 
-@admin_bp.route('/projects/<project_id>/delete', methods=['POST'])
+@admin_bp.route('/projects/<id:project_id>/delete', methods=['POST'])
 @admin_required
 def delete_project(project_id):
-    project = Project.query.get(project_id)
-    if project:
-        # Associated comments will be deleted automatically due to cascade
-        db.session.delete(project)
-        db.session.commit()
+    # One DELETE; the database removes the comments, likes and tag links
+    deleted = delete_projects([project_id])
+    db.session.commit()
+    if deleted:
+        invalidate_pages('project-list', f'project:{project_id}')
+        invalidate_fragments(f'project:{project_id}')
+        delete_image_files(current_app.config['UPLOAD_FOLDER'], deleted[0].image, deleted[0].image_variants)
         flash('Project deleted successfully!', 'success')
     else:
         flash('Project not found', 'error')
     return redirect(url_for('admin.projects'))
 
+@admin_bp.route('/projects/bulk', methods=['POST'])
+@admin_required
+def bulk_projects():
+    """Publish, unpublish or delete the checked projects, one statement for all of them"""
+    action = request.form.get('action')
+    try:
+        project_ids = {parse_id(value) for value in request.form.getlist('project_ids')}
+    except ValueError:
+        abort(400)
+    if not project_ids or (action != 'delete' and action not in BULK_ACTIONS):
+        flash('Select some projects and an action', 'error')
+        return redirect(url_for('admin.projects'))
+
+    if action == 'delete':
+        deleted = delete_projects(project_ids)
+        db.session.commit()
+        changed = [row.id for row in deleted]
+        for row in deleted:
+            delete_image_files(current_app.config['UPLOAD_FOLDER'], row.image, row.image_variants)
+    else:
+        changed = set_projects_status(project_ids, BULK_ACTIONS[action])
+        db.session.commit()
+    if changed:
+        invalidate_pages('project-list', *(f'project:{project_id}' for project_id in changed))
+        invalidate_fragments(*(f'project:{project_id}' for project_id in changed))
+    past = {'publish': 'published', 'unpublish': 'unpublished', 'delete': 'deleted'}[action]
+    flash(f'{len(changed)} project(s) {past}', 'success')
+    return redirect(url_for('admin.projects'))
+
 @admin_bp.route('/achievements')
 @admin_required
 def achievements():
-    all_achievements = Achievement.query.order_by(Achievement.date.desc()).all()
+    all_achievements = achievement_items(Achievement.query).order_by(Achievement.date.desc()).all()
     return render_template('admin/achievements.html', achievements=all_achievements)
 
 @admin_bp.route('/achievements/new', methods=['GET', 'POST'])
@@ -153,16 +208,17 @@ def new_achievement():
         
         db.session.add(new_achievement)
         db.session.commit()
+        invalidate_pages('about')
         flash('Achievement created successfully!', 'success')
         return redirect(url_for('admin.achievements'))
     
-    all_achievements = Achievement.query.order_by(Achievement.date.desc()).all()
+    all_achievements = achievement_items(Achievement.query).order_by(Achievement.date.desc()).all()
     return render_template('admin/achievements.html', achievements=all_achievements, editing=True)
 
-@admin_bp.route('/achievements/<achievement_id>/edit', methods=['GET', 'POST'])
+@admin_bp.route('/achievements/<id:achievement_id>/edit', methods=['GET', 'POST'])
 @admin_required
 def edit_achievement(achievement_id):
-    achievement = Achievement.query.get(achievement_id)
+    achievement = Achievement.query.options(undefer(Achievement.description)).get(achievement_id)
     
     if not achievement:
         flash('Achievement not found', 'error')
@@ -177,20 +233,22 @@ def edit_achievement(achievement_id):
         achievement.date = datetime.strptime(date_str, '%Y-%m-%d').date()
         
         db.session.commit()
+        invalidate_pages('about')
         flash('Achievement updated successfully!', 'success')
         return redirect(url_for('admin.achievements'))
     
-    all_achievements = Achievement.query.order_by(Achievement.date.desc()).all()
+    all_achievements = achievement_items(Achievement.query).order_by(Achievement.date.desc()).all()
     return render_template('admin/achievements.html', achievements=all_achievements, 
                          editing=True, edit_achievement=achievement)
 
-@admin_bp.route('/achievements/<achievement_id>/delete', methods=['POST'])
+@admin_bp.route('/achievements/<id:achievement_id>/delete', methods=['POST'])
 @admin_required
 def delete_achievement(achievement_id):
     achievement = Achievement.query.get(achievement_id)
     if achievement:
         db.session.delete(achievement)
         db.session.commit()
+        invalidate_pages('about')
         flash('Achievement deleted successfully!', 'success')
     else:
         flash('Achievement not found', 'error')
@@ -199,9 +257,8 @@ def delete_achievement(achievement_id):
 @admin_bp.route('/profile')
 @admin_required
 def profile():
-    # Get admin user
-    admin_user = User.query.get(session['user_id'])
-    about_info = AboutInfo.query.first()
+    admin_user = current_user()
+    about_info = get_about_info()
     
     return render_template('admin/profile.html', user=admin_user, 
                          about_info=about_info)
@@ -210,11 +267,9 @@ def profile():
 @admin_required
 def update_profile():
     # Update admin user info
-    admin_user = User.query.get(session['user_id'])
-    if admin_user:
-        admin_user.name = request.form['name']
-        admin_user.email = request.form['email']
-        session['user_name'] = admin_user.name
+    admin_user = current_user()
+    admin_user.name = request.form['name']
+    admin_user.email = request.form['email']
     
     # Update about info
     about_info = AboutInfo.query.first()
@@ -225,5 +280,91 @@ def update_profile():
         about_info.contact_email = request.form['contact_email']
     
     db.session.commit()
+    invalidate_owner_cache()
+    invalidate_pages('about')
+    invalidate_fragments('navbar')
     flash('Profile updated successfully!', 'success')
     return redirect(url_for('admin.profile'))
+
+@admin_bp.route('/profile/sessions/revoke', methods=['POST'])
+@admin_required
+def revoke_other_sessions():
+    revoke_sessions(current_user().id, keep_current=True)
+    flash('Signed out of every other session', 'success')
+    return redirect(url_for('admin.profile'))
+
+@admin_bp.route('/content')
+@admin_required
+def content():
+    return render_template('admin/content.html', stats=get_stats())
+
+@admin_bp.route('/content/export.jsonl')
+@admin_required
+def export_content():
+    response = current_app.response_class(stream_with_context(export_lines()), mimetype='application/x-ndjson')
+    response.headers['Content-Disposition'] = 'attachment; filename=portfolio.jsonl'
+    return response
+
+@admin_bp.route('/content/uploads.tar')
+@admin_required
+def export_content_uploads():
+    chunks = stream_with_context(export_uploads(current_app.config['UPLOAD_FOLDER']))
+    response = current_app.response_class(chunks, mimetype='application/x-tar')
+    response.headers['Content-Disposition'] = 'attachment; filename=portfolio-uploads.tar'
+    return response
+
+@admin_bp.route('/content/import', methods=['POST'])
+@admin_required
+def import_content():
+    content_file = request.files.get('content')
+    uploads_file = request.files.get('uploads')
+    if not (content_file and content_file.filename):
+        flash('Choose a JSON Lines file to import', 'error')
+        return redirect(url_for('admin.content'))
+
+    if uploads_file and uploads_file.filename:
+        try:
+            unpacked = import_uploads(uploads_file.stream, current_app.config['UPLOAD_FOLDER'])
+        except tarfile.TarError as e:
+            flash(f'Uploads archive is not a valid tar file: {e}', 'error')
+            return redirect(url_for('admin.content'))
+        flash(f'Unpacked {unpacked} upload files', 'info')
+    try:
+        counts = import_lines(content_file.stream)
+    except ContentImportError as e:
+        flash(f'Import stopped at {e}; earlier rows were kept', 'error')
+        return redirect(url_for('admin.content'))
+    flash('Imported ' + (', '.join(f'{count} {kind}' for kind, count in sorted(counts.items())) or 'nothing'),
+          'success')
+    return redirect(url_for('admin.content'))
+
+@admin_bp.route('/cache/stats')
+@admin_required
+def cache_stats_json():
+    stats = cache_stats()
+    stats['pages'] = page_cache_stats()
+    stats['fragments'] = fragment_cache_stats()
+    return jsonify(stats)
+
+@admin_bp.route('/metrics')
+@admin_required
+def metrics():
+    return render_template('admin/metrics.html', metrics=metrics_summary())
+
+@admin_bp.route('/metrics/reset', methods=['POST'])
+@admin_required
+def reset_metrics_view():
+    reset_metrics()
+    flash('Metrics reset for this worker', 'success')
+    return redirect(url_for('admin.metrics'))
+
+@admin_bp.route('/metrics/prometheus')
+def metrics_prometheus():
+    # Scrapers cannot log in, so a bearer token (METRICS_TOKEN) also works
+    token = current_app.config.get('METRICS_TOKEN')
+    authorization = request.headers.get('Authorization', '')
+    user = current_user()
+    if not (user and user.is_admin) and not (
+            token and hmac.compare_digest(authorization, f'Bearer {token}')):
+        abort(403)
+    return current_app.response_class(prometheus_text(), mimetype='text/plain; version=0.0.4')
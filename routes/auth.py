@@ -1,6 +1,8 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session
-from werkzeug.security import generate_password_hash, check_password_hash
+from flask import Blueprint, render_template, request, redirect, url_for, flash
 from models.models import db, User
+from utils.passwords import needs_rehash
+from utils.rate_limit import rate_limited, reset_limit, client_ip, form_account
+from utils.sessions import login_user, logout_user
 import uuid
 import smtplib
 from email.mime.text import MIMEText
@@ -9,6 +11,7 @@ import os
 auth_bp = Blueprint('auth', __name__)
 
 @auth_bp.route('/login', methods=['GET', 'POST'])
+@rate_limited(('login_ip', client_ip), ('login_account', form_account), template='auth/login.html')
 def login():
     if request.method == 'POST':
         email = request.form['email']
@@ -18,13 +21,16 @@ def login():
         user = User.query.filter_by(email=email).first()
         
         if user and user.check_password(password):
-            session['user_id'] = user.id
-            session['user_name'] = user.name
-            session['is_admin'] = user.is_admin
+            reset_limit('login_account', form_account())
+            if needs_rehash(user.password_hash):
+                # Hashing parameters changed since this password was set
+                user.set_password(password)
+                db.session.commit()
+            login_user(user)
             flash('Login realizado com sucesso!', 'success')
             
             # Redirect admin users to admin dashboard
-            if session.get('is_admin'):
+            if user.is_admin:
                 return redirect(url_for('admin.dashboard'))
             return redirect(url_for('public.index'))
         else:
@@ -33,6 +39,7 @@ def login():
     return render_template('auth/login.html')
 
 @auth_bp.route('/register', methods=['GET', 'POST'])
+@rate_limited(('register_ip', client_ip), template='auth/register.html')
 def register():
     if request.method == 'POST':
         name = request.form['name']
@@ -68,7 +75,7 @@ def register():
 
 @auth_bp.route('/logout')
 def logout():
-    session.clear()
+    logout_user()
     flash('You have been logged out', 'info')
     return redirect(url_for('public.index'))
 
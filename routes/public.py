@@ -1,52 +1,166 @@
-from flask import Blueprint, render_template, request, redirect, url_for, flash, session, jsonify, send_from_directory
+from flask import Blueprint, render_template, request, redirect, url_for, flash, jsonify, current_app, abort
+from sqlalchemy.orm import joinedload, undefer
 from models.models import db, User, Project, Achievement, Comment, AboutInfo
 from utils.email_utils import send_comment_notification, send_contact_notification
-import uuid
+from utils.likes import record_like, get_like_count
+from utils.site_cache import get_about_info
+from utils.page_cache import cached_page, invalidate_pages
+from utils.pagination import keyset_paginate
+from utils.listing import project_cards
+from utils.static_files import serve_upload
+from utils.search import search as search_index
+from utils.sessions import current_user
+from utils.tags import get_tag, filter_by_tag, tag_facets
+from utils.stats import get_stats
+from utils.events import publish, event_stream
 
 public_bp = Blueprint('public', __name__)
 
+def published_projects_page(cursor=None, limit=None, tag=None):
+    """Keyset page of published projects, most liked and most recent first"""
+    limit = limit or current_app.config['PROJECTS_PER_PAGE']
+    query = project_cards(Project.query.filter_by(status='published'))
+    if tag is not None:
+        query = filter_by_tag(query, tag, limit, get_stats()['published_projects'])
+    return keyset_paginate(query, [Project.likes, Project.created_at, Project.id], cursor, limit)
+
+def requested_tag():
+    """Tag named by ?tag=, or None; aborts with 404 for unknown tags"""
+    slug = request.args.get('tag')
+    if not slug:
+        return None
+    tag = get_tag(slug)
+    if tag is None:
+        abort(404)
+    return tag
+
+def project_image_url(project, variant):
+    """URL of a resized image variant, or of the original upload before it is processed"""
+    if not project.image:
+        return None
+    variants = project.image_variants or {}
+    rendition = (variants.get('webp') or variants.get('avif') or {}).get(variant)
+    return url_for('public.uploaded_file', filename=rendition['file'] if rendition else project.image)
+
+def project_card(project):
+    """JSON representation of a project card, as rendered in index.html"""
+    summary = project.summary or ''
+    return {
+        'id': project.id,
+        'title': project.title,
+        'excerpt': summary[:120] + ('...' if len(summary) > 120 else ''),
+        'tags': project.tags or [],
+        'likes': project.likes,
+        'comments': project.comment_count,
+        'link': project.link,
+        'image_url': project_image_url(project, 'card'),
+        'url': url_for('public.project_detail', project_id=project.id),
+    }
+
 @public_bp.route('/')
+@cached_page('project-list')
 def index():
     # Get published projects, sorted by likes and recent first
-    published_projects = Project.query.filter_by(status='published').order_by(Project.likes.desc(), Project.created_at.desc()).limit(6).all()
+    published_projects = project_cards(Project.query.filter_by(status='published')).order_by(Project.likes.desc(), Project.created_at.desc()).limit(6).all()
     
     return render_template('index.html', projects=published_projects)
 
 @public_bp.route('/projects')
+@cached_page('project-list', query_args=('cursor', 'tag'))
 def projects():
-    published_projects = Project.query.filter_by(status='published').order_by(Project.likes.desc(), Project.created_at.desc()).all()
-    return render_template('index.html', projects=published_projects, show_all=True)
+    tag = requested_tag()
+    page = published_projects_page(request.args.get('cursor'), tag=tag)
+    return render_template('index.html', projects=page.items, show_all=True,
+                           next_cursor=page.next_cursor, tag=tag, facets=tag_facets())
+
+@public_bp.route('/api/projects')
+@cached_page('project-list', query_args=('cursor', 'limit', 'tag'))
+def projects_api():
+    limit = max(1, min(request.args.get('limit', current_app.config['PROJECTS_PER_PAGE'], type=int), 50))
+    page = published_projects_page(request.args.get('cursor'), limit, requested_tag())
+    return jsonify({
+        'projects': [project_card(project) for project in page.items],
+        'next_cursor': page.next_cursor,
+    })
+
+def search_result(kind, item):
+    """JSON representation of a search hit"""
+    if kind == 'project':
+        url = url_for('public.project_detail', project_id=item.id)
+    else:
+        url = url_for('public.about', _anchor=f'achievement-{item.id}')
+    summary = item.summary or ''
+    return {
+        'kind': kind,
+        'id': item.id,
+        'title': item.title,
+        'description': summary[:150] + ('...' if len(summary) > 150 else ''),
+        'tags': (item.tags or []) if kind == 'project' else [],
+        'url': url,
+    }
 
-@public_bp.route('/project/<project_id>')
+@public_bp.route('/search')
+def search():
+    query = request.args.get('q', '').strip()
+    results = [search_result(kind, item) for kind, item in search_index(query)] if query else []
+    return render_template('search.html', query=query, results=results)
+
+@public_bp.route('/api/search')
+def search_api():
+    query = request.args.get('q', '').strip()
+    limit = max(1, min(request.args.get('limit', 20, type=int), 50))
+    return jsonify({
+        'query': query,
+        'results': [search_result(kind, item) for kind, item in search_index(query, limit)],
+    })
+
+@public_bp.route('/project/<id:project_id>')
+@cached_page('project:{project_id}', query_args=('page',))
 def project_detail(project_id):
-    project = Project.query.filter_by(id=project_id, status='published').first()
+    project = Project.query.options(undefer(Project.description)).filter_by(id=project_id, status='published').first()
     
     if not project:
         flash('Project not found', 'error')
         return redirect(url_for('public.index'))
     
-    # Get comments for this project
-    comments = Comment.query.filter_by(project_id=project_id).order_by(Comment.created_at.desc()).all()
+    # Get one page of comments, loading their authors in the same query
+    comments = (Comment.query.options(joinedload(Comment.user))
+                .filter_by(project_id=project_id)
+                .order_by(Comment.created_at.desc())
+                .paginate(page=request.args.get('page', 1, type=int),
+                          per_page=current_app.config['COMMENTS_PER_PAGE'], error_out=False))
     
-    return render_template('project_detail.html', project=project, comments=comments)
+    return render_template('project_detail.html', project=project, comments=comments,
+                           like_count=get_like_count(project_id))
 
-@public_bp.route('/project/<project_id>/like', methods=['POST'])
+@public_bp.route('/project/<id:project_id>/like', methods=['POST'])
 def like_project(project_id):
-    if not session.get('user_id'):
+    user = current_user()
+    if user is None:
         return jsonify({'error': 'Login required'}), 401
     
-    project = Project.query.get(project_id)
-    
-    if project:
-        project.likes = project.likes + 1
-        db.session.commit()
-        return jsonify({'likes': project.likes})
+    if not db.session.query(Project.id).filter_by(id=project_id).first():
+        return jsonify({'error': 'Project not found'}), 404
     
-    return jsonify({'error': 'Project not found'}), 404
+    # Append-only, one like per user; Project.likes is updated by the rollup job
+    liked = record_like(project_id, user.id)
+    likes = get_like_count(project_id)
+    if liked:
+        invalidate_pages(f'project:{project_id}')
+        publish(f'project:{project_id}', 'likes', {'likes': likes})
+    return jsonify({'likes': likes, 'liked': liked})
 
-@public_bp.route('/project/<project_id>/comment', methods=['POST'])
+@public_bp.route('/project/<id:project_id>/events')
+def project_events(project_id):
+    """Live likes and new comments for the project page (text/event-stream)"""
+    if not db.session.query(Project.id).filter_by(id=project_id, status='published').first():
+        abort(404)
+    return event_stream(f'project:{project_id}', [('likes', {'likes': get_like_count(project_id)})])
+
+@public_bp.route('/project/<id:project_id>/comment', methods=['POST'])
 def add_comment(project_id):
-    if not session.get('user_id'):
+    user = current_user()
+    if user is None:
         flash('Please login to comment', 'error')
         return redirect(url_for('auth.login'))
     
@@ -55,22 +169,30 @@ def add_comment(project_id):
         flash('Comment cannot be empty', 'error')
         return redirect(url_for('public.project_detail', project_id=project_id))
     
-    # Get user name
-    user_name = session.get('user_name', 'Anonymous')
+    project_title = db.session.query(Project.title).filter_by(id=project_id).scalar()
+    if project_title is None:
+        flash('Project not found', 'error')
+        return redirect(url_for('public.index'))
     
     # Create new comment
     new_comment = Comment(
         content=comment_text,
         project_id=project_id,
-        user_id=session['user_id']
+        user_id=user.id
     )
     
     db.session.add(new_comment)
+    db.session.flush()
+    # Read before the commit expires the row, which would cost another SELECT
+    comment_event = {'id': new_comment.id, 'content': comment_text, 'created_at': str(new_comment.created_at)}
     db.session.commit()
+    # Listing cards show the comment count
+    invalidate_pages(f'project:{project_id}', 'project-list')
+    publish(f'project:{project_id}', 'comment', dict(comment_event, author=user.name))
     
     # Send notification to admin
     try:
-        send_comment_notification(project_id, user_name, comment_text)
+        send_comment_notification(project_title, user.name, comment_text)
     except Exception as e:
         print(f"Failed to send notification: {e}")
     
@@ -78,12 +200,14 @@ def add_comment(project_id):
     return redirect(url_for('public.project_detail', project_id=project_id))
 
 @public_bp.route('/about')
+@cached_page('about')
 def about():
-    about_info = AboutInfo.query.first()
-    achievements = Achievement.query.order_by(Achievement.date.desc()).all()
+    about_info = get_about_info()
+    achievements = Achievement.query.options(undefer(Achievement.description)).order_by(Achievement.date.desc()).all()
     return render_template('about.html', about=about_info, achievements=achievements)
 
 @public_bp.route('/contact', methods=['GET', 'POST'])
+@cached_page('about')
 def contact():
     if request.method == 'POST':
         name = request.form['name']
@@ -99,9 +223,9 @@ def contact():
         
         return redirect(url_for('public.contact'))
     
-    about_info = AboutInfo.query.first()
+    about_info = get_about_info()
     return render_template('about.html', about=about_info, show_contact=True)
 
 @public_bp.route('/uploads/<filename>')
 def uploaded_file(filename):
-    return send_from_directory('uploads', filename)
+    return serve_upload(filename)
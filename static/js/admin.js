@@ -28,16 +28,42 @@ function initializeAdminDashboard() {
         });
     });
 
-    // Setup real-time stats updates (placeholder for future WebSocket implementation)
-    updateDashboardStats();
-    
-    // Auto-refresh stats every 30 seconds
-    setInterval(updateDashboardStats, 30000);
+    // Live stats pushed over Server-Sent Events; poll only when the server
+    // refuses the stream (streams disabled or this worker is full)
+    const statsStream = document.querySelector('[data-stats-stream]');
+    if (statsStream) {
+        openEventStream(statsStream.dataset.statsStream, {
+            stats: applyDashboardStats,
+            resync: updateDashboardStats
+        }, () => {
+            updateDashboardStats();
+            setInterval(updateDashboardStats, 30000);
+        });
+    }
+}
+
+function applyDashboardStats(stats) {
+    document.querySelectorAll('[data-stat]').forEach(element => {
+        const value = stats[element.dataset.stat];
+        if (value !== undefined) {
+            element.textContent = value;
+        }
+    });
 }
 
 function updateDashboardStats() {
-    // In a real implementation, this would fetch updated stats from the server
-    console.log('Stats updated at:', new Date().toLocaleTimeString());
+    if (!document.querySelector('[data-stat]')) {
+        return;
+    }
+
+    fetch('/admin/stats.json', {
+        headers: { 'X-Requested-With': 'XMLHttpRequest' }
+    })
+    .then(response => response.ok ? response.json() : Promise.reject(response.status))
+    .then(applyDashboardStats)
+    .catch(error => {
+        console.error('Error updating stats:', error);
+    });
 }
 
 function setupFormValidation() {
@@ -68,8 +68,7 @@ document.addEventListener('DOMContentLoaded', function() {
             entries.forEach(entry => {
                 if (entry.isIntersecting) {
                     const img = entry.target;
-                    img.src = img.dataset.src;
-                    img.classList.remove('lazy');
+                    loadLazyImage(img);
                     imageObserver.unobserve(img);
                 }
             });
@@ -78,9 +77,7 @@ document.addEventListener('DOMContentLoaded', function() {
         images.forEach(img => imageObserver.observe(img));
     } else {
         // Fallback for browsers without IntersectionObserver
-        images.forEach(img => {
-            img.src = img.dataset.src;
-        });
+        images.forEach(loadLazyImage);
     }
 
     // Copy to clipboard functionality
@@ -226,18 +223,117 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     });
 
-    // Search functionality (if search input exists)
-    const searchInput = document.querySelector('#search-input');
-    if (searchInput) {
+    // Live search results from /api/search on the search page
+    const searchInput = document.querySelector('#search-page-input');
+    const searchResults = document.querySelector('#search-results');
+    if (searchInput && searchResults) {
+        let searchTimer = null;
+        let searchController = null;
+
         searchInput.addEventListener('input', function() {
-            const query = this.value.toLowerCase();
-            const items = document.querySelectorAll('.searchable-item');
-            
-            items.forEach(item => {
-                const text = item.textContent.toLowerCase();
-                const shouldShow = text.includes(query);
-                item.style.display = shouldShow ? 'block' : 'none';
+            clearTimeout(searchTimer);
+            const query = this.value.trim();
+            searchTimer = setTimeout(() => {
+                if (searchController) {
+                    searchController.abort();
+                }
+                searchController = new AbortController();
+                fetch(`/api/search?q=${encodeURIComponent(query)}`, { signal: searchController.signal })
+                    .then(response => response.json())
+                    .then(data => {
+                        searchResults.innerHTML = data.results.map(renderSearchResult).join('')
+                            || (query ? '<p class="text-muted">Nenhum resultado encontrado.</p>' : '');
+                        history.replaceState(null, '', query ? `?q=${encodeURIComponent(query)}` : location.pathname);
+                    })
+                    .catch(error => {
+                        if (error.name !== 'AbortError') {
+                            console.error('Search error:', error);
+                        }
+                    });
+            }, 200);
+        });
+    }
+
+    // Infinite scroll for the project listing (keyset cursor from /api/projects)
+    const projectGrid = document.querySelector('#project-grid[data-next-cursor]');
+    const gridSentinel = document.querySelector('#project-grid-sentinel');
+    if (projectGrid && gridSentinel && 'IntersectionObserver' in window) {
+        let loadingMore = false;
+
+        const loadMoreProjects = () => {
+            const cursor = projectGrid.dataset.nextCursor;
+            if (!cursor || loadingMore) {
+                return;
+            }
+            loadingMore = true;
+
+            const params = new URLSearchParams({ cursor: cursor });
+            if (projectGrid.dataset.tag) {
+                params.set('tag', projectGrid.dataset.tag);
+            }
+            fetch(`/api/projects?${params}`, {
+                headers: { 'X-Requested-With': 'XMLHttpRequest' }
+            })
+            .then(response => response.json())
+            .then(data => {
+                data.projects.forEach(project => {
+                    projectGrid.appendChild(renderProjectCard(project));
+                });
+                if (data.next_cursor) {
+                    projectGrid.dataset.nextCursor = data.next_cursor;
+                } else {
+                    delete projectGrid.dataset.nextCursor;
+                    gridObserver.disconnect();
+                    gridSentinel.remove();
+                }
+            })
+            .catch(error => {
+                console.error('Error loading projects:', error);
+            })
+            .finally(() => {
+                loadingMore = false;
             });
+        };
+
+        const gridObserver = new IntersectionObserver(entries => {
+            if (entries.some(entry => entry.isIntersecting)) {
+                loadMoreProjects();
+            }
+        }, { rootMargin: '400px' });
+        gridObserver.observe(gridSentinel);
+    }
+
+    // Live likes and comments on the project page (Server-Sent Events)
+    const projectLive = document.querySelector('.comments-section[data-event-stream]');
+    if (projectLive) {
+        openEventStream(projectLive.dataset.eventStream, {
+            likes: data => {
+                const likeCount = document.getElementById('like-count');
+                if (likeCount) {
+                    likeCount.textContent = data.likes;
+                }
+            },
+            comment: comment => {
+                // Newest comments are on the first page; others just wait for a reload
+                if (projectLive.dataset.commentsPage !== '1'
+                        || projectLive.querySelector(`[data-comment-id="${CSS.escape(comment.id)}"]`)) {
+                    return;
+                }
+                let list = projectLive.querySelector('.comments-list');
+                if (!list) {
+                    list = document.createElement('div');
+                    list.className = 'comments-list';
+                    projectLive.appendChild(list);
+                    const empty = projectLive.querySelector('#comments-empty');
+                    if (empty) {
+                        empty.remove();
+                    }
+                }
+                list.prepend(renderComment(comment));
+            },
+            resync: () => {
+                showToast('New activity on this project. Reload to see every comment.', 'info');
+            }
         });
     }
 
@@ -258,6 +354,136 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 });
 
+// Swap a placeholder for the real image, including <picture> sources
+function loadLazyImage(img) {
+    const picture = img.closest('picture');
+    if (picture) {
+        picture.querySelectorAll('source[data-srcset]').forEach(source => {
+            source.srcset = source.dataset.srcset;
+        });
+    }
+    if (img.dataset.srcset) {
+        img.srcset = img.dataset.srcset;
+    }
+    img.src = img.dataset.src;
+    img.classList.remove('lazy');
+}
+
+function renderSearchResult(result) {
+    const kind = result.kind === 'project' ? 'Projeto' : 'Conquista';
+    const tags = result.tags.map(tag => `<span class="badge bg-secondary me-1">${escapeHtml(tag)}</span>`).join('');
+    return `
+        <a href="${escapeHtml(result.url)}" class="list-group-item list-group-item-action">
+            <div class="d-flex justify-content-between">
+                <h5 class="mb-1">${escapeHtml(result.title)}</h5>
+                <small class="text-muted">${kind}</small>
+            </div>
+            <p class="mb-1">${escapeHtml(result.description)}</p>
+            ${tags}
+        </a>`;
+}
+
+// Subscribe to a text/event-stream URL; handlers maps event names to
+// callbacks taking the parsed JSON. onClosed runs when the server refuses
+// the stream (streams disabled or the worker is full), so callers can poll.
+function openEventStream(url, handlers, onClosed) {
+    if (!('EventSource' in window)) {
+        if (onClosed) {
+            onClosed();
+        }
+        return null;
+    }
+    const source = new EventSource(url);
+    Object.entries(handlers).forEach(([name, handler]) => {
+        source.addEventListener(name, event => handler(JSON.parse(event.data)));
+    });
+    source.addEventListener('error', () => {
+        // The browser reconnects on its own unless the stream was refused
+        if (source.readyState === EventSource.CLOSED && onClosed) {
+            onClosed();
+        }
+    });
+    window.addEventListener('pagehide', () => source.close());
+    return source;
+}
+
+// Build a comment card matching the markup in templates/project_detail.html
+function renderComment(comment) {
+    const card = document.createElement('div');
+    card.className = 'card mb-3';
+    card.dataset.commentId = comment.id;
+    card.innerHTML = `
+        <div class="card-body">
+            <div class="d-flex justify-content-between align-items-start mb-2">
+                <div class="d-flex align-items-center">
+                    <div class="avatar-circle bg-primary text-white me-3">
+                        ${escapeHtml((comment.author || '?')[0].toUpperCase())}
+                    </div>
+                    <div>
+                        <h6 class="mb-0">${escapeHtml(comment.author)}</h6>
+                        <small class="text-muted">${escapeHtml(comment.created_at)}</small>
+                    </div>
+                </div>
+            </div>
+            <p class="mb-0">${escapeHtml(comment.content)}</p>
+        </div>`;
+    return card;
+}
+
+// Safe in element content and in quoted attribute values (src, href, alt)
+const HTML_ESCAPES = {'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'};
+
+function escapeHtml(value) {
+    return (value == null ? '' : String(value)).replace(/[&<>"']/g, char => HTML_ESCAPES[char]);
+}
+
+// Build a project card matching the markup in templates/index.html
+function renderProjectCard(project) {
+    const column = document.createElement('div');
+    column.className = 'col-md-6 col-lg-4';
+
+    const image = project.image_url
+        ? `<img src="${escapeHtml(project.image_url)}" class="card-img-top" alt="${escapeHtml(project.title)}" style="height: 200px; object-fit: cover;">`
+        : `<div class="card-img-top bg-secondary d-flex align-items-center justify-content-center" style="height: 200px;">
+               <i class="fas fa-image fa-3x text-muted"></i>
+           </div>`;
+
+    let tags = '';
+    if (project.tags && project.tags.length) {
+        tags = '<div class="mb-3">' +
+            project.tags.slice(0, 3).map(tag => `<span class="badge bg-secondary me-1">${escapeHtml(tag)}</span>`).join('') +
+            (project.tags.length > 3 ? `<span class="badge bg-secondary">+${project.tags.length - 3}</span>` : '') +
+            '</div>';
+    }
+
+    const link = project.link
+        ? `<a href="${escapeHtml(project.link)}" target="_blank" class="btn btn-sm btn-outline-primary">
+               <i class="fas fa-external-link-alt me-1"></i>Demo Ao Vivo
+           </a>`
+        : '';
+
+    column.innerHTML = `
+        <div class="card h-100 shadow-sm">
+            ${image}
+            <div class="card-body d-flex flex-column">
+                <h5 class="card-title">${escapeHtml(project.title)}</h5>
+                <p class="card-text flex-grow-1">${escapeHtml(project.excerpt)}</p>
+                ${tags}
+                <div class="d-flex justify-content-between align-items-center mb-3">
+                    <small class="text-muted">
+                        <i class="fas fa-heart text-danger me-1"></i>${escapeHtml(project.likes)} likes
+                        <i class="fas fa-comment ms-2 me-1"></i>${escapeHtml(project.comments)}
+                    </small>
+                    ${link}
+                </div>
+                <a href="${escapeHtml(project.url)}" class="btn btn-primary">
+                    <i class="fas fa-arrow-right me-2"></i>Ver Detalhes
+                </a>
+            </div>
+        </div>`;
+    return column;
+}
+
 // Add heart pulse animation CSS
 if (!document.querySelector('#heart-animation-styles')) {
     const style = document.createElement('style');
@@ -0,0 +1,412 @@
+"""
+Streaming JSON Lines import and export of portfolio content.
+
+Every line is one JSON object with a ``type`` ('about', 'achievement',
+'project' or 'comment') and that model's columns; dates are ISO strings.
+Comments carry their author's email and name instead of a user id, since
+accounts (and their password hashes) are not exported; authors missing on
+import get an account that cannot log in until its password is reset.
+
+Export streams rows with ``yield_per`` and import buffers at most one
+batch (CONTENT_IMPORT_BATCH_SIZE rows) before a Core insert and commit, so
+memory use does not grow with the file. Rows whose id already exists are
+skipped, which makes an import safe to re-run after a failure part-way.
+Core inserts bypass the ORM events, so each batch updates the site
+counters, comment counts, tag links and search index for its own rows in
+the same transaction; nothing is rebuilt from scratch.
+
+Uploaded images travel separately as a tar archive of every project image
+and its generated variants.
+"""
+
+import json
+import os
+import tarfile
+import tempfile
+from collections import Counter
+from datetime import date, datetime
+
+import click
+from flask import current_app
+from sqlalchemy import func, insert, select, update
+
+from models.models import db, User, Project, Achievement, Comment, AboutInfo
+from models.types import new_id, parse_id
+from utils.images import variant_files
+from utils.page_cache import invalidate_all_pages
+from utils.search import index_new_rows
+from utils.site_cache import invalidate_owner_cache
+from utils.stats import bump_stats
+from utils.tags import link_new_projects
+
+# Written in this order, so comments come after the projects they belong to
+EXPORT_TYPES = ('about', 'achievement', 'project', 'comment')
+
+ABOUT_COLUMNS = ('title', 'description', 'skills', 'contact_email')
+ACHIEVEMENT_COLUMNS = ('id', 'title', 'description', 'date', 'created_at')
+PROJECT_COLUMNS = ('id', 'title', 'description', 'tags', 'status', 'link', 'image', 'image_variants',
+                   'image_placeholder', 'likes', 'created_at')
+
+# check_password_hash() rejects it, so imported authors cannot log in
+UNUSABLE_PASSWORD = '!'
+
+
+class ContentImportError(ValueError):
+    """A line that cannot be imported; the rows before it are already committed"""
+
+    def __init__(self, line_number, message):
+        super().__init__(f"line {line_number}: {message}")
+        self.line_number = line_number
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+def _line(kind, row):
+    return json.dumps({'type': kind, **row}, ensure_ascii=False, default=_json_default) + '\n'
+
+
+def export_lines(batch_size=1000):
+    """Yield the whole portfolio as JSON Lines. Needs an application context."""
+    def rows(statement):
+        return db.session.execute(statement.execution_options(yield_per=batch_size)).mappings()
+
+    about = AboutInfo.query.first()
+    if about is not None:
+        yield _line('about', {name: getattr(about, name) for name in ABOUT_COLUMNS})
+
+    columns = [getattr(Achievement, name) for name in ACHIEVEMENT_COLUMNS]
+    for row in rows(select(*columns).order_by(Achievement.date, Achievement.id)):
+        yield _line('achievement', row)
+
+    columns = [getattr(Project, name) for name in PROJECT_COLUMNS]
+    for row in rows(select(*columns).order_by(Project.created_at, Project.id)):
+        yield _line('project', row)
+
+    statement = (select(Comment.id, Comment.content, Comment.project_id, User.email.label('author_email'),
+                        User.name.label('author_name'), Comment.created_at)
+                 .join(User, Comment.user_id == User.id)
+                 .order_by(Comment.created_at, Comment.id))
+    for row in rows(statement):
+        yield _line('comment', row)
+
+
+def _parse_datetime(value):
+    return datetime.fromisoformat(value) if value else datetime.utcnow()
+
+
+def _record_id(record):
+    # Exported ids are kept, in canonical form, so re-imports skip them
+    return parse_id(record['id']) if record.get('id') else new_id()
+
+
+def _require(record, *names):
+    missing = [name for name in names if record.get(name) in (None, '')]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+
+
+def _text(record, name):
+    """``record[name]`` if it is a string or absent (None)"""
+    value = record.get(name)
+    if value is not None and not isinstance(value, str):
+        raise ValueError(f"{name} must be a string")
+    return value
+
+
+def _strings(record, name):
+    """``record[name]`` as a list of strings ([] when absent)"""
+    value = record.get(name) or []
+    if not isinstance(value, list) or not all(isinstance(item, str) for item in value):
+        raise ValueError(f"{name} must be a list of strings")
+    return value
+
+
+def safe_upload_name(name):
+    """True for a plain file name inside the upload folder (no directories, not hidden)"""
+    return isinstance(name, str) and bool(name) and os.path.basename(name) == name and not name.startswith('.')
+
+
+def _upload_name(record, name):
+    value = record.get(name)
+    if value is not None and not safe_upload_name(value):
+        raise ValueError(f"{name} must be a plain file name")
+    return value
+
+
+def _image_variants(record):
+    """{format: {variant: {'file', 'width', 'height'}}} with plain file names, or None"""
+    variants = record.get('image_variants')
+    if variants is None:
+        return None
+    if not isinstance(variants, dict) or not all(
+            isinstance(by_variant, dict) and all(isinstance(info, dict) for info in by_variant.values())
+            for by_variant in variants.values()):
+        raise ValueError("image_variants must map formats to variants to file info")
+    if not all(safe_upload_name(name) for name in variant_files(variants)):
+        raise ValueError("image_variants files must be plain file names")
+    return variants
+
+
+def _about_row(record):
+    _require(record, 'title', 'description', 'contact_email')
+    return {'title': _text(record, 'title'), 'description': _text(record, 'description'),
+            'skills': _strings(record, 'skills'), 'contact_email': _text(record, 'contact_email'),
+            'updated_at': datetime.utcnow()}
+
+
+def _achievement_row(record):
+    _require(record, 'title', 'description', 'date')
+    return {'id': _record_id(record), 'title': _text(record, 'title'),
+            'description': _text(record, 'description'), 'date': date.fromisoformat(_text(record, 'date')),
+            'created_at': _parse_datetime(_text(record, 'created_at'))}
+
+
+def _project_row(record):
+    _require(record, 'title', 'description')
+    status = _text(record, 'status') or 'draft'
+    if status not in ('draft', 'published'):
+        raise ValueError(f"unknown status {status!r}")
+    likes = record.get('likes') or 0
+    if not isinstance(likes, int) or isinstance(likes, bool):
+        raise ValueError("likes must be an integer")
+    return {'id': _record_id(record), 'title': _text(record, 'title'),
+            'description': _text(record, 'description'),
+            'tags': [tag.strip() for tag in _strings(record, 'tags') if tag.strip()],
+            'status': status, 'link': _text(record, 'link'),
+            # Deleting the project removes these files, so they must stay in the upload folder
+            'image': _upload_name(record, 'image'), 'image_variants': _image_variants(record),
+            'image_placeholder': _text(record, 'image_placeholder'), 'likes': likes,
+            'comment_count': 0, 'created_at': _parse_datetime(_text(record, 'created_at'))}
+
+
+def _comment_row(record):
+    _require(record, 'content', 'project_id', 'author_email')
+    author_email = _text(record, 'author_email')
+    return {'id': _record_id(record), 'content': _text(record, 'content'),
+            'project_id': parse_id(_text(record, 'project_id')), 'author_email': author_email.strip().lower(),
+            'author_name': _text(record, 'author_name') or author_email.split('@')[0],
+            'created_at': _parse_datetime(_text(record, 'created_at'))}
+
+
+_PARSERS = {
+    'about': _about_row,
+    'achievement': _achievement_row,
+    'project': _project_row,
+    'comment': _comment_row,
+}
+
+
+class _Importer:
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.pending = {kind: [] for kind in EXPORT_TYPES}
+        self.buffered = 0
+        self.counts = Counter()
+
+    def add(self, kind, row):
+        self.pending[kind].append(row)
+        self.buffered += 1
+        if self.buffered >= self.batch_size:
+            self.flush()
+
+    def _new_rows(self, model, rows):
+        """Drop rows whose id is already in the table (or earlier in the batch)"""
+        ids = {row['id'] for row in rows}
+        existing = set(db.session.execute(select(model.id).where(model.id.in_(ids))).scalars())
+        fresh = {}
+        for row in rows:
+            if row['id'] not in existing and row['id'] not in fresh:
+                fresh[row['id']] = row
+        return list(fresh.values())
+
+    def _insert(self, kind, model, rows):
+        fresh = self._new_rows(model, rows)
+        if fresh:
+            db.session.execute(insert(model), fresh)
+            index_new_rows(db.session.connection(), kind, fresh)
+        self.counts[kind] += len(fresh)
+        self.counts['skipped'] += len(rows) - len(fresh)
+        return fresh
+
+    def _insert_comments(self, rows):
+        fresh = self._new_rows(Comment, rows)
+        self.counts['skipped'] += len(rows) - len(fresh)
+        rows = fresh
+        project_ids = set(db.session.execute(
+            select(Project.id).where(Project.id.in_({row['project_id'] for row in rows}))).scalars())
+        orphans = [row for row in rows if row['project_id'] not in project_ids]
+        rows = [row for row in rows if row['project_id'] in project_ids]
+        self.counts['skipped'] += len(orphans)
+
+        authors = {row['author_email']: row['author_name'] for row in rows}
+        # Imported emails are lowercased; stored ones may not be. Should two
+        # accounts differ only in case, the older one gets the comments
+        user_ids = dict(db.session.execute(
+            select(func.lower(User.email), User.id).where(func.lower(User.email).in_(authors))
+            .order_by(User.created_at.desc())).all())
+        new_users = [{'id': new_id(), 'name': name, 'email': email, 'password_hash': UNUSABLE_PASSWORD,
+                      'is_admin': False, 'created_at': datetime.utcnow()}
+                     for email, name in authors.items() if email not in user_ids]
+        if new_users:
+            db.session.execute(insert(User), new_users)
+            user_ids.update((user['email'], user['id']) for user in new_users)
+            self.counts['user'] += len(new_users)
+
+        if rows:
+            db.session.execute(insert(Comment), [
+                {'id': row['id'], 'content': row['content'], 'project_id': row['project_id'],
+                 'user_id': user_ids[row['author_email']], 'created_at': row['created_at']}
+                for row in rows])
+            by_count = {}
+            for project_id, count in Counter(row['project_id'] for row in rows).items():
+                by_count.setdefault(count, []).append(project_id)
+            for count, project_ids in by_count.items():
+                db.session.execute(update(Project).where(Project.id.in_(project_ids))
+                                   .values(comment_count=Project.comment_count + count))
+        self.counts['comment'] += len(rows)
+        bump_stats(total_comments=len(rows), total_users=len(new_users))
+
+    def flush(self):
+        if not self.buffered:
+            return
+        for values in self.pending['about']:
+            about = db.session.execute(select(AboutInfo.id).limit(1)).scalar()
+            if about is None:
+                db.session.execute(insert(AboutInfo).values(**values))
+            else:
+                db.session.execute(update(AboutInfo).where(AboutInfo.id == about).values(**values))
+            self.counts['about'] += 1
+        if self.pending['achievement']:
+            achievements = self._insert('achievement', Achievement, self.pending['achievement'])
+            bump_stats(total_achievements=len(achievements))
+        if self.pending['project']:
+            projects = self._insert('project', Project, self.pending['project'])
+            link_new_projects(db.session.connection(), projects)
+            bump_stats(total_projects=len(projects),
+                       published_projects=sum(row['status'] == 'published' for row in projects),
+                       total_likes=sum(row['likes'] for row in projects))
+        if self.pending['comment']:
+            self._insert_comments(self.pending['comment'])
+        db.session.commit()
+        for rows in self.pending.values():
+            rows.clear()
+        self.buffered = 0
+
+
+def import_lines(lines, batch_size=None):
+    """Import JSON Lines (an iterable of str or bytes); returns counts per type.
+
+    Commits every ``batch_size`` rows. Raises ContentImportError for the
+    first malformed line, after committing the rows before it.
+    """
+    importer = _Importer(batch_size or current_app.config['CONTENT_IMPORT_BATCH_SIZE'])
+    try:
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                kind = record.get('type')
+                if kind not in _PARSERS:
+                    raise ValueError(f"unknown type {kind!r}")
+                row = _PARSERS[kind](record)
+            except (ValueError, TypeError, AttributeError) as e:
+                # Keep everything before the bad line, so a fixed file can be re-imported
+                importer.flush()
+                raise ContentImportError(number, str(e)) from None
+            importer.add(kind, row)
+        importer.flush()
+    finally:
+        if importer.counts:
+            if importer.counts['about']:
+                invalidate_owner_cache()
+            invalidate_all_pages()
+    return {kind: count for kind, count in importer.counts.items() if count}
+
+
+class _ChunkBuffer:
+    """Write-only file object for tarfile's stream mode; drained between members"""
+
+    def __init__(self):
+        self._parts = []
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        return len(data)
+
+    def drain(self):
+        data = b''.join(self._parts)
+        self._parts.clear()
+        return data
+
+
+def export_uploads(upload_folder, batch_size=1000):
+    """Yield a tar archive of every project image and its variants, file by file"""
+    buffer = _ChunkBuffer()
+    statement = select(Project.image, Project.image_variants).where(Project.image.is_not(None))
+    with tarfile.open(fileobj=buffer, mode='w|') as archive:
+        for image, variants in db.session.execute(statement.execution_options(yield_per=batch_size)):
+            for name in [image] + variant_files(variants):
+                path = os.path.join(upload_folder, name)
+                if os.path.isfile(path):
+                    archive.add(path, arcname=name)
+                    yield buffer.drain()
+    yield buffer.drain()
+
+
+def import_uploads(fileobj, upload_folder):
+    """Unpack an uploads archive; existing files and unsafe names are skipped.
+
+    Returns the number of files written.
+    """
+    os.makedirs(upload_folder, exist_ok=True)
+    written = 0
+    with tarfile.open(fileobj=fileobj, mode='r|*') as archive:
+        for member in archive:
+            name = member.name
+            if not member.isfile() or not safe_upload_name(name):
+                continue
+            target = os.path.join(upload_folder, name)
+            if os.path.exists(target):
+                continue
+            source = archive.extractfile(member)
+            fd, tmp_path = tempfile.mkstemp(dir=upload_folder, prefix='.import')
+            with os.fdopen(fd, 'wb') as f:
+                while chunk := source.read(1024 * 1024):
+                    f.write(chunk)
+            os.replace(tmp_path, target)
+            written += 1
+    return written
+
+
+def init_content_io(app):
+    @app.cli.command('export-content')
+    @click.option('--output', '-o', type=click.File('w', encoding='utf-8'), default='-',
+                  help='JSON Lines file (default: stdout)')
+    @click.option('--uploads', type=click.Path(dir_okay=False), help='also write the uploads as this tar file')
+    def export_content_command(output, uploads):
+        """Export projects, achievements, comments and the about page as JSON Lines."""
+        for line in export_lines():
+            output.write(line)
+        if uploads:
+            with open(uploads, 'wb') as f:
+                for chunk in export_uploads(app.config['UPLOAD_FOLDER']):
+                    f.write(chunk)
+
+    @app.cli.command('import-content')
+    @click.argument('source', type=click.File('r', encoding='utf-8'))
+    @click.option('--uploads', type=click.File('rb'), help='tar file written by export-content --uploads')
+    @click.option('--batch-size', type=int, help='rows per transaction')
+    def import_content_command(source, uploads, batch_size):
+        """Import a JSON Lines file written by export-content."""
+        if uploads:
+            print(f"Unpacked {import_uploads(uploads, app.config['UPLOAD_FOLDER'])} upload files")
+        try:
+            counts = import_lines(source, batch_size)
+        except ContentImportError as e:
+            raise click.ClickException(str(e))
+        print(', '.join(f'{kind}: {count}' for kind, count in sorted(counts.items())) or 'Nothing imported')
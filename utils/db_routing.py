@@ -0,0 +1,274 @@
+"""
+Read/write routing between the primary database and read replicas.
+
+DATABASE_REPLICA_URLS lists replica URLs; each becomes a Flask-SQLAlchemy
+bind named ``replica_<n>`` with the primary's engine options. The
+session's ``get_bind`` (``RoutingSession``) then sends:
+
+* SELECTs made by GET/HEAD requests to the public blueprint to one healthy
+  replica, picked per request;
+* everything else to the primary: flushes and DML, every statement after
+  the request's first write, tables marked ``info={'read_primary': True}``
+  (sessions), admin and auth requests, CLI commands and background jobs;
+* renders of pages the page cache will store (``read_from_primary``): a
+  page read from a replica that is behind would be served to every visitor
+  as fresh until it expires.
+
+Read-after-write: a POST that wrote sets a short-lived cookie, and that
+browser reads from the primary for DATABASE_READ_PRIMARY_SECONDS, so a
+visitor sees their own comment even on a replica that is behind.
+
+Lag: every DATABASE_REPLICA_CHECK_INTERVAL seconds a monitor thread per
+worker (started by its first request) reads the heartbeat row from the primary and from each replica,
+then writes a new one on the primary. The difference between the two
+readings is the replica's lag, accurate to about one interval. Replicas
+further behind than DATABASE_REPLICA_MAX_LAG, or that fail the read, get no
+reads until they catch up; with no healthy replica, reads use the primary.
+
+The heartbeat makes this independent of the replication mechanism:
+PostgreSQL streaming replicas and SQLite files refreshed by copying the
+primary (benchmarks/bench_replicas.py) are handled the same way.
+"""
+
+import logging
+import random
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from flask import current_app, g, has_app_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import Column, DateTime, Integer, MetaData, Table, inspect, insert, select, update
+
+logger = logging.getLogger(__name__)
+
+# Blueprints whose GET/HEAD requests may read from a replica
+REPLICA_BLUEPRINTS = ('public',)
+READ_PRIMARY_COOKIE = 'db_read_primary_until'
+HEARTBEAT_ID = 1
+
+_heartbeat_metadata = MetaData()
+replica_heartbeat = Table(
+    'replica_heartbeat', _heartbeat_metadata,
+    Column('id', Integer, primary_key=True),
+    Column('beat_at', DateTime, nullable=False),
+)
+
+_replicas = {}
+_max_lag = 5.0
+_read_primary_seconds = 5
+_monitor = None
+# Requests that were allowed a replica, by the engine that served them,
+# and why the primary served some of them
+_routed = Counter()
+_fallbacks = Counter()
+_lock = threading.Lock()
+
+
+class ReplicaState:
+    """Last lag check of one replica; unhealthy until the first check"""
+
+    __slots__ = ('key', 'lag', 'healthy', 'error', 'checked_at')
+
+    def __init__(self, key):
+        self.key = key
+        self.lag = None
+        self.healthy = False
+        self.error = None
+        self.checked_at = None
+
+
+def _is_read(clause):
+    if clause is None:
+        return False
+    if getattr(clause, 'is_select', False):
+        return True
+    # text() queries such as the full-text search
+    return getattr(clause, 'is_text', False) and clause.text.lstrip()[:6].upper() == 'SELECT'
+
+
+def _is_write(session, clause):
+    if session._flushing:
+        return True
+    if clause is None:
+        return False
+    return getattr(clause, 'is_dml', False) or (getattr(clause, 'is_text', False) and not _is_read(clause))
+
+
+class RoutingSession(Session):
+    """Flask-SQLAlchemy session that reads from the request's replica, if any"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and _replicas and has_app_context():
+            table = inspect(mapper).local_table if mapper is not None else None
+            read_primary = table is not None and table.info.get('read_primary')
+            if _is_write(self, clause):
+                if not read_primary:
+                    # Read our own writes for the rest of the request
+                    g.db_replica = None
+                    g.db_wrote = True
+            elif g.get('db_replica') and not read_primary and _is_read(clause):
+                return self._db.engines[g.db_replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+def _reads_primary_after_write():
+    try:
+        return float(request.cookies.get(READ_PRIMARY_COOKIE, 0)) > time.time()
+    except ValueError:
+        return False
+
+
+def _start_monitor():
+    global _monitor
+    with _lock:
+        if _monitor is None:
+            app = current_app._get_current_object()
+            _monitor = threading.Thread(target=_monitor_loop, args=(app, app.config['DATABASE_REPLICA_CHECK_INTERVAL']),
+                                        name='replica-monitor', daemon=True)
+            _monitor.start()
+
+
+def _choose_replica():
+    g.db_replica = None
+    if _monitor is None:
+        # Started by the first request, so CLI commands don't run it
+        _start_monitor()
+    if request.method not in ('GET', 'HEAD') or request.blueprint not in REPLICA_BLUEPRINTS:
+        return
+    if _reads_primary_after_write():
+        reason = 'read_after_write'
+    else:
+        healthy = [key for key, state in _replicas.items() if state.healthy]
+        if healthy:
+            g.db_replica = random.choice(healthy)
+            with _lock:
+                _routed[g.db_replica] += 1
+            return
+        reason = 'replicas_unavailable'
+    with _lock:
+        _routed['primary'] += 1
+        _fallbacks[reason] += 1
+
+
+def read_from_primary(reason):
+    """Send the rest of this request's reads to the primary; ``reason``
+    is counted among the fallbacks in ``routing_stats()``"""
+    replica = g.get('db_replica')
+    if replica is None:
+        return
+    g.db_replica = None
+    with _lock:
+        _routed[replica] -= 1
+        _routed['primary'] += 1
+        _fallbacks[reason] += 1
+
+
+def _remember_write(response):
+    if g.get('db_wrote') and request.method not in ('GET', 'HEAD'):
+        response.set_cookie(READ_PRIMARY_COOKIE, f'{time.time() + _read_primary_seconds:.0f}',
+                            max_age=_read_primary_seconds, httponly=True, samesite='Lax')
+    return response
+
+
+def check_replicas():
+    """Measure each replica's lag against the primary heartbeat, then beat.
+    Must be called inside an application context."""
+    engines = current_app.extensions['sqlalchemy'].engines
+    try:
+        with engines[None].connect() as conn:
+            primary_beat = conn.execute(
+                select(replica_heartbeat.c.beat_at).where(replica_heartbeat.c.id == HEARTBEAT_ID)).scalar()
+    except Exception as exc:
+        logger.warning("Cannot read the replica heartbeat on the primary: %s", exc)
+        primary_beat = None
+
+    for key, state in _replicas.items():
+        try:
+            with engines[key].connect() as conn:
+                beat = conn.execute(
+                    select(replica_heartbeat.c.beat_at).where(replica_heartbeat.c.id == HEARTBEAT_ID)).scalar()
+            state.error = None
+            if primary_beat is None:
+                state.lag = None
+            else:
+                state.lag = max(0.0, (primary_beat - beat).total_seconds()) if beat else float('inf')
+        except Exception as exc:
+            state.lag, state.error = None, str(exc)
+        healthy = state.lag is not None and state.lag <= _max_lag
+        if healthy != state.healthy:
+            if healthy:
+                logger.info("Replica %s is back (lag %.1f s)", key, state.lag)
+            else:
+                reason = state.error or (f"lag {state.lag:.1f} s" if state.lag is not None
+                                         else "no heartbeat on the primary")
+                logger.warning("Replica %s gets no reads: %s", key, reason)
+        state.healthy = healthy
+        state.checked_at = time.time()
+
+    try:
+        with engines[None].begin() as conn:
+            now = datetime.utcnow()
+            beat = update(replica_heartbeat).where(replica_heartbeat.c.id == HEARTBEAT_ID).values(beat_at=now)
+            if not conn.execute(beat).rowcount:
+                conn.execute(insert(replica_heartbeat).values(id=HEARTBEAT_ID, beat_at=now))
+    except Exception as exc:
+        logger.warning("Cannot write the replica heartbeat: %s", exc)
+
+
+def _monitor_loop(app, interval):
+    while True:
+        with app.app_context():
+            check_replicas()
+        time.sleep(interval)
+
+
+def _pool_status(engine):
+    pool = engine.pool
+    status = {'pool': type(pool).__name__}
+    for name, method in (('size', 'size'), ('checked_out', 'checkedout'),
+                         ('checked_in', 'checkedin'), ('overflow', 'overflow')):
+        status[name] = getattr(pool, method)() if hasattr(pool, method) else None
+    return status
+
+
+def routing_stats():
+    """Pool status per engine, replica lag and routed request counts.
+    Must be called inside an application context."""
+    engines = current_app.extensions['sqlalchemy'].engines
+    with _lock:
+        routed, fallbacks = dict(_routed), dict(_fallbacks)
+    pools = {'primary' if key is None else key: _pool_status(engine) for key, engine in engines.items()}
+    replicas = {key: {'healthy': state.healthy, 'lag': state.lag, 'error': state.error,
+                      'checked_at': state.checked_at} for key, state in _replicas.items()}
+    return {'pools': pools, 'replicas': replicas, 'routed': routed, 'fallbacks': fallbacks,
+            'max_lag': _max_lag}
+
+
+def init_db_routing(app):
+    """Track the replica binds and route requests to them"""
+    global _max_lag, _read_primary_seconds
+    _replicas.clear()
+    for key in app.config.get('SQLALCHEMY_BINDS') or {}:
+        if key.startswith('replica_'):
+            _replicas[key] = ReplicaState(key)
+    _max_lag = app.config.get('DATABASE_REPLICA_MAX_LAG', 5.0)
+    _read_primary_seconds = app.config.get('DATABASE_READ_PRIMARY_SECONDS', 5)
+
+    @app.cli.command('replica-status')
+    def replica_status_command():
+        """Check every read replica's lag and show the connection pools."""
+        check_replicas()
+        stats = routing_stats()
+        for key, replica in stats['replicas'].items():
+            lag = f"{replica['lag']:.1f} s" if replica['lag'] is not None else '-'
+            print(f"{key}: {'healthy' if replica['healthy'] else 'skipped'}, lag {lag}"
+                  + (f", {replica['error']}" if replica['error'] else ''))
+        for key, pool in stats['pools'].items():
+            print(f"{key} pool: {pool}")
+
+    if not _replicas:
+        return
+    app.before_request(_choose_replica)
+    app.after_request(_remember_write)
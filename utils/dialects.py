@@ -0,0 +1,14 @@
+"""
+Dialect-specific SQL constructs shared by the modules that write with them.
+"""
+
+
+def insert_for_dialect(dialect_name):
+    """Return the dialect-specific insert() that supports ON CONFLICT, if any"""
+    if dialect_name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+        return insert
+    if dialect_name == 'sqlite':
+        from sqlalchemy.dialects.sqlite import insert
+        return insert
+    return None
@@ -1,37 +1,44 @@
-import smtplib
-import os
-from email.mime.text import MIMEText
-from models.data_store import get_project_by_id
+from flask import current_app
+from utils.mail_queue import smtp_settings, build_message, open_smtp_connection, enqueue_email
+from utils.site_cache import get_admin_email
 
-def send_comment_notification(project_id, commenter_name, comment_text):
+
+def deliver_email(recipient, subject, body):
+    """Queue a message for the background dispatcher, or send it inline.
+
+    MAIL_DELIVERY='sync' keeps the old behaviour of sending inside the request.
+    """
+    if current_app.config.get('MAIL_DELIVERY') == 'queue':
+        enqueue_email(recipient, subject, body)
+        return
+
+    settings = smtp_settings()
+    msg = build_message(settings['username'], recipient, subject, body)
+    server = open_smtp_connection(settings)
+    try:
+        server.send_message(msg)
+    finally:
+        server.quit()
+
+def send_comment_notification(project_title, commenter_name, comment_text):
     """Send email notification to admin when new comment is posted"""
-    smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
-    smtp_port = int(os.getenv('SMTP_PORT', '587'))
-    smtp_username = os.getenv('SMTP_USERNAME', '')
-    smtp_password = os.getenv('SMTP_PASSWORD', '')
+    settings = smtp_settings()
     
-    if not smtp_username or not smtp_password:
+    if not settings['username'] or not settings['password']:
         print("SMTP credentials not configured - comment notification not sent")
         return
     
-    # Get project info
-    project = get_project_by_id(project_id)
-    if not project:
-        return
-    
     # Get admin email
-    from models.models import User
-    admin_user = User.query.filter_by(is_admin=True).first()
-    admin_email = admin_user.email if admin_user else None
+    admin_email = get_admin_email()
     
     if not admin_email:
         return
     
-    subject = f"New Comment on '{project.title}''"
+    subject = f"New Comment on '{project_title}''"
     body = f"""
     Hi Admin,
     
-    A new comment has been posted on your project "{project.title}".
+    A new comment has been posted on your project "{project_title}".
     
     Commenter: {commenter_name}
     Comment: {comment_text}
@@ -42,36 +49,23 @@ def send_comment_notification(project_id, commenter_name, comment_text):
     Portfolio System
     """
     
-    msg = MIMEText(body)
-    msg['Subject'] = subject
-    msg['From'] = smtp_username
-    msg['To'] = admin_email
-    
     try:
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_username, smtp_password)
-            server.send_message(msg)
-        print(f"Comment notification sent to {admin_email}")
+        deliver_email(admin_email, subject, body)
+        print(f"Comment notification for {admin_email} accepted")
     except Exception as e:
         print(f"Failed to send email notification: {e}")
         raise e
 
 def send_contact_notification(name, email, message):
     """Send email notification for contact form submissions"""
-    smtp_server = os.getenv('SMTP_SERVER', 'smtp.gmail.com')
-    smtp_port = int(os.getenv('SMTP_PORT', '587'))
-    smtp_username = os.getenv('SMTP_USERNAME', '')
-    smtp_password = os.getenv('SMTP_PASSWORD', '')
+    settings = smtp_settings()
     
-    if not smtp_username or not smtp_password:
+    if not settings['username'] or not settings['password']:
         print("SMTP credentials not configured - contact notification not sent")
         return
     
     # Get admin email
-    from models.models import User
-    admin_user = User.query.filter_by(is_admin=True).first()
-    admin_email = admin_user.email if admin_user else None
+    admin_email = get_admin_email()
     
     if not admin_email:
         return
@@ -92,17 +86,9 @@ def send_contact_notification(name, email, message):
     Portfolio System
     """
     
-    msg = MIMEText(body)
-    msg['Subject'] = subject
-    msg['From'] = smtp_username
-    msg['To'] = admin_email
-    
     try:
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_username, smtp_password)
-            server.send_message(msg)
-        print(f"Contact notification sent to {admin_email}")
+        deliver_email(admin_email, subject, body)
+        print(f"Contact notification for {admin_email} accepted")
     except Exception as e:
         print(f"Failed to send contact notification: {e}")
         raise e
@@ -0,0 +1,333 @@
+"""
+Server-Sent Events: live likes and comments on project pages and live
+counters on the admin dashboard.
+
+Views call ``publish(channel, event, data)``; every open stream subscribed
+to the channel gets the event. The frame is encoded once per publish and
+shared, and each connection queues at most SSE_QUEUE_SIZE frames; when a
+stalled client falls behind, the oldest frames are dropped and it is sent
+a ``resync`` event instead. Likes and stats events carry absolute values,
+so a dropped one is replaced by the next.
+
+Channels are ``project:<id>`` and ``dashboard``. Dashboard stats are pushed
+after any commit that changed the site_stats row (see utils/stats.py),
+coalesced to at most one read of the row per second per worker.
+
+Backends (SSE_BACKEND):
+
+* ``memory`` (default): fan-out within the worker process, so with several
+  workers a viewer only sees events published by the worker serving them.
+* ``redis``: published through Redis pub/sub (REDIS_URL, optional
+  ``redis`` package); one listener thread per worker fans out to its
+  streams. If Redis is down, events still reach this worker's streams.
+* ``none``: no streams; the pages fall back to polling.
+
+Every open stream holds a worker thread (gthread) or greenlet (gevent), so
+each worker accepts at most SSE_MAX_CONNECTIONS of them; the default comes
+from the serving profile (utils/serving.py). Streams end after
+SSE_STREAM_SECONDS and browsers reconnect, which rebalances them across
+workers.
+"""
+
+import json
+import logging
+import threading
+import time
+from collections import Counter, deque
+
+from flask import Response
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import Pool
+
+from utils.stats import get_stats
+
+logger = logging.getLogger(__name__)
+
+# Pushed stats are re-read at most this often per worker
+STATS_MIN_INTERVAL = 1.0
+
+_hub = None
+_broker = None
+_keepalive = 15
+_lifetime = 300
+_app = None
+_stats_changed = threading.Event()
+_stats_thread = None
+
+
+def encode_event(event_name, data):
+    """One SSE frame as bytes"""
+    payload = json.dumps(data, separators=(',', ':'), default=str)
+    return f'event: {event_name}\ndata: {payload}\n\n'.encode('utf-8')
+
+
+def channel_kind(channel):
+    """'project:<id>' -> 'project', for metrics labels"""
+    return channel.split(':', 1)[0]
+
+
+class Subscription:
+    """One open stream: a bounded frame queue and a wakeup flag"""
+
+    __slots__ = ('channel', 'frames', 'ready', 'dropped')
+
+    def __init__(self, channel, queue_size):
+        self.channel = channel
+        self.frames = deque(maxlen=queue_size)
+        self.ready = threading.Event()
+        self.dropped = 0
+
+
+class Hub:
+    """Streams of this worker, by channel"""
+
+    def __init__(self, max_connections, queue_size):
+        self.max_connections = max_connections
+        self.queue_size = queue_size
+        self._channels = {}
+        self._lock = threading.Lock()
+        self.connections = Counter()
+        self.opened = Counter()
+        self.rejected = Counter()
+        self.delivered = Counter()
+        self.dropped = Counter()
+
+    def subscribe(self, channel):
+        """A new Subscription, or None when the worker is at its limit"""
+        kind = channel_kind(channel)
+        with self._lock:
+            if sum(self.connections.values()) >= self.max_connections:
+                self.rejected[kind] += 1
+                return None
+            subscription = Subscription(channel, self.queue_size)
+            self._channels.setdefault(channel, set()).add(subscription)
+            self.connections[kind] += 1
+            self.opened[kind] += 1
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._channels.get(subscription.channel)
+            if subscribers is None or subscription not in subscribers:
+                return
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._channels[subscription.channel]
+            self.connections[channel_kind(subscription.channel)] -= 1
+
+    def has_subscribers(self, channel):
+        return channel in self._channels
+
+    def dispatch(self, channel, frame):
+        kind = channel_kind(channel)
+        with self._lock:
+            subscribers = list(self._channels.get(channel, ()))
+            for subscription in subscribers:
+                if len(subscription.frames) == subscription.frames.maxlen:
+                    # deque drops the oldest frame on append
+                    subscription.dropped += 1
+                    self.dropped[kind] += 1
+                subscription.frames.append(frame)
+            self.delivered[kind] += len(subscribers)
+        for subscription in subscribers:
+            # Event.set() takes a lock; a stream already woken needs nothing
+            if not subscription.ready.is_set():
+                subscription.ready.set()
+
+    def close_all(self):
+        """Wake every stream so it ends (used by benchmarks and shutdown)"""
+        with self._lock:
+            subscriptions = [s for subscribers in self._channels.values() for s in subscribers]
+        for subscription in subscriptions:
+            subscription.frames.append(None)
+            subscription.ready.set()
+
+
+class MemoryBroker:
+    """Publishes straight to this worker's streams"""
+
+    def publish(self, channel, frame):
+        _hub.dispatch(channel, frame)
+
+    def has_listeners(self, channel):
+        return _hub.has_subscribers(channel)
+
+
+class RedisBroker:
+    """Redis pub/sub shared by all workers; a listener thread per worker
+    relays messages to its streams, started with the first stream"""
+
+    def __init__(self, url, prefix='events:'):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_connect_timeout=0.5)
+        self.prefix = prefix
+        self._listener = None
+        self._lock = threading.Lock()
+
+    def publish(self, channel, frame):
+        try:
+            self.client.publish(self.prefix + channel, frame)
+        except Exception as exc:
+            logger.warning("Event broker unavailable, publishing to this worker only: %s", exc)
+            _hub.dispatch(channel, frame)
+
+    def has_listeners(self, channel):
+        # Streams on other workers are invisible here; PUBLISH is cheap
+        return True
+
+    def ensure_listener(self):
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='event-listener', daemon=True)
+                self._listener.start()
+
+    def _listen(self):
+        delay = 0.5
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe(self.prefix + '*')
+                delay = 0.5
+                for message in pubsub.listen():
+                    if message['type'] == 'pmessage':
+                        channel = message['channel'].decode('utf-8')[len(self.prefix):]
+                        _hub.dispatch(channel, message['data'])
+            except Exception as exc:
+                logger.warning("Event listener lost Redis, retrying in %.1f s: %s", delay, exc)
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+
+
+def publish(channel, event_name, data):
+    """Send an event to every stream on ``channel`` (no-op without listeners)"""
+    if _broker is None or not _broker.has_listeners(channel):
+        return
+    _broker.publish(channel, encode_event(event_name, data))
+
+
+def event_stream(channel, initial=None):
+    """Streaming response for ``channel``; 204 when streams are disabled and
+    503 when this worker has no room for another.
+
+    ``initial`` is a list of (event, data) sent first, so a reconnecting
+    client catches up on state it missed. The generator touches no request
+    or database state, so neither is held while the stream is open.
+    """
+    if _hub is None:
+        return Response(status=204)
+    subscription = _hub.subscribe(channel)
+    if subscription is None:
+        return Response('Too many open event streams', status=503, mimetype='text/plain',
+                        headers={'Retry-After': '60'})
+    if isinstance(_broker, RedisBroker):
+        _broker.ensure_listener()
+    frames = [encode_event(name, data) for name, data in initial or ()]
+
+    def generate():
+        try:
+            # Browsers wait this long (ms) before reconnecting
+            yield b'retry: 3000\n\n' + b''.join(frames)
+            deadline = time.monotonic() + _lifetime
+            dropped = 0
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                if not subscription.ready.wait(min(_keepalive, remaining)):
+                    # Comment line: keeps proxies from timing out and finds dead clients
+                    yield b': keepalive\n\n'
+                    continue
+                subscription.ready.clear()
+                batch = []
+                while subscription.frames:
+                    frame = subscription.frames.popleft()
+                    if frame is None:
+                        if batch:
+                            yield b''.join(batch)
+                        return
+                    batch.append(frame)
+                if subscription.dropped != dropped:
+                    dropped = subscription.dropped
+                    batch.append(encode_event('resync', {'dropped': dropped}))
+                if batch:
+                    yield b''.join(batch)
+        finally:
+            _hub.unsubscribe(subscription)
+
+    response = Response(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # Stop nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def stream_stats():
+    """Open/opened/rejected streams and delivered/dropped frames by channel kind"""
+    if _hub is None:
+        return {'backend': None, 'max_connections': 0, 'channels': {}}
+    with _hub._lock:
+        kinds = set(_hub.opened) | set(_hub.rejected)
+        channels = {kind: {'connections': _hub.connections[kind], 'opened': _hub.opened[kind],
+                           'rejected': _hub.rejected[kind], 'delivered': _hub.delivered[kind],
+                           'dropped': _hub.dropped[kind]}
+                    for kind in sorted(kinds)}
+    return {'backend': type(_broker).__name__, 'max_connections': _hub.max_connections,
+            'channels': channels}
+
+
+def _mark_rollback(conn):
+    conn.info.pop('stats_changed', None)
+
+
+def _connection_checked_in(dbapi_connection, connection_record):
+    # The session releases its connection after COMMIT, so the new
+    # counters are visible by the time the notifier reads them
+    if connection_record is not None and connection_record.info.pop('stats_changed', False):
+        _notify_stats_changed()
+
+
+def _notify_stats_changed():
+    if _stats_thread is not None:
+        _stats_changed.set()
+
+
+def _stats_loop():
+    while True:
+        _stats_changed.wait()
+        _stats_changed.clear()
+        try:
+            if _broker is not None and _broker.has_listeners('dashboard'):
+                with _app.app_context():
+                    stats = get_stats()
+                publish('dashboard', 'stats', stats)
+        except Exception:
+            logger.exception("Publishing dashboard stats failed")
+        time.sleep(STATS_MIN_INTERVAL)
+
+
+def init_events(app):
+    """Create the hub and broker for SSE_BACKEND and watch for stats commits"""
+    global _hub, _broker, _keepalive, _lifetime, _app, _stats_thread
+    kind = app.config.get('SSE_BACKEND', 'memory')
+    if kind == 'none':
+        _hub = _broker = None
+        return
+    if kind == 'memory':
+        broker = MemoryBroker()
+    elif kind == 'redis':
+        broker = RedisBroker(app.config['REDIS_URL'])
+    else:
+        raise ValueError(f"Unknown SSE_BACKEND {kind!r}")
+    _hub = Hub(app.config['SSE_MAX_CONNECTIONS'], app.config['SSE_QUEUE_SIZE'])
+    _broker = broker
+    _keepalive = app.config['SSE_KEEPALIVE']
+    _lifetime = app.config['SSE_STREAM_SECONDS']
+    _app = app
+
+    if not event.contains(Pool, 'checkin', _connection_checked_in):
+        event.listen(Pool, 'checkin', _connection_checked_in)
+        event.listen(Engine, 'rollback', _mark_rollback)
+    if _stats_thread is None:
+        _stats_thread = threading.Thread(target=_stats_loop, name='stats-publisher', daemon=True)
+        _stats_thread.start()
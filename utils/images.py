@@ -0,0 +1,159 @@
+import base64
+import io
+import logging
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.utils import secure_filename
+
+from models.models import db, Project
+from utils.page_cache import invalidate_pages
+
+logger = logging.getLogger(__name__)
+
+# Variant name -> maximum width in pixels
+VARIANT_WIDTHS = {'thumb': 320, 'card': 640, 'full': 1600}
+PLACEHOLDER_WIDTH = 24
+QUALITY = {'webp': 80, 'avif': 60}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def output_formats():
+    """Modern formats this Pillow build can encode, preferred first"""
+    # Imported on first upload rather than at worker boot
+    try:
+        from PIL import features
+    except ImportError:  # Pillow is optional; without it only the original is served
+        return []
+    return [fmt for fmt in ('avif', 'webp') if features.check(fmt)]
+
+
+def save_upload(file_storage, upload_folder):
+    """Stream an uploaded file into the upload folder; returns the stored filename.
+
+    The file is copied in chunks to a temporary name and renamed into place,
+    so readers never see a partially written upload.
+    """
+    filename = f"{uuid.uuid4()}_{secure_filename(file_storage.filename)}"
+    final_path = os.path.join(upload_folder, filename)
+    partial_path = final_path + '.part'
+    with open(partial_path, 'wb') as out:
+        shutil.copyfileobj(file_storage.stream, out, length=64 * 1024)
+    os.replace(partial_path, final_path)
+    return filename
+
+
+def _variant_filename(original, variant, fmt):
+    stem = os.path.splitext(original)[0]
+    return f"{stem}.{variant}.{fmt}"
+
+
+def generate_variants(upload_folder, filename):
+    """Resize an uploaded image into every variant and format.
+
+    Returns (variants, placeholder) where variants maps format -> variant ->
+    {'file', 'width', 'height'} and placeholder is a tiny blurred WebP data URI.
+    """
+    from PIL import Image, ImageFilter, ImageOps
+
+    formats = output_formats()
+    with Image.open(os.path.join(upload_folder, filename)) as source:
+        image = ImageOps.exif_transpose(source)
+        image = image.convert('RGBA' if image.mode in ('RGBA', 'LA', 'P') else 'RGB')
+
+        variants = {fmt: {} for fmt in formats}
+        for variant, max_width in VARIANT_WIDTHS.items():
+            resized = image.copy()
+            resized.thumbnail((max_width, max_width * 4), Image.LANCZOS)
+            for fmt in formats:
+                variant_name = _variant_filename(filename, variant, fmt)
+                resized.save(os.path.join(upload_folder, variant_name), fmt.upper(), quality=QUALITY[fmt])
+                variants[fmt][variant] = {
+                    'file': variant_name,
+                    'width': resized.width,
+                    'height': resized.height,
+                }
+
+        tiny = image.copy()
+        tiny.thumbnail((PLACEHOLDER_WIDTH, PLACEHOLDER_WIDTH * 4), Image.LANCZOS)
+        tiny = tiny.filter(ImageFilter.GaussianBlur(1))
+        buffer = io.BytesIO()
+        tiny.save(buffer, 'WEBP', quality=30)
+        placeholder = 'data:image/webp;base64,' + base64.b64encode(buffer.getvalue()).decode('ascii')
+
+    return variants, placeholder
+
+
+def variant_files(variants):
+    return [info['file'] for by_variant in (variants or {}).values() for info in by_variant.values()]
+
+
+def delete_image_files(upload_folder, filename, variants=None):
+    """Remove an original upload (when given) and all of its generated variants"""
+    folder = os.path.realpath(upload_folder)
+    for name in ([filename] if filename else []) + variant_files(variants):
+        path = os.path.realpath(os.path.join(folder, name))
+        # Names come from the database; never follow one out of the upload folder
+        if os.path.dirname(path) != folder:
+            logger.warning("Not deleting %r: outside the upload folder", name)
+            continue
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def process_project_image(app, project_id, filename):
+    """Worker task: build variants for a project's image and record them"""
+    with app.app_context():
+        upload_folder = app.config['UPLOAD_FOLDER']
+        try:
+            variants, placeholder = generate_variants(upload_folder, filename)
+        except Exception:
+            logger.exception("Image processing failed for %s", filename)
+            return
+
+        project = db.session.get(Project, project_id)
+        if project is None or project.image != filename:
+            # The project was deleted or got a new image while we worked
+            delete_image_files(upload_folder, None, variants)
+            return
+
+        project.image_variants = variants
+        project.image_placeholder = placeholder
+        db.session.commit()
+        invalidate_pages('project-list', f'project:{project_id}')
+
+
+def _get_executor(app):
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=app.config.get('IMAGE_WORKERS', 2),
+                                           thread_name_prefix='images')
+        return _executor
+
+
+def schedule_image_processing(app, project_id, filename):
+    """Hand an uploaded image to the worker pool"""
+    if not output_formats():
+        return None
+    return _get_executor(app).submit(process_project_image, app, project_id, filename)
+
+
+def init_images(app):
+    @app.cli.command('process-images')
+    def process_images_command():
+        """Generate missing image variants for every project with an image."""
+        pending = db.session.execute(
+            db.select(Project.id, Project.image)
+            .where(Project.image.is_not(None), Project.image_variants.is_(None))
+        ).all()
+        for project_id, filename in pending:
+            process_project_image(app, project_id, filename)
+        print(f"Processed {len(pending)} images")
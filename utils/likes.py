@@ -0,0 +1,130 @@
+import logging
+import threading
+import time
+from collections import Counter
+
+from sqlalchemy import func, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models.models import db, Project, ProjectLike
+from utils.dialects import insert_for_dialect
+from utils.page_cache import invalidate_pages
+from utils.stats import bump_stats
+
+logger = logging.getLogger(__name__)
+
+
+def record_like(project_id, user_id):
+    """Record that user_id liked project_id.
+
+    The write is a single idempotent INSERT into project_like, so concurrent
+    requests never touch the project row. Returns True when the like is new
+    and False when the user had already liked the project.
+    """
+    insert = insert_for_dialect(db.session.get_bind().dialect.name)
+
+    if insert is not None:
+        stmt = insert(ProjectLike).values(
+            project_id=project_id,
+            user_id=user_id,
+            counted=False,
+        ).on_conflict_do_nothing(index_elements=['project_id', 'user_id'])
+        result = db.session.execute(stmt)
+        db.session.commit()
+        return result.rowcount == 1
+
+    try:
+        db.session.add(ProjectLike(project_id=project_id, user_id=user_id, counted=False))
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+
+def get_like_count(project_id):
+    """Current like count: rolled-up total plus likes not yet rolled up"""
+    pending = (
+        select(func.count(ProjectLike.id))
+        .where(ProjectLike.project_id == Project.id, ProjectLike.counted.is_(False))
+        .scalar_subquery()
+    )
+    return db.session.execute(
+        select(Project.likes + pending).where(Project.id == project_id)
+    ).scalar()
+
+
+def rollup_likes():
+    """Fold pending ProjectLike rows into Project.likes.
+
+    Pending rows are claimed with a single UPDATE ... RETURNING, so rollups
+    running concurrently in several workers never count a like twice.
+    Returns the number of likes rolled up.
+    """
+    claimed = db.session.execute(
+        update(ProjectLike)
+        .where(ProjectLike.counted.is_(False))
+        .values(counted=True)
+        .returning(ProjectLike.project_id)
+    ).scalars().all()
+
+    per_project = Counter(claimed)
+    # Update projects in a stable order so concurrent rollups can't deadlock
+    for project_id in sorted(per_project):
+        db.session.execute(
+            update(Project)
+            .where(Project.id == project_id)
+            .values(likes=func.coalesce(Project.likes, 0) + per_project[project_id])
+        )
+    bump_stats(total_likes=len(claimed))
+
+    db.session.commit()
+    if claimed:
+        # Listings show the rolled-up Project.likes
+        invalidate_pages('project-list')
+    return len(claimed)
+
+
+_rollup_lock = threading.Lock()
+_rollup_thread = None
+
+
+def _rollup_loop(app, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            with app.app_context():
+                count = rollup_likes()
+                if count:
+                    logger.info("Rolled up %d likes", count)
+        except Exception:
+            logger.exception("Like rollup failed")
+
+
+def init_likes(app):
+    """Register the rollup CLI command and start the periodic rollup thread
+    with the first request"""
+
+    @app.cli.command('rollup-likes')
+    def rollup_likes_command():
+        """Fold pending likes into Project.likes."""
+        print(f"Rolled up {rollup_likes()} likes")
+
+    interval = app.config.get('LIKES_ROLLUP_INTERVAL', 0)
+    if interval <= 0:
+        return
+
+    def start_rollup():
+        global _rollup_thread
+        if _rollup_thread is not None:
+            return
+        with _rollup_lock:
+            if _rollup_thread is None:
+                _rollup_thread = threading.Thread(
+                    target=_rollup_loop, args=(app, interval),
+                    name='like-rollup', daemon=True,
+                )
+                _rollup_thread.start()
+
+    # Started by the first request, so CLI commands don't run it
+    app.before_request(start_rollup)
@@ -0,0 +1,35 @@
+"""
+Column projections for list views.
+
+Project and achievement descriptions are unbounded and deferred on the
+models; a card or table row shows ``summary``, a short prefix stored next
+to them. These helpers restrict a list query to the columns its template
+reads. Any other attribute raises instead of loading lazily, so a template
+that starts using one fails loudly rather than issuing a query per row:
+add the column here.
+"""
+
+from sqlalchemy.orm import load_only
+
+from models.models import Project, Achievement
+
+# Public cards (index.html, /api/projects, search results) and the admin tables
+PROJECT_CARD_COLUMNS = (
+    Project.id, Project.title, Project.summary, Project.tags, Project.status, Project.link,
+    Project.image, Project.image_variants, Project.image_placeholder,
+    Project.likes, Project.comment_count, Project.created_at, Project.updated_at,
+)
+
+ACHIEVEMENT_ITEM_COLUMNS = (
+    Achievement.id, Achievement.title, Achievement.summary, Achievement.date, Achievement.created_at,
+)
+
+
+def project_cards(query):
+    """``query`` (Project entities) loading only what a card shows"""
+    return query.options(load_only(*PROJECT_CARD_COLUMNS, raiseload=True))
+
+
+def achievement_items(query):
+    """``query`` (Achievement entities) loading only what a list item shows"""
+    return query.options(load_only(*ACHIEVEMENT_ITEM_COLUMNS, raiseload=True))
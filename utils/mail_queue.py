@@ -0,0 +1,249 @@
+import logging
+import os
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from email.mime.text import MIMEText
+
+from sqlalchemy import select, update
+
+from models.models import db, OutboundEmail
+
+logger = logging.getLogger(__name__)
+
+# Seconds a claimed message stays leased to one dispatcher before another may retry it
+SEND_LEASE_SECONDS = 300
+
+# Idle seconds after which a pooled SMTP connection is probed with NOOP before reuse
+SMTP_IDLE_PROBE_SECONDS = 10
+
+_dispatcher = None
+_dispatcher_lock = threading.Lock()
+
+
+def smtp_settings():
+    """SMTP settings from the environment"""
+    return {
+        'server': os.getenv('SMTP_SERVER', 'smtp.gmail.com'),
+        'port': int(os.getenv('SMTP_PORT', '587')),
+        'username': os.getenv('SMTP_USERNAME', ''),
+        'password': os.getenv('SMTP_PASSWORD', ''),
+        'use_tls': os.getenv('SMTP_USE_TLS', 'true').lower() not in ('0', 'false', 'no'),
+    }
+
+
+def build_message(sender, recipient, subject, body):
+    msg = MIMEText(body)
+    msg['Subject'] = subject
+    msg['From'] = sender
+    msg['To'] = recipient
+    return msg
+
+
+def open_smtp_connection(settings):
+    """Open an authenticated SMTP connection"""
+    server = smtplib.SMTP(settings['server'], settings['port'], timeout=30)
+    if settings['use_tls']:
+        server.starttls()
+    server.login(settings['username'], settings['password'])
+    return server
+
+
+def enqueue_email(recipient, subject, body):
+    """Persist a message in the outbound queue and wake the dispatcher"""
+    db.session.add(OutboundEmail(recipient=recipient, subject=subject, body=body))
+    db.session.commit()
+    if _dispatcher is not None:
+        _dispatcher.wake()
+
+
+def claim_batch(limit):
+    """Atomically lease up to ``limit`` due messages to this process.
+
+    The UPDATE re-checks status and next_attempt_at, so a row can only be
+    claimed by one dispatcher even when several workers poll concurrently.
+    """
+    now = datetime.utcnow()
+    due_ids = (
+        select(OutboundEmail.id)
+        .where(OutboundEmail.status.in_(('pending', 'sending')),
+               OutboundEmail.next_attempt_at <= now)
+        .order_by(OutboundEmail.next_attempt_at)
+        .limit(limit)
+    )
+    rows = db.session.execute(
+        update(OutboundEmail)
+        .where(OutboundEmail.id.in_(due_ids),
+               OutboundEmail.status.in_(('pending', 'sending')),
+               OutboundEmail.next_attempt_at <= now)
+        .values(status='sending',
+                attempts=OutboundEmail.attempts + 1,
+                next_attempt_at=now + timedelta(seconds=SEND_LEASE_SECONDS))
+        .returning(OutboundEmail.id, OutboundEmail.recipient, OutboundEmail.subject,
+                   OutboundEmail.body, OutboundEmail.attempts)
+    ).all()
+    db.session.commit()
+    return [row._asdict() for row in rows]
+
+
+def record_results(sent_ids, failures, retry_base, max_attempts):
+    """Mark sent messages and schedule retries with exponential backoff.
+
+    ``failures`` is a list of (message dict, error string) pairs.
+    """
+    now = datetime.utcnow()
+    if sent_ids:
+        db.session.execute(
+            update(OutboundEmail)
+            .where(OutboundEmail.id.in_(sent_ids))
+            .values(status='sent', sent_at=now, last_error=None)
+        )
+    for message, error in failures:
+        attempts = message['attempts']
+        if attempts >= max_attempts:
+            values = {'status': 'failed', 'last_error': error}
+        else:
+            delay = retry_base * (2 ** (attempts - 1))
+            values = {'status': 'pending', 'last_error': error,
+                      'next_attempt_at': now + timedelta(seconds=delay)}
+        db.session.execute(
+            update(OutboundEmail).where(OutboundEmail.id == message['id']).values(**values)
+        )
+    db.session.commit()
+
+
+class MailDispatcher:
+    """Background sender draining the OutboundEmail table.
+
+    A poller thread claims due messages in batches and hands them to a small
+    thread pool. Each pool thread keeps its own SMTP connection open between
+    batches, so STARTTLS and login happen once per thread, not per message.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.workers = app.config.get('MAIL_WORKERS', 2)
+        self.batch_size = app.config.get('MAIL_BATCH_SIZE', 20)
+        self.poll_interval = app.config.get('MAIL_POLL_INTERVAL', 5)
+        self.retry_base = app.config.get('MAIL_RETRY_BASE', 30)
+        self.max_attempts = app.config.get('MAIL_MAX_ATTEMPTS', 5)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='mail')
+        self._thread = threading.Thread(target=self._run, name='mail-dispatcher', daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join()
+        self._pool.shutdown(wait=True)
+
+    def wake(self):
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                sent = self.dispatch_once()
+            except Exception:
+                logger.exception("Mail dispatch failed")
+                sent = 0
+            if not sent:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def dispatch_once(self):
+        """Claim one round of due messages and send them; returns the number claimed"""
+        with self.app.app_context():
+            messages = claim_batch(self.batch_size * self.workers)
+        if not messages:
+            return 0
+
+        chunks = [messages[i:i + self.batch_size]
+                  for i in range(0, len(messages), self.batch_size)]
+        results = list(self._pool.map(self._send_chunk, chunks))
+
+        sent_ids = [message_id for ids, _ in results for message_id in ids]
+        failures = [failure for _, errors in results for failure in errors]
+        with self.app.app_context():
+            record_results(sent_ids, failures, self.retry_base, self.max_attempts)
+        return len(messages)
+
+    def _connection(self, settings):
+        server = getattr(self._local, 'server', None)
+        if server is not None and time.monotonic() - self._local.last_used > SMTP_IDLE_PROBE_SECONDS:
+            try:
+                server.noop()
+            except (smtplib.SMTPException, OSError):
+                server = None
+        if server is None:
+            server = open_smtp_connection(settings)
+            self._local.server = server
+        self._local.last_used = time.monotonic()
+        return server
+
+    def _drop_connection(self):
+        server = getattr(self._local, 'server', None)
+        self._local.server = None
+        if server is not None:
+            try:
+                server.quit()
+            except (smtplib.SMTPException, OSError):
+                pass
+
+    def _send_chunk(self, messages):
+        settings = smtp_settings()
+        sent_ids, failures = [], []
+        for message in messages:
+            msg = build_message(settings['username'], message['recipient'],
+                                message['subject'], message['body'])
+            try:
+                self._connection(settings).send_message(msg)
+                sent_ids.append(message['id'])
+            except (smtplib.SMTPException, OSError) as e:
+                # The connection may be half-dead; the next message reconnects
+                self._drop_connection()
+                failures.append((message, str(e)))
+        return sent_ids, failures
+
+
+def get_dispatcher():
+    return _dispatcher
+
+
+def init_mail_queue(app):
+    """Register mail CLI commands and, in queue mode, start the dispatcher with the first request"""
+
+    @app.cli.command('send-queued-mail')
+    def send_queued_mail_command():
+        """Send every due message in the outbound queue and exit."""
+        dispatcher = MailDispatcher(app)
+        total = 0
+        while True:
+            claimed = dispatcher.dispatch_once()
+            if not claimed:
+                break
+            total += claimed
+        print(f"Processed {total} queued messages")
+
+    if app.config.get('MAIL_DELIVERY') != 'queue':
+        return
+
+    def start_dispatcher():
+        global _dispatcher
+        if _dispatcher is not None:
+            return
+        with _dispatcher_lock:
+            if _dispatcher is None:
+                _dispatcher = MailDispatcher(app)
+                _dispatcher.start()
+
+    # Started by the first request, so CLI commands (init-db included, which
+    # runs before the outbound_email table exists) don't run it
+    app.before_request(start_dispatcher)
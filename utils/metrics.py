@@ -0,0 +1,369 @@
+"""
+Per-request timing and SQL instrumentation.
+
+Every request is counted and its wall time recorded per endpoint, which
+costs two clock reads. A sampled fraction (METRICS_SAMPLE_RATE, default
+0.1) also records the Jinja render time, the number of SQL statements and
+the time spent in them, and is checked for N+1 patterns: the same
+statement run METRICS_N_PLUS_ONE_THRESHOLD times or more in one request.
+Flagged requests are logged and listed on /admin/metrics.
+
+The app factory also reports how long the worker took to boot, phase by
+phase, and the time from importing app.py to the end of the first response
+(which includes the first database connection and template compilation).
+
+Open Server-Sent Event streams and the frames pushed to them are reported
+per channel kind from utils/events.py.
+
+The aggregates live in the worker process, like the memory page cache, so
+with several gunicorn workers each scrape or page view shows the worker
+that answered it. The Prometheus endpoint labels its series with the pid.
+"""
+
+import bisect
+import contextvars
+import logging
+import os
+import random
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime
+
+from flask import g, request, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from utils.events import stream_stats
+from utils.db_routing import routing_stats
+
+logger = logging.getLogger(__name__)
+
+SECONDS_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+_sample_rate = 0.0
+_n_plus_one_threshold = 5
+
+# Recorder of the sampled request running in this thread/greenlet, if any
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+
+class Histogram:
+    """Cumulative bucket counts in the Prometheus layout"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q, interpolate=True):
+        """Estimate from the buckets, interpolating inside the one holding q
+        (or returning its upper bound, which suits integer counts)"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if seen + count >= rank and count:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                if i == len(self.buckets):
+                    return lower
+                if not interpolate:
+                    return self.buckets[i]
+                return lower + (self.buckets[i] - lower) * (rank - seen) / count
+            seen += count
+        return self.buckets[-1]
+
+    @property
+    def mean(self):
+        return self.sum / self.count if self.count else None
+
+
+class EndpointMetrics:
+    def __init__(self):
+        self.statuses = Counter()
+        self.duration = Histogram(SECONDS_BUCKETS)
+        self.render = Histogram(SECONDS_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.sql_time = Histogram(SECONDS_BUCKETS)
+        self.n_plus_one = 0
+
+
+class RequestRecorder:
+    """What one sampled request did"""
+
+    __slots__ = ('render_time', 'render_started', 'queries', 'sql_time', 'statements')
+
+    def __init__(self):
+        self.render_time = 0.0
+        self.render_started = []
+        self.queries = 0
+        self.sql_time = 0.0
+        self.statements = Counter()
+
+
+class _Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.started_at = time.time()
+        self.endpoints = {}
+        self.flagged = deque(maxlen=50)
+
+    def record(self, endpoint, path, method, status, duration, recorder):
+        with self.lock:
+            metrics = self.endpoints.get(endpoint)
+            if metrics is None:
+                metrics = self.endpoints[endpoint] = EndpointMetrics()
+            metrics.statuses[(method, status)] += 1
+            metrics.duration.observe(duration)
+            if recorder is None:
+                return
+            metrics.render.observe(recorder.render_time)
+            metrics.queries.observe(recorder.queries)
+            metrics.sql_time.observe(recorder.sql_time)
+
+            repeated = [(statement, count) for statement, count in recorder.statements.items()
+                        if count >= _n_plus_one_threshold]
+            if repeated:
+                metrics.n_plus_one += 1
+                statement, count = max(repeated, key=lambda item: item[1])
+                self.flagged.append({'endpoint': endpoint, 'path': path,
+                                     'count': count, 'statement': statement, 'at': time.time()})
+                logger.warning("Possible N+1 in %s: %d x %s", endpoint, count, statement[:200])
+
+    def reset(self):
+        with self.lock:
+            self.started_at = time.time()
+            self.endpoints.clear()
+            self.flagged.clear()
+
+
+_registry = _Registry()
+
+# Boot phases of this worker (seconds) and its time to first response
+_startup = {'phases': {}, 'started': None, 'first_response': None}
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    recorder = _current.get()
+    if recorder is not None:
+        conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    recorder = _current.get()
+    if recorder is None:
+        return
+    starts = conn.info.get('metrics_query_start')
+    if starts:
+        recorder.sql_time += time.perf_counter() - starts.pop()
+    recorder.queries += 1
+    # Bound parameters are placeholders, so one query shape has one text
+    recorder.statements[statement] += 1
+
+
+def _template_starting(app, template, context, **extra):
+    recorder = _current.get()
+    if recorder is not None:
+        recorder.render_started.append(time.perf_counter())
+
+
+def _template_rendered(app, template, context, **extra):
+    recorder = _current.get()
+    if recorder is not None and recorder.render_started:
+        started = recorder.render_started.pop()
+        # Only count the outermost render_template call
+        if not recorder.render_started:
+            recorder.render_time += time.perf_counter() - started
+
+
+def _start_request():
+    g.metrics_started = time.perf_counter()
+    if _sample_rate and random.random() < _sample_rate:
+        g.metrics_token = _current.set(RequestRecorder())
+
+
+def _note_status(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+def _finish_request(exc):
+    started = g.pop('metrics_started', None)
+    if started is None:
+        return
+    recorder = None
+    token = g.pop('metrics_token', None)
+    if token is not None:
+        recorder = _current.get()
+        _current.reset(token)
+    finished = time.perf_counter()
+    if _startup['first_response'] is None and _startup['started'] is not None:
+        _startup['first_response'] = finished - _startup['started']
+        logger.info("First response %.0f ms after startup", _startup['first_response'] * 1000)
+    _registry.record(request.endpoint or 'unmatched', request.full_path.rstrip('?'), request.method,
+                     g.pop('metrics_status', 500), finished - started, recorder)
+
+
+def record_startup(phases, started):
+    """Called by create_app() with its phase timings and the perf_counter
+    value at which app.py started importing"""
+    _startup.update(phases=dict(phases), started=started, first_response=None)
+
+
+def startup_summary():
+    phases = {name: seconds * 1000 for name, seconds in _startup['phases'].items()}
+    first_response = _startup['first_response']
+    return {'phases_ms': phases, 'total_ms': sum(phases.values()),
+            'first_response_ms': first_response * 1000 if first_response is not None else None}
+
+
+def metrics_summary():
+    """Per endpoint aggregates for the admin page, slowest p95 first"""
+    rows = []
+    with _registry.lock:
+        for endpoint, metrics in _registry.endpoints.items():
+            rows.append({
+                'endpoint': endpoint,
+                'requests': metrics.duration.count,
+                'sampled': metrics.queries.count,
+                'errors': sum(count for (_, status), count in metrics.statuses.items() if status >= 500),
+                'p50_ms': metrics.duration.quantile(0.5) * 1000,
+                'p95_ms': metrics.duration.quantile(0.95) * 1000,
+                'mean_ms': metrics.duration.mean * 1000,
+                'render_ms': metrics.render.mean * 1000 if metrics.render.count else None,
+                'queries': metrics.queries.mean,
+                'p95_queries': metrics.queries.quantile(0.95, interpolate=False),
+                'sql_ms': metrics.sql_time.mean * 1000 if metrics.sql_time.count else None,
+                'n_plus_one': metrics.n_plus_one,
+            })
+        flagged = list(reversed(_registry.flagged))
+        started_at = _registry.started_at
+    rows.sort(key=lambda row: row['p95_ms'], reverse=True)
+    return {'pid': os.getpid(), 'sample_rate': _sample_rate, 'threshold': _n_plus_one_threshold,
+            'since': datetime.fromtimestamp(started_at), 'endpoints': rows, 'flagged': flagged,
+            'startup': startup_summary(), 'streams': stream_stats(), 'databases': routing_stats()}
+
+
+def _labels(**labels):
+    return ','.join(f'{name}="{value}"' for name, value in labels.items())
+
+
+def _histogram_lines(name, histogram, **labels):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets + (float('inf'),), histogram.counts):
+        cumulative += count
+        le = '+Inf' if bound == float('inf') else repr(float(bound))
+        lines.append(f'{name}_bucket{{{_labels(**labels, le=le)}}} {cumulative}')
+    lines.append(f'{name}_sum{{{_labels(**labels)}}} {histogram.sum}')
+    lines.append(f'{name}_count{{{_labels(**labels)}}} {histogram.count}')
+    return lines
+
+
+def prometheus_text():
+    """The aggregates in the Prometheus text exposition format"""
+    pid = os.getpid()
+    families = {
+        'portfolio_http_requests_total': ('counter', 'Requests by endpoint, method and status', []),
+        'portfolio_http_request_duration_seconds': ('histogram', 'Wall time per request', []),
+        'portfolio_template_render_seconds': ('histogram', 'Jinja render time per sampled request', []),
+        'portfolio_db_queries_per_request': ('histogram', 'SQL statements per sampled request', []),
+        'portfolio_db_query_seconds_per_request': ('histogram', 'SQL time per sampled request', []),
+        'portfolio_n_plus_one_requests_total': ('counter', 'Sampled requests flagged as N+1', []),
+        'portfolio_startup_seconds': ('gauge', 'Worker boot time by create_app() phase', []),
+        'portfolio_first_response_seconds': ('gauge', 'From importing app.py to the end of the first response', []),
+        'portfolio_sse_connections': ('gauge', 'Open event streams by channel kind', []),
+        'portfolio_sse_connections_opened_total': ('counter', 'Event streams accepted', []),
+        'portfolio_sse_connections_rejected_total': ('counter', 'Event streams refused at SSE_MAX_CONNECTIONS', []),
+        'portfolio_sse_events_delivered_total': ('counter', 'Event frames queued to open streams', []),
+        'portfolio_sse_events_dropped_total': ('counter', 'Frames dropped from full stream queues', []),
+        'portfolio_db_pool_size': ('gauge', 'Configured connections per engine pool', []),
+        'portfolio_db_pool_checked_out': ('gauge', 'Connections in use per engine pool', []),
+        'portfolio_db_pool_checked_in': ('gauge', 'Idle connections per engine pool', []),
+        'portfolio_db_pool_overflow': ('gauge', 'Connections beyond pool_size per engine pool', []),
+        'portfolio_db_replica_lag_seconds': ('gauge', 'Replica lag at the last heartbeat check', []),
+        'portfolio_db_replica_healthy': ('gauge', '1 while the replica gets reads', []),
+        'portfolio_db_routed_requests_total': ('counter', 'Replica-eligible requests by the engine that served them', []),
+        'portfolio_db_replica_fallbacks_total': ('counter', 'Replica-eligible requests served by the primary, by reason', []),
+    }
+    for phase, seconds in _startup['phases'].items():
+        families['portfolio_startup_seconds'][2].append(
+            f'portfolio_startup_seconds{{{_labels(phase=phase, pid=pid)}}} {seconds}')
+    if _startup['first_response'] is not None:
+        families['portfolio_first_response_seconds'][2].append(
+            f'portfolio_first_response_seconds{{{_labels(pid=pid)}}} {_startup["first_response"]}')
+    for kind, counts in stream_stats()['channels'].items():
+        for name, key in (('portfolio_sse_connections', 'connections'),
+                          ('portfolio_sse_connections_opened_total', 'opened'),
+                          ('portfolio_sse_connections_rejected_total', 'rejected'),
+                          ('portfolio_sse_events_delivered_total', 'delivered'),
+                          ('portfolio_sse_events_dropped_total', 'dropped')):
+            families[name][2].append(f'{name}{{{_labels(channel=kind, pid=pid)}}} {counts[key]}')
+    databases = routing_stats()
+    for engine, pool in databases['pools'].items():
+        for name, key in (('portfolio_db_pool_size', 'size'), ('portfolio_db_pool_checked_out', 'checked_out'),
+                          ('portfolio_db_pool_checked_in', 'checked_in'), ('portfolio_db_pool_overflow', 'overflow')):
+            if pool[key] is not None:
+                families[name][2].append(f'{name}{{{_labels(engine=engine, pid=pid)}}} {pool[key]}')
+    for replica, state in databases['replicas'].items():
+        if state['lag'] is not None:
+            families['portfolio_db_replica_lag_seconds'][2].append(
+                f'portfolio_db_replica_lag_seconds{{{_labels(engine=replica, pid=pid)}}} {state["lag"]}')
+        families['portfolio_db_replica_healthy'][2].append(
+            f'portfolio_db_replica_healthy{{{_labels(engine=replica, pid=pid)}}} {int(state["healthy"])}')
+    for engine, count in databases['routed'].items():
+        families['portfolio_db_routed_requests_total'][2].append(
+            f'portfolio_db_routed_requests_total{{{_labels(engine=engine, pid=pid)}}} {count}')
+    for reason, count in databases['fallbacks'].items():
+        families['portfolio_db_replica_fallbacks_total'][2].append(
+            f'portfolio_db_replica_fallbacks_total{{{_labels(reason=reason, pid=pid)}}} {count}')
+    with _registry.lock:
+        for endpoint, metrics in sorted(_registry.endpoints.items()):
+            for (method, status), count in sorted(metrics.statuses.items()):
+                families['portfolio_http_requests_total'][2].append(
+                    f'portfolio_http_requests_total{{{_labels(endpoint=endpoint, method=method, status=status, pid=pid)}}} {count}')
+            for name, histogram in (('portfolio_http_request_duration_seconds', metrics.duration),
+                                    ('portfolio_template_render_seconds', metrics.render),
+                                    ('portfolio_db_queries_per_request', metrics.queries),
+                                    ('portfolio_db_query_seconds_per_request', metrics.sql_time)):
+                families[name][2].extend(_histogram_lines(name, histogram, endpoint=endpoint, pid=pid))
+            families['portfolio_n_plus_one_requests_total'][2].append(
+                f'portfolio_n_plus_one_requests_total{{{_labels(endpoint=endpoint, pid=pid)}}} {metrics.n_plus_one}')
+
+    lines = []
+    for name, (kind, help_text, samples) in families.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        lines.extend(samples)
+    return '\n'.join(lines) + '\n'
+
+
+def reset_metrics():
+    _registry.reset()
+
+
+def init_metrics(app):
+    """Hook the request lifecycle, SQL and template events"""
+    global _sample_rate, _n_plus_one_threshold
+    _sample_rate = min(1.0, max(0.0, app.config.get('METRICS_SAMPLE_RATE', 0.1)))
+    _n_plus_one_threshold = app.config.get('METRICS_N_PLUS_ONE_THRESHOLD', 5)
+
+    app.before_request(_start_request)
+    app.after_request(_note_status)
+    app.teardown_request(_finish_request)
+
+    if _sample_rate:
+        # On the Engine class so every engine (and pool) is covered
+        if not event.contains(Engine, 'before_cursor_execute', _before_cursor_execute):
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+        before_render_template.connect(_template_starting, app)
+        template_rendered.connect(_template_rendered, app)
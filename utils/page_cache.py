@@ -0,0 +1,295 @@
+import functools
+import hashlib
+import os
+import pickle
+import tempfile
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import current_app, request, session, make_response
+
+from utils.db_routing import read_from_primary
+
+_backend = None
+
+
+class MemoryBackend:
+    """In-process LRU store. Invalidation only reaches the current worker,
+    so with several workers other processes serve stale pages until the TTL
+    expires; use the disk backend when that matters."""
+
+    def __init__(self, max_entries=512):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._tags = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key, entry):
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def tag_version(self, tag):
+        with self._lock:
+            return self._tags.setdefault(tag, uuid.uuid4().hex)
+
+    def bump(self, tag):
+        with self._lock:
+            self._tags[tag] = uuid.uuid4().hex
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tags.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class DiskBackend:
+    """File-per-entry store shared by every worker on the host.
+
+    Tag versions live next to the entries, so an invalidation in one worker
+    is seen by all of them on their next lookup. Hits refresh an entry's
+    mtime; every few writes the least recently used entries beyond
+    ``max_entries`` are removed, so each worker overshoots the limit by at
+    most one pruning interval.
+    """
+
+    def __init__(self, directory, max_entries=512):
+        self.directory = directory
+        self.max_entries = max_entries
+        self._prune_every = max(1, max_entries // 16)
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._tag_dir = os.path.join(directory, 'tags')
+        os.makedirs(self._tag_dir, exist_ok=True)
+
+    def _path(self, key, directory=None):
+        digest = hashlib.sha256(key.encode('utf-8')).hexdigest()
+        return os.path.join(directory or self.directory, digest)
+
+    def _write(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+            os.utime(path)
+            return entry
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+
+    def set(self, key, entry):
+        self._write(self._path(key), pickle.dumps(entry, pickle.HIGHEST_PROTOCOL))
+        with self._lock:
+            self._writes += 1
+            prune = self._writes % self._prune_every == 0
+        if prune:
+            self.prune()
+
+    def _entries(self):
+        """(mtime, path) of every stored entry"""
+        entries = []
+        with os.scandir(self.directory) as it:
+            for item in it:
+                try:
+                    if item.is_file() and not item.name.startswith('tmp'):
+                        entries.append((item.stat().st_mtime, item.path))
+                except OSError:
+                    pass
+        return entries
+
+    def prune(self):
+        """Remove the least recently used entries beyond max_entries"""
+        entries = self._entries()
+        if len(entries) <= self.max_entries:
+            return
+        entries.sort()
+        for _, path in entries[:len(entries) - self.max_entries]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def delete(self, key):
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def tag_version(self, tag):
+        path = self._path(tag, self._tag_dir)
+        try:
+            with open(path, 'r') as f:
+                return f.read()
+        except OSError:
+            version = uuid.uuid4().hex
+            self._write(path, version.encode('ascii'))
+            return version
+
+    def bump(self, tag):
+        self._write(self._path(tag, self._tag_dir), uuid.uuid4().hex.encode('ascii'))
+
+    def clear(self):
+        for directory in (self.directory, self._tag_dir):
+            for name in os.listdir(directory):
+                path = os.path.join(directory, name)
+                if os.path.isfile(path):
+                    os.remove(path)
+
+    def __len__(self):
+        return len(self._entries())
+
+
+class _Stats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+
+_stats = _Stats()
+
+
+def _cacheable_request():
+    """Only anonymous GET/HEAD requests without pending flash messages are cached"""
+    if _backend is None or request.method not in ('GET', 'HEAD'):
+        return False
+    return 'user_id' not in session and '_flashes' not in session
+
+
+def _cache_key(query_args):
+    """Key on the query arguments the view reads; others (``?x=1``, ``?x=2``...)
+    map to the same entry instead of each adding one"""
+    locale = request.accept_languages.best_match(current_app.config['PAGE_CACHE_LOCALES']) or ''
+    view_args = sorted((request.view_args or {}).items())
+    values = [(name, request.args.get(name) or None) for name in query_args]
+    return f"{request.endpoint}|{view_args}|{values}|{locale}"
+
+
+def _is_fresh(entry):
+    if entry['expires_at'] < time.time():
+        return False
+    return all(_backend.tag_version(tag) == version for tag, version in entry['tags'].items())
+
+
+def _finalize(response, etag, last_modified):
+    response.set_etag(etag)
+    response.last_modified = last_modified
+    # Browsers must revalidate; logged-in visitors get a different (uncached)
+    # page, and the key includes the negotiated locale
+    response.headers['Cache-Control'] = 'no-cache'
+    response.vary.add('Cookie')
+    response.vary.add('Accept-Language')
+    return response.make_conditional(request)
+
+
+def cached_page(*tag_templates, query_args=()):
+    """Cache the full response of a public view for anonymous visitors.
+
+    ``tag_templates`` are formatted with the view arguments
+    (e.g. ``'project:{project_id}'``); calling ``invalidate_pages`` with any
+    of the resulting tags expires every page rendered with it.
+    ``query_args`` names the query string arguments the view reads; only
+    those are part of the cache key.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not _cacheable_request():
+                _stats.bypassed += 1
+                return view(*args, **kwargs)
+
+            key = _cache_key(query_args)
+            entry = _backend.get(key)
+            if entry is not None and _is_fresh(entry):
+                _stats.hits += 1
+                response = current_app.response_class(entry['body'], headers=entry['headers'])
+                return _finalize(response, entry['etag'], entry['last_modified'])
+            _stats.misses += 1
+            # Everyone gets what is stored; a lagging replica's page would
+            # outlive the invalidation it missed
+            read_from_primary('page_cache_render')
+
+            # Read tag versions before rendering so an invalidation racing
+            # with this render marks the stored entry stale
+            tags = [template.format(**kwargs) for template in tag_templates]
+            versions = {tag: _backend.tag_version(tag) for tag in tags}
+
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200 or session.modified:
+                return response
+
+            body = response.get_data()
+            etag = hashlib.sha1(body).hexdigest()
+            last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+            _backend.set(key, {
+                'body': body,
+                'headers': [('Content-Type', response.headers['Content-Type'])],
+                'etag': etag,
+                'last_modified': last_modified,
+                'tags': versions,
+                'expires_at': time.time() + current_app.config['PAGE_CACHE_TTL'],
+            })
+            return _finalize(response, etag, last_modified)
+        return wrapper
+    return decorator
+
+
+def invalidate_pages(*tags):
+    """Expire every cached page rendered with any of ``tags``"""
+    if _backend is None:
+        return
+    for tag in tags:
+        _backend.bump(tag)
+
+
+def invalidate_all_pages():
+    """Expire every cached page, e.g. after a bulk import"""
+    if _backend is not None:
+        _backend.clear()
+
+
+def page_cache_stats():
+    return {
+        'backend': type(_backend).__name__ if _backend is not None else None,
+        'entries': len(_backend) if _backend is not None else 0,
+        'hits': _stats.hits,
+        'misses': _stats.misses,
+        'bypassed': _stats.bypassed,
+    }
+
+
+def init_page_cache(app):
+    """Create the configured backend: 'memory', 'disk' or 'none'"""
+    global _backend
+    kind = app.config.get('PAGE_CACHE_BACKEND', 'memory')
+    if kind == 'memory':
+        _backend = MemoryBackend(app.config.get('PAGE_CACHE_MAX_ENTRIES', 512))
+    elif kind == 'disk':
+        directory = app.config.get('PAGE_CACHE_DIR') or os.path.join(app.instance_path, 'page_cache')
+        _backend = DiskBackend(directory, app.config.get('PAGE_CACHE_MAX_ENTRIES', 512))
+    else:
+        _backend = None
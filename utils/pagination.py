@@ -0,0 +1,74 @@
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import DateTime, bindparam, tuple_
+
+from models.types import CompactUUID, parse_id
+
+
+class KeysetPage:
+    """One page of a keyset-paginated query"""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+    @property
+    def has_more(self):
+        return self.next_cursor is not None
+
+
+def encode_cursor(values):
+    """Opaque, URL-safe cursor for the sort key of the last row on a page"""
+    payload = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def _decode_value(column, value):
+    if value is None:
+        return None
+    if isinstance(column.type, DateTime):
+        return datetime.fromisoformat(value)
+    if isinstance(column.type, CompactUUID):
+        return parse_id(value)
+    return value
+
+
+def decode_cursor(cursor, columns):
+    """Decode a cursor back into typed sort-key values; None when it is malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        if not isinstance(values, list) or len(values) != len(columns):
+            return None
+        return [_decode_value(column, value) for column, value in zip(columns, values)]
+    except (ValueError, TypeError):
+        return None
+
+
+def keyset_paginate(query, columns, cursor=None, limit=20):
+    """Fetch the page of ``query`` that follows ``cursor``.
+
+    Rows are ordered by ``columns`` descending; the last column must be unique
+    (normally the primary key) so the order is total. Instead of OFFSET the
+    page starts with a row-value comparison against the previous page's last
+    row, so every page costs the same index range scan no matter how deep it is.
+    """
+    query = query.order_by(*[column.desc() for column in columns])
+
+    after = decode_cursor(cursor, columns) if cursor else None
+    if after is not None:
+        # Bind with the columns' types: a bare id string would compare as text
+        bound = [bindparam(None, value, type_=column.type) for column, value in zip(columns, after)]
+        query = query.filter(tuple_(*columns) < tuple_(*bound))
+
+    # One extra row tells us whether another page exists
+    rows = query.limit(limit + 1).all()
+    items = rows[:limit]
+    next_cursor = None
+    if len(rows) > limit:
+        last = items[-1]
+        next_cursor = encode_cursor([getattr(last, column.key) for column in columns])
+    return KeysetPage(items, next_cursor)
@@ -0,0 +1,44 @@
+"""
+Password hashing with a configurable work factor.
+
+PASSWORD_HASH_METHOD takes any werkzeug method string, e.g. the default
+``scrypt:32768:8:1`` (N, r, p) or ``pbkdf2:sha256:600000``. Every hash
+stores the parameters it was made with, so old hashes keep verifying after
+the setting changes; ``needs_rehash`` tells the login view to replace them
+with the current parameters while it has the plain password at hand.
+"""
+
+from flask import current_app
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+
+# Configured method -> the parameter prefix werkzeug writes for it
+_prefixes = {}
+
+
+def _method():
+    return current_app.config.get('PASSWORD_HASH_METHOD') or DEFAULT_METHOD
+
+
+def hash_password(password):
+    return generate_password_hash(password, method=_method(),
+                                  salt_length=current_app.config.get('PASSWORD_SALT_LENGTH', 16))
+
+
+def verify_password(password_hash, password):
+    return check_password_hash(password_hash, password)
+
+
+def _prefix(method):
+    # werkzeug fills in defaults ("scrypt" -> "scrypt:32768:8:1"), so ask it
+    # once per method instead of parsing method strings here
+    prefix = _prefixes.get(method)
+    if prefix is None:
+        prefix = _prefixes[method] = generate_password_hash('', method=method, salt_length=1).split('$', 1)[0]
+    return prefix
+
+
+def needs_rehash(password_hash):
+    """Whether a stored hash was made with other parameters than the configured ones"""
+    return password_hash.split('$', 1)[0] != _prefix(_method())
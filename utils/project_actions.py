@@ -0,0 +1,67 @@
+"""
+Set-based project status changes and deletes (admin bulk actions).
+
+Each action is one UPDATE or DELETE over every selected project, whatever
+the number of projects or comments involved: comments, likes and tag links
+go with a deleted project through their foreign keys (ON DELETE CASCADE),
+never through the session. The statements bypass the ORM events, so the
+dashboard counters, tag facet counts and the SQLite search index are
+brought along here; callers commit and then expire the page and fragment
+caches of the ids returned.
+"""
+
+from sqlalchemy import delete, select, update
+
+from models.models import db, Project
+from utils.search import index_new_rows, unindex_rows
+from utils.stats import bump_stats
+from utils.tags import adjust_tag_counts
+
+BULK_ACTIONS = {
+    'publish': 'published',
+    'unpublish': 'draft',
+}
+
+
+def set_projects_status(project_ids, status):
+    """Move ``project_ids`` to ``status`` in one UPDATE; returns the ids that changed"""
+    connection = db.session.connection()
+    rows = db.session.execute(
+        update(Project)
+        .where(Project.id.in_(project_ids), Project.status != status)
+        .values(status=status)
+        .returning(Project.id, Project.status, Project.title, Project.tags, Project.description)
+    ).mappings().all()
+    changed = [row['id'] for row in rows]
+    if not changed:
+        return changed
+
+    published = status == 'published'
+    adjust_tag_counts(connection, changed, 1 if published else -1)
+    if published:
+        index_new_rows(connection, 'project', rows)
+    else:
+        unindex_rows(connection, 'project', changed)
+    bump_stats(published_projects=len(changed) if published else -len(changed))
+    return changed
+
+
+def delete_projects(project_ids):
+    """Delete ``project_ids`` in one DELETE; returns the deleted rows
+    (id, image, image_variants) so the caller can remove their files"""
+    connection = db.session.connection()
+    # The tag links are about to cascade away with the projects
+    adjust_tag_counts(connection, select(Project.id).where(Project.id.in_(project_ids),
+                                                          Project.status == 'published'), -1)
+    rows = db.session.execute(
+        delete(Project)
+        .where(Project.id.in_(project_ids))
+        .returning(Project.id, Project.status, Project.likes, Project.comment_count,
+                   Project.image, Project.image_variants)
+    ).all()
+    unindex_rows(connection, 'project', [row.id for row in rows])
+    bump_stats(total_projects=-len(rows),
+               published_projects=-sum(row.status == 'published' for row in rows),
+               total_likes=-sum(row.likes or 0 for row in rows),
+               total_comments=-sum(row.comment_count or 0 for row in rows))
+    return rows
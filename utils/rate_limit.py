@@ -0,0 +1,169 @@
+"""
+Token-bucket rate limiting for the expensive auth endpoints.
+
+A rule like ``'10/60'`` is a bucket of 10 tokens refilled at 10 per 60 s:
+bursts of 10 attempts, then one every 6 s. ``rate_limited`` checks its
+buckets before the view runs, so a throttled request costs a store lookup
+instead of a password hash.
+
+Stores (RATE_LIMIT_STORE):
+
+* ``memory`` (default): per worker process, so N workers allow up to N
+  times the configured rate.
+* ``redis``: shared by every worker and host through REDIS_URL (requires
+  the optional ``redis`` package); the bucket update is a Lua script, so
+  it is atomic. Errors fail open rather than locking everyone out.
+* ``none``: no limiting.
+"""
+
+import functools
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, request, flash, render_template
+
+logger = logging.getLogger(__name__)
+
+_store = None
+
+
+def parse_rule(rule):
+    """'capacity/period_seconds' -> (capacity, tokens per second)"""
+    capacity, period = rule.split('/')
+    capacity, period = int(capacity), float(period)
+    return capacity, capacity / period
+
+
+class MemoryStore:
+    """Buckets in a bounded LRU dict; the oldest keys are dropped first"""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, key, capacity, rate):
+        """Spend a token; returns (allowed, seconds until one is available)"""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (capacity, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return allowed, 0.0 if allowed else (1 - tokens) / rate
+
+    def reset(self, key):
+        with self._lock:
+            self._buckets.pop(key, None)
+
+
+# KEYS[1] bucket; ARGV capacity, rate. Uses the server clock so every
+# worker and host agrees on elapsed time. Returns {allowed, tokens}; tokens
+# as a string because Lua numbers become integers in replies.
+_TAKE_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {allowed, tostring(tokens)}
+"""
+
+
+class RedisStore:
+    def __init__(self, url, prefix='ratelimit:'):
+        import redis
+        self.client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.prefix = prefix
+        self._take = self.client.register_script(_TAKE_SCRIPT)
+
+    def take(self, key, capacity, rate):
+        try:
+            allowed, tokens = self._take(keys=[self.prefix + key], args=[capacity, rate])
+        except Exception as exc:
+            logger.warning("Rate limit store unavailable, allowing the request: %s", exc)
+            return True, 0.0
+        allowed = bool(int(allowed))
+        return allowed, 0.0 if allowed else (1 - float(tokens)) / rate
+
+    def reset(self, key):
+        try:
+            self.client.delete(self.prefix + key)
+        except Exception as exc:
+            logger.warning("Rate limit store unavailable: %s", exc)
+
+
+def client_ip():
+    return request.remote_addr or 'unknown'
+
+
+def form_account():
+    return (request.form.get('email') or '').strip().lower() or None
+
+
+def rate_limited(*limits, template):
+    """Throttle POSTs to a view.
+
+    ``limits`` are ``(name, key_func)`` pairs; the rule for each comes from
+    ``RATE_LIMIT_<NAME>`` in the config and the bucket key from key_func
+    (None skips that bucket). Throttled requests get ``template`` back with
+    status 429 and a Retry-After header.
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if _store is None or request.method != 'POST':
+                return view(*args, **kwargs)
+            for name, key_func in limits:
+                key = key_func()
+                if key is None:
+                    continue
+                capacity, rate = parse_rule(current_app.config[f'RATE_LIMIT_{name.upper()}'])
+                allowed, retry_after = _store.take(f'{name}:{key}', capacity, rate)
+                if not allowed:
+                    retry_after = max(1, math.ceil(retry_after))
+                    logger.warning("Rate limited %s for %s", name, key)
+                    flash(f'Muitas tentativas. Tente novamente em {retry_after} segundos.', 'error')
+                    response = current_app.make_response((render_template(template), 429))
+                    response.headers['Retry-After'] = str(retry_after)
+                    return response
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def reset_limit(name, key):
+    """Forget a bucket, e.g. an account's failed logins after it signs in"""
+    if _store is not None and key is not None:
+        _store.reset(f'{name}:{key}')
+
+
+def init_rate_limit(app):
+    """Create the configured store: 'memory', 'redis' or 'none'"""
+    global _store
+    kind = app.config.get('RATE_LIMIT_STORE', 'memory')
+    if kind == 'memory':
+        _store = MemoryStore()
+    elif kind == 'redis':
+        _store = RedisStore(app.config['REDIS_URL'])
+    elif kind == 'none':
+        _store = None
+    else:
+        raise ValueError(f"Unknown RATE_LIMIT_STORE {kind!r}")
@@ -0,0 +1,287 @@
+"""
+Server-side full-text search over published projects and achievements.
+
+* PostgreSQL: a stored, generated ``search_vector`` tsvector column on
+  ``project`` and ``achievement`` (Portuguese configuration, title weighted
+  above tags above description) with GIN indexes. The database keeps it
+  current on every write.
+* SQLite: an FTS5 table ``search_fts`` holding text run through a light
+  Portuguese stemmer, kept current by the ORM events below.
+
+Both are created by migration 5. Writes that bypass the ORM (bulk UPDATE,
+Core inserts) must call ``index_new_rows()``/``unindex_rows()`` or
+``rebuild_search_index()`` on SQLite.
+"""
+
+import functools
+import re
+import unicodedata
+from types import SimpleNamespace
+
+from sqlalchemy import String, bindparam, event, inspect, select, text
+
+from models.models import db, Project, Achievement
+from utils.listing import project_cards, achievement_items
+from models.types import CompactUUID
+
+TS_CONFIG = 'portuguese'
+
+WORD = re.compile(r'\w+', re.UNICODE)
+
+# Light Portuguese stemmer: (suffix, replacement) steps applied to
+# accent-folded words; each step rewrites at most one suffix and keeps a stem
+# of at least MIN_STEM characters. It only needs to map inflections of a word
+# to the same key, e.g. projeto/projetos/projetar -> projet and
+# aplicação/aplicações/aplicativo -> aplic.
+MIN_STEM = 3
+STEMMER_STEPS = (
+    # Plurals
+    (('oes', 'ao'), ('aes', 'ao'), ('ais', 'al'), ('eis', 'el'), ('ois', 'ol'),
+     ('ns', 'm'), ('res', 'r'), ('ses', 's'), ('s', '')),
+    # Derivational suffixes
+    (('amento', ''), ('imento', ''), ('mente', ''), ('acao', ''), ('icao', ''),
+     ('idade', ''), ('ativo', ''), ('ador', ''), ('ismo', ''), ('ista', '')),
+    # Infinitives and gender/theme vowels
+    (('ar', ''), ('er', ''), ('ir', ''), ('a', ''), ('e', ''), ('o', '')),
+)
+
+
+def fold(word):
+    """Lowercase and strip diacritics"""
+    decomposed = unicodedata.normalize('NFKD', word.lower())
+    return ''.join(c for c in decomposed if not unicodedata.combining(c))
+
+
+# Text repeats a small vocabulary, so bulk indexing mostly hits the cache
+@functools.lru_cache(maxsize=65536)
+def stem(word):
+    word = fold(word)
+    for step in STEMMER_STEPS:
+        for suffix, replacement in step:
+            if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM:
+                if suffix == 's' and word.endswith(('ss', 'us', 'is')):
+                    break
+                word = word[:-len(suffix)] + replacement
+                break
+    return word
+
+
+def stem_text(value):
+    return ' '.join(stem(word) for word in WORD.findall(value or ''))
+
+
+def query_terms(query):
+    """Words of a user query, each used as a prefix"""
+    return [word for word in WORD.findall(query or '') if len(word) > 1][:8]
+
+
+def backend(connection=None):
+    # get_bind() only picks the engine; connection() would check one out of the primary pool
+    dialect = connection.dialect if connection is not None else db.session.get_bind().dialect
+    return 'postgresql' if dialect.name == 'postgresql' else 'fts5'
+
+
+# -- index maintenance (SQLite) ----------------------------------------------
+
+_FTS_DELETE = text('DELETE FROM search_fts WHERE kind = :kind AND object_id = :object_id')
+_FTS_DELETE_MANY = text('DELETE FROM search_fts WHERE kind = :kind AND object_id IN :object_ids').bindparams(
+    bindparam('object_ids', expanding=True))
+_FTS_INSERT = text('INSERT INTO search_fts (kind, object_id, title, tags, body) '
+                   'VALUES (:kind, :object_id, :title, :tags, :body)')
+
+
+def _fts_row(kind, target):
+    if kind == 'project':
+        tags = ' '.join(target.tags or [])
+    else:
+        tags = ''
+    return {
+        'kind': kind,
+        'object_id': target.id,
+        'title': stem_text(target.title),
+        'tags': stem_text(tags),
+        'body': stem_text(target.description),
+    }
+
+
+def _is_searchable(kind, target):
+    return kind == 'achievement' or target.status == 'published'
+
+
+def _reindex(connection, kind, target):
+    if connection.dialect.name != 'sqlite':
+        return
+    connection.execute(_FTS_DELETE, {'kind': kind, 'object_id': target.id})
+    if _is_searchable(kind, target):
+        connection.execute(_FTS_INSERT, _fts_row(kind, target))
+
+
+def _unindex(connection, kind, target):
+    if connection.dialect.name == 'sqlite':
+        connection.execute(_FTS_DELETE, {'kind': kind, 'object_id': target.id})
+
+
+def index_new_rows(connection, kind, rows):
+    """Index rows (mappings) that were just inserted with Core, in one statement"""
+    if connection.dialect.name != 'sqlite':
+        return
+    targets = [SimpleNamespace(**row) for row in rows]
+    entries = [_fts_row(kind, target) for target in targets if _is_searchable(kind, target)]
+    if entries:
+        connection.execute(_FTS_INSERT, entries)
+
+
+def unindex_rows(connection, kind, ids):
+    """Drop rows removed or unpublished with Core from the index"""
+    if connection.dialect.name == 'sqlite' and ids:
+        connection.execute(_FTS_DELETE_MANY, {'kind': kind, 'object_ids': list(ids)})
+
+
+def create_search_index(connection):
+    """Create the dialect's search structures (idempotent)"""
+    if connection.dialect.name == 'postgresql':
+        connection.execute(text(
+            "ALTER TABLE project ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+            f"setweight(to_tsvector('{TS_CONFIG}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{TS_CONFIG}', coalesce(tags::text, '')), 'B') || "
+            f"setweight(to_tsvector('{TS_CONFIG}', coalesce(description, '')), 'C')) STORED"
+        ))
+        connection.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_project_search ON project USING GIN (search_vector) "
+            "WHERE status = 'published'"
+        ))
+        connection.execute(text(
+            "ALTER TABLE achievement ADD COLUMN IF NOT EXISTS search_vector tsvector GENERATED ALWAYS AS ("
+            f"setweight(to_tsvector('{TS_CONFIG}', coalesce(title, '')), 'A') || "
+            f"setweight(to_tsvector('{TS_CONFIG}', coalesce(description, '')), 'C')) STORED"
+        ))
+        connection.execute(text(
+            'CREATE INDEX IF NOT EXISTS ix_achievement_search ON achievement USING GIN (search_vector)'
+        ))
+    elif connection.dialect.name == 'sqlite':
+        connection.execute(text(
+            'CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5('
+            "kind UNINDEXED, object_id UNINDEXED, title, tags, body, "
+            "tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3')"
+        ))
+
+
+def rebuild_search_index(connection=None):
+    """Re-index every row (SQLite only; PostgreSQL vectors are generated columns)"""
+    connection = connection or db.session.connection()
+    if connection.dialect.name != 'sqlite':
+        return 0
+    connection.execute(text('DELETE FROM search_fts'))
+    rows = []
+    projects = connection.execute(
+        select(Project.id, Project.title, Project.tags, Project.description)
+        .where(Project.status == 'published')
+    )
+    rows.extend(_fts_row('project', row) for row in projects)
+    achievements = connection.execute(select(Achievement.id, Achievement.title, Achievement.description))
+    rows.extend(_fts_row('achievement', row) for row in achievements)
+    if rows:
+        connection.execute(_FTS_INSERT, rows)
+    return len(rows)
+
+
+# Attributes that feed the index; other updates (likes, image variants) leave
+# it alone and don't load the deferred description
+_INDEXED = {'project': ('title', 'tags', 'description', 'status'), 'achievement': ('title', 'description')}
+
+
+def _indexed_changed(kind, target):
+    state = inspect(target)
+    return any(state.attrs[name].history.has_changes() for name in _INDEXED[kind])
+
+
+@event.listens_for(Project, 'after_insert')
+def _project_inserted(mapper, connection, target):
+    _reindex(connection, 'project', target)
+
+
+@event.listens_for(Project, 'after_update')
+def _project_updated(mapper, connection, target):
+    if _indexed_changed('project', target):
+        _reindex(connection, 'project', target)
+
+
+@event.listens_for(Project, 'after_delete')
+def _project_deleted(mapper, connection, target):
+    _unindex(connection, 'project', target)
+
+
+@event.listens_for(Achievement, 'after_insert')
+def _achievement_inserted(mapper, connection, target):
+    _reindex(connection, 'achievement', target)
+
+
+@event.listens_for(Achievement, 'after_update')
+def _achievement_updated(mapper, connection, target):
+    if _indexed_changed('achievement', target):
+        _reindex(connection, 'achievement', target)
+
+
+@event.listens_for(Achievement, 'after_delete')
+def _achievement_deleted(mapper, connection, target):
+    _unindex(connection, 'achievement', target)
+
+
+# -- queries ------------------------------------------------------------------
+
+_POSTGRES_SEARCH = text(f"""
+    SELECT kind, id FROM (
+        SELECT 'project' AS kind, id, ts_rank(search_vector, query) AS rank
+        FROM project, to_tsquery('{TS_CONFIG}', :query) AS query
+        WHERE status = 'published' AND search_vector @@ query
+        UNION ALL
+        SELECT 'achievement' AS kind, id, ts_rank(search_vector, query) AS rank
+        FROM achievement, to_tsquery('{TS_CONFIG}', :query) AS query
+        WHERE search_vector @@ query
+    ) AS hits
+    ORDER BY rank DESC
+    LIMIT :limit
+""").columns(kind=String, id=CompactUUID)
+
+# bm25 weights follow the column order: kind, object_id, title, tags, body
+_FTS_SEARCH = text("""
+    SELECT kind, object_id FROM search_fts
+    WHERE search_fts MATCH :query
+    ORDER BY bm25(search_fts, 0, 0, 10.0, 5.0, 1.0)
+    LIMIT :limit
+""")
+
+
+def _search_hits(terms, limit):
+    if backend() == 'postgresql':
+        # The portuguese configuration stems the terms itself
+        query = ' & '.join(f'{term.lower()}:*' for term in terms)
+        return db.session.execute(_POSTGRES_SEARCH, {'query': query, 'limit': limit}).all()
+    query = ' '.join(f'"{stem(term)}"*' for term in terms)
+    return db.session.execute(_FTS_SEARCH, {'query': query, 'limit': limit}).all()
+
+
+def search(query, limit=20):
+    """Ranked (kind, object) pairs for a user query; kind is 'project' or 'achievement'"""
+    terms = query_terms(query)
+    if not terms:
+        return []
+    hits = _search_hits(terms, limit)
+
+    loaded = {}
+    for kind, model, columns in (('project', Project, project_cards), ('achievement', Achievement, achievement_items)):
+        ids = [object_id for hit_kind, object_id in hits if hit_kind == kind]
+        if ids:
+            rows = db.session.execute(columns(select(model)).where(model.id.in_(bindparam('ids', expanding=True))),
+                                      {'ids': ids}).scalars()
+            loaded.update(((kind, row.id), row) for row in rows)
+    return [(kind, loaded[(kind, object_id)]) for kind, object_id in hits if (kind, object_id) in loaded]
+
+
+def init_search(app):
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Re-index projects and achievements for full-text search."""
+        count = rebuild_search_index()
+        db.session.commit()
+        print(f"Indexed {count} documents" if backend() == 'fts5' else "PostgreSQL search vectors are generated columns")
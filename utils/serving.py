@@ -0,0 +1,98 @@
+"""
+Gunicorn worker profiles and the database pool sizing that goes with them.
+
+Read by both ``gunicorn.conf.py`` (worker settings) and ``app.py`` (engine
+options) so the per-process pool always matches the number of requests a
+worker can run at once:
+
+* ``sync``: one request per worker; simple, but a slow SMTP call or upload
+  blocks the whole worker.
+* ``gthread`` (default): GUNICORN_THREADS requests per worker.
+* ``gevent``: up to GUNICORN_WORKER_CONNECTIONS (1000) cooperative requests
+  per worker; only DB_POOL_SIZE of them hold a database connection at a time
+  (requires the optional gevent and psycogreen packages).
+
+Server-Sent Event streams (utils/events.py) hold a thread or greenlet for
+as long as the page is open, so ``event_stream_limit`` leaves most of a
+gthread worker to ordinary requests and sync workers get none; gevent is
+the profile for many live viewers.
+
+Environment: GUNICORN_PROFILE, WEB_CONCURRENCY (workers), GUNICORN_THREADS,
+GUNICORN_WORKER_CONNECTIONS, DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT.
+"""
+
+import multiprocessing
+import os
+
+PROFILES = ('sync', 'gthread', 'gevent')
+
+# Connections used by the in-process background jobs (likes rollup, mail
+# dispatcher, image workers) on top of request handling
+BACKGROUND_CONNECTIONS = 2
+
+
+def _env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value else default
+
+
+def serving_profile():
+    """Worker settings for the profile selected by GUNICORN_PROFILE"""
+    profile = os.environ.get('GUNICORN_PROFILE', 'gthread')
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown GUNICORN_PROFILE {profile!r}; expected one of {', '.join(PROFILES)}")
+
+    cpus = multiprocessing.cpu_count()
+    # gthread also caps open (incl. keep-alive) connections per worker with this
+    settings = {'profile': profile, 'worker_class': profile, 'threads': 1,
+                'worker_connections': _env_int('GUNICORN_WORKER_CONNECTIONS', 1000)}
+    if profile == 'sync':
+        settings['workers'] = _env_int('WEB_CONCURRENCY', 2 * cpus + 1)
+    elif profile == 'gthread':
+        # Threads cover I/O waits, so fewer processes are needed than with sync
+        settings['workers'] = _env_int('WEB_CONCURRENCY', cpus + 1)
+        settings['threads'] = _env_int('GUNICORN_THREADS', 8)
+    else:
+        settings['workers'] = _env_int('WEB_CONCURRENCY', cpus + 1)
+    return settings
+
+
+def request_concurrency(settings):
+    """Requests a single worker process may run at the same time"""
+    if settings['profile'] == 'gevent':
+        return settings['worker_connections']
+    return settings['threads']
+
+
+def event_stream_limit(settings=None):
+    """Open event streams a worker accepts: half of what it can run at once"""
+    settings = settings or serving_profile()
+    if settings['profile'] == 'sync':
+        return 0
+    return request_concurrency(settings) // 2
+
+
+def db_pool_options(settings=None):
+    """pool_size/max_overflow/pool_timeout for one worker process.
+
+    Threads each need their own connection, so the pool covers every thread
+    plus the background jobs. Thousands of greenlets cannot each hold one, so
+    gevent workers share a fixed pool and queue for it (pool_timeout).
+    """
+    settings = settings or serving_profile()
+    if settings['profile'] == 'gevent':
+        pool_size = _env_int('DB_POOL_SIZE', 10)
+    else:
+        pool_size = _env_int('DB_POOL_SIZE', request_concurrency(settings) + BACKGROUND_CONNECTIONS)
+    return {
+        'pool_size': pool_size,
+        'max_overflow': _env_int('DB_MAX_OVERFLOW', max(2, pool_size // 4)),
+        'pool_timeout': _env_int('DB_POOL_TIMEOUT', 10),
+    }
+
+
+def database_connections(settings=None):
+    """Upper bound on server connections opened by all workers"""
+    settings = settings or serving_profile()
+    pool = db_pool_options(settings)
+    return settings['workers'] * (pool['pool_size'] + pool['max_overflow'])
@@ -0,0 +1,366 @@
+"""
+Server-side sessions and the per-request current user.
+
+The cookie carries only a random session id; the session data lives in a
+store (SESSION_BACKEND):
+
+* ``database`` (default): a ``user_session`` row per session, shared by
+  every worker and host.
+* ``filesystem``: a file per session under SESSION_DIR, shared by the
+  workers of one host.
+* ``memory``: a per worker LRU. Sessions are lost on restart and a worker
+  does not see the others' sessions, so only for a single-worker server.
+* ``cookie``: Flask's signed cookie, nothing stored. Logging out cannot
+  invalidate a copied cookie.
+
+Stores are keyed by a SHA-256 of the id, so a leaked store holds no usable
+cookies. Session data is loaded on first access, so requests that never
+look at the session (static files) cost no store lookup, and a visitor
+without a cookie costs none at all.
+
+The session keeps only ``user_id``; ``current_user()`` loads the User once
+per request into ``g``, so a rename or a lost admin flag is seen on the
+next request instead of living on in the cookie.
+"""
+
+import hashlib
+import json
+import os
+import secrets
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+
+from flask import g, session
+from flask.json.tag import TaggedJSONSerializer
+from flask.sessions import SessionInterface, SessionMixin
+from sqlalchemy import delete, insert, select, update
+
+from models.models import db, User, UserSession
+
+_store = None
+
+
+def _key(sid):
+    return hashlib.sha256(sid.encode('ascii', 'replace')).hexdigest()
+
+
+class MemoryStore:
+    """Records in a bounded LRU dict, with an index of each user's sessions"""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._records = OrderedDict()
+        self._by_user = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            record = self._records.get(key)
+            if record is None:
+                return None
+            if record[2] < time.time():
+                self._drop(key)
+                return None
+            self._records.move_to_end(key)
+            return record[0], record[2]
+
+    def save(self, key, payload, user_id, expires_at, new=False):
+        with self._lock:
+            self._drop(key)
+            self._records[key] = (payload, user_id, expires_at)
+            if user_id is not None:
+                self._by_user.setdefault(user_id, set()).add(key)
+            while len(self._records) > self.max_entries:
+                self._drop(next(iter(self._records)))
+
+    def delete(self, key):
+        with self._lock:
+            self._drop(key)
+
+    def delete_user(self, user_id, keep=None):
+        with self._lock:
+            for key in list(self._by_user.get(user_id, ())):
+                if key != keep:
+                    self._drop(key)
+
+    def purge(self):
+        now = time.time()
+        with self._lock:
+            expired = [key for key, record in self._records.items() if record[2] < now]
+            for key in expired:
+                self._drop(key)
+        return len(expired)
+
+    def _drop(self, key):
+        record = self._records.pop(key, None)
+        if record is not None and record[1] is not None:
+            keys = self._by_user.get(record[1])
+            keys.discard(key)
+            if not keys:
+                del self._by_user[record[1]]
+
+
+class FileStore:
+    """A JSON file per session. Revoking a user's sessions reads every
+    file, which is fine for the few accounts this site has."""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _read(self, path):
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def get(self, key):
+        record = self._read(os.path.join(self.directory, key))
+        if record is None or record['expires_at'] < time.time():
+            return None
+        return record['data'], record['expires_at']
+
+    def save(self, key, payload, user_id, expires_at, new=False):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'data': payload, 'user_id': user_id, 'expires_at': expires_at}, f)
+        os.replace(tmp_path, os.path.join(self.directory, key))
+
+    def delete(self, key):
+        try:
+            os.remove(os.path.join(self.directory, key))
+        except OSError:
+            pass
+
+    def _select(self, predicate):
+        for name in os.listdir(self.directory):
+            if name.startswith('.'):
+                continue
+            record = self._read(os.path.join(self.directory, name))
+            if record is not None and predicate(name, record):
+                yield name
+
+    def delete_user(self, user_id, keep=None):
+        for key in list(self._select(lambda key, record: record['user_id'] == user_id and key != keep)):
+            self.delete(key)
+
+    def purge(self):
+        now = time.time()
+        expired = list(self._select(lambda key, record: record['expires_at'] < now))
+        for key in expired:
+            self.delete(key)
+        return len(expired)
+
+
+class DatabaseStore:
+    """``user_session`` rows. Writes go through the request's db.session
+    after the view has run; anything the view left uncommitted would be
+    rolled back at teardown anyway, so it is rolled back first."""
+
+    def get(self, key):
+        row = db.session.execute(
+            select(UserSession.data, UserSession.expires_at).where(UserSession.id == key)
+        ).first()
+        if row is None or row.expires_at < datetime.utcnow():
+            return None
+        return row.data, (row.expires_at - datetime(1970, 1, 1)).total_seconds()
+
+    def save(self, key, payload, user_id, expires_at, new=False):
+        db.session.rollback()
+        values = {'data': payload, 'user_id': user_id, 'expires_at': datetime.utcfromtimestamp(expires_at)}
+        if new:
+            db.session.execute(insert(UserSession).values(id=key, **values))
+        else:
+            db.session.execute(update(UserSession).where(UserSession.id == key).values(**values))
+        db.session.commit()
+
+    def delete(self, key):
+        db.session.rollback()
+        db.session.execute(delete(UserSession).where(UserSession.id == key))
+        db.session.commit()
+
+    def delete_user(self, user_id, keep=None):
+        statement = delete(UserSession).where(UserSession.user_id == user_id)
+        if keep is not None:
+            statement = statement.where(UserSession.id != keep)
+        db.session.execute(statement)
+        db.session.commit()
+
+    def purge(self):
+        result = db.session.execute(delete(UserSession).where(UserSession.expires_at < datetime.utcnow()))
+        db.session.commit()
+        return result.rowcount
+
+
+class ServerSession(SessionMixin):
+    """Session whose data is fetched from the store on first access"""
+
+    def __init__(self, loader, cookie=None):
+        # The id the browser sent, and the id of the stored record (None
+        # until one is written); an id the store doesn't know is never
+        # adopted, so a planted cookie can't become someone's session
+        self.cookie = cookie
+        self.sid = cookie
+        self.expires_at = None
+        self.modified = False
+        # Set to issue a new id on save (login/logout), against session fixation
+        self.rotate = False
+        self._loader = loader
+        self._data = None
+
+    @property
+    def loaded(self):
+        return self._data is not None
+
+    @property
+    def data(self):
+        if self._data is None:
+            record = self._loader(self.sid) if self.sid else None
+            if record is None:
+                self._data = {}
+                self.sid = None
+            else:
+                self._data, self.expires_at = record
+        return self._data
+
+    def __getitem__(self, key):
+        return self.data[key]
+
+    def __setitem__(self, key, value):
+        self.data[key] = value
+        self.modified = True
+
+    def __delitem__(self, key):
+        del self.data[key]
+        self.modified = True
+
+    def __iter__(self):
+        return iter(self.data)
+
+    def __len__(self):
+        return len(self.data)
+
+    def clear(self):
+        self._data = {}
+        self.modified = True
+
+
+class ServerSessionInterface(SessionInterface):
+    serializer = TaggedJSONSerializer()
+
+    def __init__(self, store):
+        self.store = store
+
+    def _load(self, sid):
+        record = self.store.get(_key(sid))
+        if record is None:
+            return None
+        payload, expires_at = record
+        return self.serializer.loads(payload), expires_at
+
+    def open_session(self, app, request):
+        return ServerSession(self._load, request.cookies.get(self.get_cookie_name(app)))
+
+    def save_session(self, app, session, response):
+        if not session.loaded and not session.modified:
+            return
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+
+        if session.sid and (session.rotate or not session):
+            self.store.delete(_key(session.sid))
+            session.sid = None
+        if not session:
+            if session.cookie:
+                response.delete_cookie(name, domain=domain, path=path,
+                                       secure=self.get_cookie_secure(app), httponly=self.get_cookie_httponly(app))
+            return
+
+        lifetime = app.permanent_session_lifetime.total_seconds()
+        now = time.time()
+        # Sliding expiry, written at most once per half lifetime for an unchanged session
+        stale = session.expires_at is None or session.expires_at - now < lifetime / 2
+        if session.sid and not session.modified and not stale:
+            return
+
+        new = session.sid is None
+        if new:
+            session.sid = secrets.token_urlsafe(32)
+        self.store.save(_key(session.sid), self.serializer.dumps(dict(session)),
+                        session.get('user_id'), now + lifetime, new=new)
+        response.set_cookie(
+            name, session.sid, expires=self.get_expiration_time(app, session),
+            httponly=self.get_cookie_httponly(app), domain=domain, path=path,
+            secure=self.get_cookie_secure(app), samesite=self.get_cookie_samesite(app),
+        )
+        response.vary.add('Cookie')
+
+
+def current_user():
+    """The logged-in User, loaded at most once per request; None for visitors"""
+    if 'current_user' not in g:
+        user_id = session.get('user_id')
+        user = db.session.get(User, user_id) if user_id else None
+        if user_id and user is None:
+            # The account is gone; drop what is left of its session
+            session.clear()
+        g.current_user = user
+    return g.current_user
+
+
+def login_user(user):
+    """Start a fresh session (new id) for ``user``"""
+    session.clear()
+    session.rotate = True
+    session['user_id'] = user.id
+    g.current_user = user
+
+
+def logout_user():
+    """Forget the session in the store, not just in the browser"""
+    session.clear()
+    session.rotate = True
+    g.current_user = None
+
+
+def revoke_sessions(user_id, keep_current=False):
+    """Log ``user_id`` out everywhere, optionally except for this session.
+
+    A no-op with the cookie backend, which has nothing to revoke.
+    """
+    if _store is None:
+        return
+    keep = _key(session.sid) if keep_current and getattr(session, 'sid', None) else None
+    _store.delete_user(user_id, keep=keep)
+
+
+def init_sessions(app):
+    """Install the configured backend: 'database', 'filesystem', 'memory' or 'cookie'"""
+    global _store
+    kind = app.config.get('SESSION_BACKEND', 'database')
+    if kind == 'database':
+        _store = DatabaseStore()
+    elif kind == 'filesystem':
+        _store = FileStore(app.config.get('SESSION_DIR') or os.path.join(app.instance_path, 'sessions'))
+    elif kind == 'memory':
+        _store = MemoryStore(app.config.get('SESSION_MEMORY_MAX', 10000))
+    elif kind == 'cookie':
+        _store = None
+    else:
+        raise ValueError(f"Unknown SESSION_BACKEND {kind!r}")
+    if _store is not None:
+        app.session_interface = ServerSessionInterface(_store)
+
+    @app.context_processor
+    def inject_current_user():
+        return {'current_user': current_user()}
+
+    @app.cli.command('purge-sessions')
+    def purge_sessions_command():
+        """Delete expired sessions from the store."""
+        print(f"Purged {_store.purge() if _store is not None else 0} sessions")
@@ -0,0 +1,96 @@
+import threading
+import time
+from types import SimpleNamespace
+
+from models.models import User, AboutInfo
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Small thread-safe, process-local cache with per-entry expiry.
+
+    Values are loaded on demand through ``get_or_load`` and kept for ``ttl``
+    seconds or until ``invalidate`` is called. Hit and miss counters are kept
+    so the cache's effectiveness can be inspected at runtime.
+    """
+
+    def __init__(self, ttl=60):
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, loader):
+        now = time.monotonic()
+        with self._lock:
+            value, expires_at = self._entries.get(key, (_MISSING, 0))
+            if value is not _MISSING and expires_at > now:
+                self.hits += 1
+                return value
+            self.misses += 1
+
+        value = loader()
+        with self._lock:
+            self._entries[key] = (value, now + self.ttl)
+        return value
+
+    def invalidate(self, key=None):
+        """Drop one key, or every entry when key is None"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'entries': len(self._entries),
+                'ttl': self.ttl,
+            }
+
+
+# Site owner data (admin email, about page) changes only through admin.update_profile
+owner_cache = TTLCache()
+
+
+def _snapshot(instance):
+    """Detached, read-only copy of a model row that is safe to share across requests"""
+    values = {column.name: getattr(instance, column.name) for column in instance.__table__.columns}
+    for name, value in values.items():
+        if isinstance(value, list):
+            values[name] = tuple(value)
+    return SimpleNamespace(**values)
+
+
+def get_admin_email():
+    """Email address of the site owner, or None when there is no admin"""
+    def load():
+        admin_user = User.query.filter_by(is_admin=True).first()
+        return admin_user.email if admin_user else None
+    return owner_cache.get_or_load('admin_email', load)
+
+
+def get_about_info():
+    """Snapshot of the AboutInfo row, or None when it hasn't been created"""
+    def load():
+        about_info = AboutInfo.query.first()
+        return _snapshot(about_info) if about_info else None
+    return owner_cache.get_or_load('about_info', load)
+
+
+def invalidate_owner_cache():
+    owner_cache.invalidate()
+
+
+def init_site_cache(app):
+    owner_cache.ttl = app.config.get('SITE_CACHE_TTL', 60)
+
+
+def cache_stats():
+    """Hit/miss counters for every process-local cache"""
+    return {'owner': owner_cache.stats()}
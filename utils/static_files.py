@@ -0,0 +1,170 @@
+"""
+Static and upload file serving.
+
+Static URLs carry a content hash (``/static/css/style.css?v=1a2b3c4d5e``) so a
+versioned request can be cached forever; uploads are named with a uuid and
+never change in place, so they are immutable too. CSS/JS are served from
+precompressed ``.br``/``.gz`` siblings built by ``flask compress-static``.
+
+STATIC_SEND_MODE picks who sends the bytes:
+
+* ``direct``: Flask streams the file (development, single process);
+* ``x-sendfile``: Apache/lighttpd style ``X-Sendfile`` header with the path;
+* ``x-accel``: nginx ``X-Accel-Redirect`` to an internal location, e.g.::
+
+      location /_internal/static/  { internal; alias /srv/app/static/; }
+      location /_internal/uploads/ { internal; alias /srv/app/uploads/; }
+"""
+
+import gzip
+import hashlib
+import mimetypes
+import os
+import threading
+
+from flask import abort, current_app, request, send_file
+from werkzeug.security import safe_join
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; gzip siblings are always built
+    brotli = None
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+COMPRESSIBLE_EXTENSIONS = {'.css', '.js', '.svg', '.json', '.txt', '.map'}
+
+# Content-Encoding -> sibling suffix, in order of preference
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+_versions = {}
+_versions_lock = threading.Lock()
+
+
+def file_version(path):
+    """Short content hash of a file, recomputed only when its mtime changes"""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+    cached = _versions.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(64 * 1024), b''):
+            digest.update(chunk)
+    version = digest.hexdigest()[:10]
+    with _versions_lock:
+        _versions[path] = (mtime, version)
+    return version
+
+
+def static_version(filename):
+    path = safe_join(current_app.static_folder, filename)
+    return file_version(path) if path else None
+
+
+def _precompressed(path):
+    """(encoding, sibling path) of the best fresh precompressed copy the client accepts"""
+    if os.path.splitext(path)[1] not in COMPRESSIBLE_EXTENSIONS:
+        return None, path
+    mtime = os.stat(path).st_mtime
+    for encoding, suffix in PRECOMPRESSED:
+        if encoding not in request.accept_encodings:
+            continue
+        sibling = path + suffix
+        try:
+            if os.stat(sibling).st_mtime >= mtime:
+                return encoding, sibling
+        except OSError:
+            continue
+    return None, path
+
+
+def send_asset(directory, filename, internal_prefix, immutable):
+    """Send a file from directory using the configured STATIC_SEND_MODE"""
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    encoding, send_path = _precompressed(path)
+
+    if current_app.config['STATIC_SEND_MODE'] == 'x-accel':
+        response = current_app.response_class(mimetype=mimetype)
+        internal_name = filename + send_path[len(path):]
+        response.headers['X-Accel-Redirect'] = internal_prefix + internal_name
+    else:
+        # send_file emits X-Sendfile itself when USE_X_SENDFILE is set
+        response = send_file(send_path, mimetype=mimetype, conditional=True)
+
+    if encoding:
+        response.headers['Content-Encoding'] = encoding
+    if os.path.splitext(path)[1] in COMPRESSIBLE_EXTENSIONS:
+        response.vary.add('Accept-Encoding')
+    if immutable:
+        response.headers['Cache-Control'] = IMMUTABLE
+    else:
+        response.headers['Cache-Control'] = 'public, no-cache'
+    return response
+
+
+def serve_static(filename):
+    """Replacement for Flask's static view: immutable when the URL hash is current"""
+    version = request.args.get('v')
+    immutable = version is not None and version == static_version(filename)
+    return send_asset(current_app.static_folder, filename,
+                      current_app.config['X_ACCEL_STATIC_PREFIX'], immutable)
+
+
+def serve_upload(filename):
+    """Uploads and their variants are uuid-named and never rewritten"""
+    directory = os.path.join(current_app.root_path, current_app.config['UPLOAD_FOLDER'])
+    return send_asset(directory, filename, current_app.config['X_ACCEL_UPLOADS_PREFIX'], True)
+
+
+def compress_static(static_folder):
+    """Write .gz (and .br when brotli is installed) next to each compressible file"""
+    written = 0
+    for root, _, files in os.walk(static_folder):
+        for name in files:
+            path = os.path.join(root, name)
+            if os.path.splitext(name)[1] not in COMPRESSIBLE_EXTENSIONS:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            siblings = {path + '.gz': lambda: gzip.compress(data, 9, mtime=0)}
+            if brotli is not None:
+                siblings[path + '.br'] = lambda: brotli.compress(data, quality=11)
+            for sibling, compress in siblings.items():
+                compressed = compress()
+                if len(compressed) >= len(data):
+                    continue
+                with open(sibling, 'wb') as f:
+                    f.write(compressed)
+                written += 1
+    return written
+
+
+def init_static_files(app):
+    mode = app.config['STATIC_SEND_MODE']
+    if mode not in ('direct', 'x-sendfile', 'x-accel'):
+        raise ValueError(f"Unknown STATIC_SEND_MODE {mode!r}")
+    app.config['USE_X_SENDFILE'] = mode == 'x-sendfile'
+    app.view_functions['static'] = serve_static
+
+    @app.url_defaults
+    def add_static_version(endpoint, values):
+        if endpoint == 'static' and 'v' not in values and 'filename' in values:
+            version = static_version(values['filename'])
+            if version:
+                values['v'] = version
+
+    @app.cli.command('compress-static')
+    def compress_static_command():
+        """Precompress CSS/JS in the static folder (gzip, plus brotli if installed)."""
+        written = compress_static(app.static_folder)
+        if brotli is None:
+            print("brotli is not installed; wrote gzip copies only")
+        print(f"Wrote {written} precompressed files")
@@ -0,0 +1,174 @@
+from datetime import datetime
+
+from sqlalchemy import event, func, inspect, select, update
+
+from models.models import db, User, Project, Achievement, Comment, SiteStats
+
+STATS_ID = 1
+
+COUNTERS = ('total_projects', 'published_projects', 'total_achievements',
+            'total_users', 'total_comments', 'total_likes')
+
+
+def apply_deltas(connection, **deltas):
+    """Add deltas to the stats row inside the caller's transaction"""
+    values = {name: getattr(SiteStats, name) + delta for name, delta in deltas.items() if delta}
+    if not values:
+        return
+    values['updated_at'] = datetime.utcnow()
+    connection.execute(update(SiteStats).where(SiteStats.id == STATS_ID).values(**values))
+    # Live dashboards get the new counters once this commits (utils/events.py)
+    connection.info['stats_changed'] = True
+
+
+def bump_stats(**deltas):
+    """Apply deltas for writes that bypass the ORM (bulk UPDATE/DELETE, Core inserts)"""
+    apply_deltas(db.session.connection(), **deltas)
+
+
+def apply_project_comment_deltas(connection, deltas):
+    """Add {project_id: delta} to Project.comment_count, one UPDATE per distinct delta"""
+    by_delta = {}
+    for project_id, delta in deltas.items():
+        if delta:
+            by_delta.setdefault(delta, []).append(project_id)
+    for delta, project_ids in by_delta.items():
+        connection.execute(update(Project).where(Project.id.in_(project_ids))
+                           .values(comment_count=Project.comment_count + delta))
+
+
+def compute_stats(connection):
+    """Count everything from scratch"""
+    def scalar(stmt):
+        return connection.execute(stmt).scalar() or 0
+
+    return {
+        'total_projects': scalar(select(func.count()).select_from(Project)),
+        'published_projects': scalar(select(func.count()).select_from(Project).where(Project.status == 'published')),
+        'total_achievements': scalar(select(func.count()).select_from(Achievement)),
+        'total_users': scalar(select(func.count()).select_from(User).where(User.is_admin.is_(False))),
+        'total_comments': scalar(select(func.count()).select_from(Comment)),
+        'total_likes': scalar(select(func.sum(Project.likes))),
+    }
+
+
+def rebuild_stats(connection=None):
+    """Recount every counter and store the result; returns the counters"""
+    connection = connection or db.session.connection()
+    counters = compute_stats(connection)
+    counters['updated_at'] = datetime.utcnow()
+    if connection.execute(select(SiteStats.id).where(SiteStats.id == STATS_ID)).first():
+        connection.execute(update(SiteStats).where(SiteStats.id == STATS_ID).values(**counters))
+    else:
+        connection.execute(SiteStats.__table__.insert().values(id=STATS_ID, **counters))
+    connection.info['stats_changed'] = True
+    return counters
+
+
+def get_stats():
+    """Dashboard counters from the stats row (one primary-key read)"""
+    row = db.session.get(SiteStats, STATS_ID)
+    if row is None:
+        rebuild_stats()
+        db.session.commit()
+        row = db.session.get(SiteStats, STATS_ID)
+    stats = {name: getattr(row, name) for name in COUNTERS}
+    stats['updated_at'] = row.updated_at.isoformat() if row.updated_at else None
+    return stats
+
+
+def _changed(target, attribute):
+    """(old, new) for an attribute changed in the current flush, or None"""
+    history = inspect(target).attrs[attribute].history
+    if not history.has_changes():
+        return None
+    old = history.deleted[0] if history.deleted else None
+    new = history.added[0] if history.added else None
+    return old, new
+
+
+@event.listens_for(Project, 'after_insert')
+def _project_inserted(mapper, connection, target):
+    apply_deltas(connection, total_projects=1,
+                 published_projects=int(target.status == 'published'),
+                 total_likes=target.likes or 0)
+
+
+@event.listens_for(Project, 'after_update')
+def _project_updated(mapper, connection, target):
+    deltas = {}
+    status = _changed(target, 'status')
+    if status:
+        deltas['published_projects'] = int(status[1] == 'published') - int(status[0] == 'published')
+    likes = _changed(target, 'likes')
+    if likes:
+        deltas['total_likes'] = (likes[1] or 0) - (likes[0] or 0)
+    apply_deltas(connection, **deltas)
+
+
+@event.listens_for(Project, 'before_delete')
+def _project_deleting(mapper, connection, target):
+    # The database deletes the comments left (ON DELETE CASCADE) without
+    # _comment_deleted seeing them; loaded ones already went through it and
+    # are no longer in the stored count
+    comments = connection.execute(select(Project.comment_count).where(Project.id == target.id)).scalar()
+    apply_deltas(connection, total_projects=-1,
+                 published_projects=-int(target.status == 'published'),
+                 total_likes=-(target.likes or 0),
+                 total_comments=-(comments or 0))
+
+
+@event.listens_for(Comment, 'after_insert')
+def _comment_inserted(mapper, connection, target):
+    apply_deltas(connection, total_comments=1)
+    connection.execute(update(Project).where(Project.id == target.project_id)
+                       .values(comment_count=Project.comment_count + 1))
+
+
+@event.listens_for(Comment, 'after_delete')
+def _comment_deleted(mapper, connection, target):
+    apply_deltas(connection, total_comments=-1)
+    connection.execute(update(Project).where(Project.id == target.project_id)
+                       .values(comment_count=Project.comment_count - 1))
+
+
+@event.listens_for(User, 'after_insert')
+def _user_inserted(mapper, connection, target):
+    apply_deltas(connection, total_users=int(not target.is_admin))
+
+
+@event.listens_for(User, 'after_update')
+def _user_updated(mapper, connection, target):
+    is_admin = _changed(target, 'is_admin')
+    if is_admin:
+        apply_deltas(connection, total_users=int(not is_admin[1]) - int(not is_admin[0]))
+
+
+@event.listens_for(User, 'before_delete')
+def _user_deleting(mapper, connection, target):
+    # As for projects, the database deletes the user's remaining comments
+    counts = connection.execute(select(Comment.project_id, func.count())
+                                .where(Comment.user_id == target.id)
+                                .group_by(Comment.project_id)).all()
+    apply_project_comment_deltas(connection, {project_id: -count for project_id, count in counts})
+    apply_deltas(connection, total_users=-int(not target.is_admin),
+                 total_comments=-sum(count for _, count in counts))
+
+
+@event.listens_for(Achievement, 'after_insert')
+def _achievement_inserted(mapper, connection, target):
+    apply_deltas(connection, total_achievements=1)
+
+
+@event.listens_for(Achievement, 'after_delete')
+def _achievement_deleted(mapper, connection, target):
+    apply_deltas(connection, total_achievements=-1)
+
+
+def init_stats(app):
+    @app.cli.command('rebuild-stats')
+    def rebuild_stats_command():
+        """Recount the dashboard statistics from scratch."""
+        counters = rebuild_stats()
+        db.session.commit()
+        print(counters)
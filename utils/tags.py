@@ -0,0 +1,214 @@
+"""
+Normalized project tags.
+
+``Project.tags`` (a JSON list) stays the display copy edited by the admin
+forms. The ORM events below mirror it into ``tag``/``project_tag`` and keep
+``Tag.published_count`` current, so "projects tagged X" is an index lookup
+and the facet counts are a read of the small tag table instead of a scan
+over every JSON blob. Bulk status changes and deletes call
+``adjust_tag_counts()``; other writes that bypass the ORM must call
+``rebuild_project_tags()``.
+"""
+
+import re
+from collections import Counter
+
+from sqlalchemy import delete, event, exists, func, insert, inspect, select, update
+
+from models.models import db, Project, Tag, ProjectTag
+from utils.dialects import insert_for_dialect
+from utils.search import fold
+
+CHUNK_SIZE = 5000
+
+
+def slugify(name):
+    return re.sub(r'[^a-z0-9]+', '-', fold(name or '')).strip('-')[:100]
+
+
+def _names_by_slug(names):
+    """First spelling of each distinct tag, keyed by slug, in order"""
+    by_slug = {}
+    for name in names or []:
+        name = name.strip()
+        slug = slugify(name)
+        if slug and slug not in by_slug:
+            by_slug[slug] = name[:100]
+    return by_slug
+
+
+def tag_ids(connection, names_by_slug):
+    """Map slug -> tag id, creating missing tags"""
+    slugs = list(names_by_slug)
+    ids = {}
+    for start in range(0, len(slugs), CHUNK_SIZE):
+        chunk = slugs[start:start + CHUNK_SIZE]
+        ids.update(connection.execute(select(Tag.slug, Tag.id).where(Tag.slug.in_(chunk))).all())
+
+    missing = [{'slug': slug, 'name': name} for slug, name in names_by_slug.items() if slug not in ids]
+    if missing:
+        dialect_insert = insert_for_dialect(connection.dialect.name)
+        if dialect_insert is not None:
+            # Another request may create the same tag concurrently
+            connection.execute(dialect_insert(Tag).on_conflict_do_nothing(index_elements=['slug']), missing)
+        else:
+            connection.execute(insert(Tag), missing)
+        created = [row['slug'] for row in missing]
+        ids.update(connection.execute(select(Tag.slug, Tag.id).where(Tag.slug.in_(created))).all())
+    return ids
+
+
+def set_project_tags(connection, project_id, names):
+    """Replace a project's link rows with the given tag names; returns the tag ids"""
+    connection.execute(delete(ProjectTag).where(ProjectTag.project_id == project_id))
+    by_slug = _names_by_slug(names)
+    if not by_slug:
+        return []
+    ids = tag_ids(connection, by_slug)
+    connection.execute(insert(ProjectTag), [
+        {'project_id': project_id, 'tag_id': ids[slug]} for slug in by_slug
+    ])
+    return [ids[slug] for slug in by_slug]
+
+
+def link_new_projects(connection, rows):
+    """Link rows (mappings with id, tags and status) inserted with Core and
+    count the published ones into their tags"""
+    row_tags = [(row, _names_by_slug(row['tags'])) for row in rows]
+    names = {}
+    for _, by_slug in row_tags:
+        for slug, name in by_slug.items():
+            names.setdefault(slug, name)
+    if not names:
+        return
+    ids = tag_ids(connection, names)
+    connection.execute(insert(ProjectTag), [
+        {'project_id': row['id'], 'tag_id': ids[slug]} for row, by_slug in row_tags for slug in by_slug
+    ])
+    published = Counter(ids[slug] for row, by_slug in row_tags if row['status'] == 'published'
+                        for slug in by_slug)
+    by_delta = {}
+    for tag_id, delta in published.items():
+        by_delta.setdefault(delta, []).append(tag_id)
+    for delta, group in by_delta.items():
+        _adjust_published_counts(connection, group, delta)
+
+
+def _linked_tag_ids(connection, project_id):
+    return connection.execute(select(ProjectTag.tag_id).where(ProjectTag.project_id == project_id)).scalars().all()
+
+
+def _adjust_published_counts(connection, ids, delta):
+    if ids:
+        connection.execute(update(Tag).where(Tag.id.in_(ids))
+                           .values(published_count=Tag.published_count + delta))
+
+
+def adjust_tag_counts(connection, project_ids, delta):
+    """Add ``delta`` per linked project to the tags of ``project_ids`` (ids or a select)"""
+    counts = connection.execute(select(ProjectTag.tag_id, func.count())
+                                .where(ProjectTag.project_id.in_(project_ids))
+                                .group_by(ProjectTag.tag_id)).all()
+    by_delta = {}
+    for tag_id, count in counts:
+        by_delta.setdefault(count * delta, []).append(tag_id)
+    for total, group in by_delta.items():
+        _adjust_published_counts(connection, group, total)
+
+
+def recount_tags(connection):
+    connection.execute(update(Tag).values(published_count=(
+        select(func.count())
+        .select_from(ProjectTag)
+        .join(Project, Project.id == ProjectTag.project_id)
+        .where(ProjectTag.tag_id == Tag.id, Project.status == 'published')
+        .scalar_subquery()
+    )))
+
+
+def rebuild_project_tags(connection=None):
+    """Recreate every link row from Project.tags; returns the number of links"""
+    connection = connection or db.session.connection()
+    connection.execute(delete(ProjectTag))
+    projects = connection.execute(select(Project.id, Project.tags)).all()
+
+    names = {}
+    for _, tags in projects:
+        for slug, name in _names_by_slug(tags).items():
+            names.setdefault(slug, name)
+    ids = tag_ids(connection, names)
+
+    links = [{'project_id': project_id, 'tag_id': ids[slug]}
+             for project_id, tags in projects for slug in _names_by_slug(tags)]
+    for start in range(0, len(links), CHUNK_SIZE):
+        connection.execute(insert(ProjectTag), links[start:start + CHUNK_SIZE])
+    recount_tags(connection)
+    return len(links)
+
+
+@event.listens_for(Project, 'after_insert')
+def _project_inserted(mapper, connection, target):
+    ids = set_project_tags(connection, target.id, target.tags)
+    if target.status == 'published':
+        _adjust_published_counts(connection, ids, 1)
+
+
+@event.listens_for(Project, 'after_update')
+def _project_updated(mapper, connection, target):
+    state = inspect(target)
+    tags_changed = state.attrs.tags.history.has_changes()
+    status = state.attrs.status.history
+    if not tags_changed and not status.has_changes():
+        return
+
+    was_published = (status.deleted[0] if status.deleted else target.status) == 'published'
+    ids = _linked_tag_ids(connection, target.id)
+    if was_published:
+        _adjust_published_counts(connection, ids, -1)
+    if tags_changed:
+        ids = set_project_tags(connection, target.id, target.tags)
+    if target.status == 'published':
+        _adjust_published_counts(connection, ids, 1)
+
+
+@event.listens_for(Project, 'before_delete')
+def _project_deleting(mapper, connection, target):
+    if target.status == 'published':
+        _adjust_published_counts(connection, _linked_tag_ids(connection, target.id), -1)
+    connection.execute(delete(ProjectTag).where(ProjectTag.project_id == target.id))
+
+
+def get_tag(slug):
+    return db.session.execute(select(Tag).where(Tag.slug == slug)).scalar_one_or_none()
+
+
+def filter_by_tag(query, tag, limit, published_total):
+    """Restrict a Project query to projects linked to tag.
+
+    A rare tag is best read from the tag index and sorted (cost ~ its count);
+    a common one by walking the listing order and probing project_tag until
+    the page is full (cost ~ limit * published_total / count). Pick the
+    cheaper shape from the tag's published count.
+    """
+    if tag.published_count ** 2 < limit * published_total:
+        return query.join(ProjectTag, ProjectTag.project_id == Project.id).filter(ProjectTag.tag_id == tag.id)
+    return query.filter(exists().where(ProjectTag.project_id == Project.id, ProjectTag.tag_id == tag.id))
+
+
+def tag_facets(limit=30):
+    """(name, slug, published project count) for the most used tags"""
+    return db.session.execute(
+        select(Tag.name, Tag.slug, Tag.published_count)
+        .where(Tag.published_count > 0)
+        .order_by(Tag.published_count.desc(), Tag.name)
+        .limit(limit)
+    ).all()
+
+
+def init_tags(app):
+    @app.cli.command('rebuild-tags')
+    def rebuild_tags_command():
+        """Rebuild the tag tables from Project.tags."""
+        links = rebuild_project_tags()
+        db.session.commit()
+        print(f"Linked {links} project tags")
@@ -0,0 +1,125 @@
+"""
+Template compilation and fragment caching.
+
+Bytecode cache (TEMPLATE_BYTECODE_CACHE='disk'): compiled templates are
+written to TEMPLATE_BYTECODE_CACHE_DIR and shared by every worker on the
+host, so a fresh worker loads them instead of compiling. Entries are keyed
+by the template source checksum, so an edited template is recompiled.
+
+Fragment cache (FRAGMENT_CACHE_BACKEND='memory'): ``{% cache %}`` stores the
+rendered markup of a block in a per-worker LRU::
+
+    {% cache 'project:' ~ project.id, project.updated_at %} ... {% endcache %}
+
+The first argument is the fragment's tag, the rest version it; the block
+is rendered again whenever any of them changes. Include every value the
+block shows that can change without bumping the version.
+``invalidate_fragments(tag)`` expires a tag's fragments in this worker
+only, so versioned keys, which every worker sees, are what keep fragments
+current across workers.
+"""
+
+import os
+import threading
+
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from utils.page_cache import MemoryBackend
+
+_fragments = None
+
+
+class _Stats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def count(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+
+_stats = _Stats()
+
+
+def render_fragment(parts, caller):
+    """Cached markup for ``parts`` (tag, *version), rendering it with ``caller`` on a miss"""
+    if _fragments is None:
+        return caller()
+    tag = str(parts[0])
+    key = '|'.join([tag, _fragments.tag_version(tag)] + [str(part) for part in parts[1:]])
+    markup = _fragments.get(key)
+    _stats.count(markup is not None)
+    if markup is None:
+        markup = caller()
+        _fragments.set(key, markup)
+    return Markup(markup)
+
+
+class FragmentCacheExtension(Extension):
+    """``{% cache tag, *version %}...{% endcache %}``"""
+
+    tags = {'cache'}
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            parts.append(parser.parse_expression())
+        body = parser.parse_statements(('name:endcache',), drop_needle=True)
+        call = self.call_method('_render', [nodes.List(parts)])
+        return nodes.CallBlock(call, [], [], body).set_lineno(lineno)
+
+    def _render(self, parts, caller):
+        return render_fragment(parts, caller)
+
+
+def invalidate_fragments(*tags):
+    """Expire this worker's fragments cached under any of ``tags``"""
+    if _fragments is None:
+        return
+    for tag in tags:
+        _fragments.bump(tag)
+
+
+def fragment_cache_stats():
+    return {
+        'backend': type(_fragments).__name__ if _fragments is not None else None,
+        'entries': len(_fragments) if _fragments is not None else 0,
+        'hits': _stats.hits,
+        'misses': _stats.misses,
+    }
+
+
+def init_templating(app):
+    """Set up the bytecode and fragment caches. Must run before anything
+    touches ``app.jinja_env``, which is created on first use."""
+    global _fragments
+    if app.config.get('TEMPLATE_BYTECODE_CACHE', 'disk') == 'disk':
+        directory = app.config.get('TEMPLATE_BYTECODE_CACHE_DIR') or os.path.join(app.instance_path, 'jinja_bytecode')
+        os.makedirs(directory, exist_ok=True)
+        app.jinja_options = dict(app.jinja_options, bytecode_cache=FileSystemBytecodeCache(directory))
+    app.jinja_options = dict(app.jinja_options,
+                             extensions=list(app.jinja_options.get('extensions', ())) + [FragmentCacheExtension])
+
+    kind = app.config.get('FRAGMENT_CACHE_BACKEND', 'memory')
+    if kind == 'memory':
+        _fragments = MemoryBackend(app.config.get('FRAGMENT_CACHE_MAX_ENTRIES', 4096))
+    elif kind == 'none':
+        _fragments = None
+    else:
+        raise ValueError(f"Unknown FRAGMENT_CACHE_BACKEND {kind!r}")
+
+    @app.cli.command('clear-template-cache')
+    def clear_template_cache_command():
+        """Delete the compiled templates in the bytecode cache."""
+        bytecode_cache = app.jinja_options.get('bytecode_cache')
+        if bytecode_cache is not None:
+            bytecode_cache.clear()
+        print("Template bytecode cache cleared" if bytecode_cache is not None else "No bytecode cache configured")